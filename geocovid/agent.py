@@ -1,13 +1,17 @@
 """Agents for a SIR Model."""
 
 import enum
+from typing import Dict, List, Sequence, Union
 
-from mesa import Model
+from mesa import Agent, Model
 from mesa_geo.geoagent import GeoAgent
 import numpy as np
+from shapely.geometry import mapping
 from shapely.geometry.base import BaseGeometry
+from shapely.ops import transform
 
 from geocovid.constants import STEPS_PER_DAY
+from geocovid.spatial import bounds_shape, geometry_bounds
 
 
 class Status(enum.IntEnum):
@@ -20,17 +24,98 @@ class Status(enum.IntEnum):
 
 
 class PersonAgent(GeoAgent):
-    """An agent with fixed initial position and status."""
+    """
+    An agent with fixed initial position and status.
+
+    The position is kept as a bounding box row of the model positions array,
+    every position being an envelope or a point. The shapely shape is only
+    built on demand, for visualization.
+    """
 
     def __init__(self, unique_id: str, model: Model, shape: BaseGeometry):
         """Init method."""
-        super().__init__(unique_id, model, shape)
-        self.pos = None
-        self.status = Status.SUSCEPTIBLE
+        self._setup(unique_id, model, model.positions.append(geometry_bounds(shape)))
+        model.update_counts(None, Status.SUSCEPTIBLE)
+
+    def _setup(self, unique_id: str, model: Model, row: int) -> None:
+        """Set the attributes of a susceptible agent, at a row of the positions."""
+        # GeoAgent.__init__ would keep the shapely object, only its box is kept.
+        Agent.__init__(self, unique_id, model)
+        self.row = row
+        self._status = Status.SUSCEPTIBLE
         self.infection_time = 0
         self.infected_at = 0
 
-    def step(self, shape: BaseGeometry = None) -> None:
+    @classmethod
+    def create_many(
+        cls, unique_ids: Sequence[str], model: Model, bounds: np.ndarray
+    ) -> List["PersonAgent"]:
+        """
+        Create susceptible agents in bulk.
+
+        Positions are added to the model array at once, and the status
+        counters updated once, instead of running __init__ per agent.
+
+        Parameters
+        ----------
+        unique_ids : Sequence[str]
+            ids of the new agents.
+        model : Model
+            model of the agents.
+        bounds : np.ndarray
+            (n, 4) bounding boxes of the agents positions.
+        Returns
+        -------
+        List[PersonAgent]
+            new agents, in the order of unique_ids.
+        """
+        rows = model.positions.extend(bounds)
+        agents = []
+        for unique_id, row in zip(unique_ids, rows):
+            agent = cls.__new__(cls)
+            agent._setup(unique_id, model, row)
+            agents.append(agent)
+        model.update_counts(None, Status.SUSCEPTIBLE, len(agents))
+        return agents
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """Bounding box of the agent position, as minx, miny, maxx, maxy."""
+        return self.model.positions.bounds[self.row]
+
+    @property
+    def shape(self) -> BaseGeometry:
+        """Shapely geometry of the agent position, built on demand."""
+        return bounds_shape(self.bounds)
+
+    @shape.setter
+    def shape(self, shape: BaseGeometry) -> None:
+        """Set the agent position from a shapely geometry."""
+        self.model.positions.bounds[self.row] = geometry_bounds(shape)
+
+    def __geo_interface__(self) -> Dict:
+        """Return a GeoJSON Feature, with the shape built on demand."""
+        properties = dict(vars(self))
+        properties["model"] = str(self.model)
+        shape = transform(self.model.grid.Transformer.transform, self.shape)
+        return {"type": "Feature", "geometry": mapping(shape), "properties": properties}
+
+    @property
+    def status(self) -> Status:
+        """Agent status."""
+        return self._status
+
+    @status.setter
+    def status(self, status: Status) -> None:
+        """Set the agent status, keeping the model counters up to date."""
+        self.model.update_counts(self._status, status)
+        if status is Status.INFECTED:
+            self.model.infected[self.unique_id] = self
+        elif self._status is Status.INFECTED:
+            del self.model.infected[self.unique_id]
+        self._status = status
+
+    def step(self, shape: Union[BaseGeometry, Sequence[float]] = None) -> None:
         """One step of the agent."""
         self.check()
         self.interact()
@@ -43,24 +128,27 @@ class PersonAgent(GeoAgent):
             min_death_period = self.model.min_death_period * STEPS_PER_DAY
             elapsed_time = self.model.schedule.time - self.infected_at
             treatment_period = self.model.treatment_period * STEPS_PER_DAY
-            np.random.seed = self.random.seed
 
             if elapsed_time >= min_death_period:
-                is_alive = np.random.choice([0, 1], p=[death_prob, 1 - death_prob])
-                if is_alive == 0:
+                if self.model.rng.random() < death_prob:
                     self.status = Status.DEAD
-                    self.model.deaths += 1
+                    self.model.leave_space(self)
                 elif elapsed_time >= treatment_period:
                     self.status = Status.RECOVERED
+                    self.model.leave_space(self)
 
-    def move(self, shape: BaseGeometry = None) -> None:
+    def move(self, shape: Union[BaseGeometry, Sequence[float]] = None) -> None:
         """
-        Move the agent in the space.
+        Move the agent in the space, to a shape or a bounding box.
 
-        If shape is None, it stays in the same place.
+        If shape is None, empty or NaN, it stays in the same place.
         """
-        if shape:
-            self.shape = shape
+        if isinstance(shape, BaseGeometry):
+            shape = geometry_bounds(shape)
+        if shape is not None and np.isfinite(shape).all():
+            self.model.positions.bounds[self.row] = shape
+            if self in self.model.grid.index:
+                self.model.grid.update_agent(self)
 
     def interact(self):
         """An agent interacts with others and may infect them."""
@@ -69,8 +157,8 @@ class PersonAgent(GeoAgent):
                 self, self.model.exposure_distance
             )
             for contact in contacts:
-                if contact.status is not Status.INFECTED:
-                    infect = self.random.random() <= self.model.infection_prob
+                if contact.status is Status.SUSCEPTIBLE:
+                    infect = self.model.rng.random() <= self.model.infection_prob
                     if infect:
                         contact.status = Status.INFECTED
                         contact.infected_at = self.model.schedule.time
@@ -0,0 +1,96 @@
+"""Input reader streaming the parquet members of the daily archives."""
+import logging
+import os
+import tarfile
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["id", "timestamp", "latitude", "longitude"]
+
+
+def is_data_member(member: tarfile.TarInfo) -> bool:
+    """Whether an archive member is a data file, not a directory or metadata."""
+    name = os.path.basename(member.name)
+    return member.isfile() and bool(name) and not name.startswith((".", "_"))
+
+
+def read_archive(file: str, columns: List[str] = None) -> pd.DataFrame:
+    """
+    Read the parquet members of a tar.gz archive, without extracting it.
+
+    The archive is read as a stream, once: each member header is checked
+    before its content is read, and data members are loaded from memory with
+    only the given columns. A corrupt member is skipped, and a truncated
+    archive keeps the members read before the truncation.
+
+    Parameters
+    ----------
+    file : str
+        path of the tar.gz archive.
+    columns : List[str]
+        columns to read, the ones used by the pipeline by default.
+    Returns
+    -------
+    pd.DataFrame
+        rows of all the members read, empty if none could be read.
+    """
+    columns = columns or COLUMNS
+    tables = []
+    try:
+        with tarfile.open(file, "r|gz") as tfile:
+            for member in tfile:
+                if not is_data_member(member):
+                    logger.info("skipped member %s", member.name)
+                    continue
+                data = tfile.extractfile(member).read()
+                try:
+                    tables.append(pq.read_table(pa.BufferReader(data), columns=columns))
+                except (pa.ArrowException, OSError) as error:
+                    logger.warning("skipped corrupt member %s: %s", member.name, error)
+    except (EOFError, tarfile.ReadError) as error:
+        logger.warning(
+            "truncated archive %s, read %d members: %s", file, len(tables), error
+        )
+
+    logger.info("read %d members of %s", len(tables), file)
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    return pa.concat_tables(tables, promote=True).to_pandas()
+
+
+def stage_archive(file: str, path: str) -> None:
+    """
+    Write the data members of a tar.gz archive as files under a directory.
+
+    Spark can not read the members of an archive, so they are staged to
+    disk, with the archive read as a stream once. Members are written as
+    they are, a corrupt one is skipped by the reader.
+
+    Parameters
+    ----------
+    file : str
+        path of the tar.gz archive.
+    path : str
+        directory to write the members to.
+    """
+    os.makedirs(path, exist_ok=True)
+    members = 0
+    try:
+        with tarfile.open(file, "r|gz") as tfile:
+            for member in tfile:
+                if not is_data_member(member):
+                    continue
+                name = "{:05d}-{}".format(members, os.path.basename(member.name))
+                with open(os.path.join(path, name), "wb") as out:
+                    out.write(tfile.extractfile(member).read())
+                members += 1
+    except (EOFError, tarfile.ReadError) as error:
+        logger.warning(
+            "truncated archive %s, staged %d members: %s", file, members, error
+        )
+    logger.info("staged %d members of %s", members, file)
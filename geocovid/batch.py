@@ -0,0 +1,269 @@
+"""Batch run of the Geo Covid Model over parameter configs and seeds."""
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import itertools
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import click
+from geopandas import GeoDataFrame
+import numpy as np
+import pandas as pd
+
+from geocovid.cache import TrajectoryCache
+from geocovid.constants import (
+    DATA_DIR,
+    EXPOSURE_DISTANCE,
+    METRIC_CRS,
+    OUTLIER_AREA,
+    OUTPUT_DIR,
+)
+from geocovid.engine import frame_bounds
+from geocovid.model import GeoCovidModel
+from geocovid.network import coded_params, param_columns, run_replay, save_contacts
+
+logger = logging.getLogger(__name__)
+
+POSITIONS_DIR = os.path.join(OUTPUT_DIR, "positions/")
+BATCH_PARAMS = (
+    "infection_prob",
+    "exposure_distance",
+    "death_prob",
+    "treatment_period",
+    "init_infected",
+    "min_death_period",
+    "dormant_after",
+)
+
+
+def save_positions(hourly_gdfs: Iterable[GeoDataFrame], path: str) -> None:
+    """
+    Save hourly positions as arrays that workers can memory-map.
+
+    Ids are coded as dense integers; the rows of all hours are concatenated,
+    with the offsets of each hour.
+
+    Parameters
+    ----------
+    hourly_gdfs : Iterable[GeoDataFrame]
+        positions of each hour, indexed by agent id.
+    path : str
+        directory to save the arrays.
+    """
+    codes: Dict[Any, int] = {}
+    hour_codes, hour_bounds, offsets = [], [], [0]
+    for gdf in hourly_gdfs:
+        keys, bounds = frame_bounds(gdf)
+        hour_codes.append(
+            np.fromiter(
+                (codes.setdefault(key, len(codes)) for key in keys),
+                dtype=np.int32,
+                count=len(keys),
+            )
+        )
+        hour_bounds.append(bounds)
+        offsets.append(offsets[-1] + len(keys))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "ids.npy"), np.array(list(codes), dtype=str))
+    np.save(os.path.join(path, "codes.npy"), np.concatenate(hour_codes))
+    np.save(os.path.join(path, "bounds.npy"), np.concatenate(hour_bounds))
+    np.save(os.path.join(path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    logger.info("saved %d hours of positions to %s", len(offsets) - 1, path)
+
+
+class HourlyPositions:
+    """Read-only, memory-mapped hourly positions saved by save_positions."""
+
+    def __init__(self, path: str) -> None:
+        """Init method."""
+        self.path = path
+        self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        self.bounds = np.load(os.path.join(path, "bounds.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    def __len__(self) -> int:
+        """Amount of hours."""
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield the agent codes and bounding boxes of each hour."""
+        for start, stop in zip(self.offsets[:-1], self.offsets[1:]):
+            yield self.codes[start:stop], self.bounds[start:stop]
+
+    def ids(self) -> np.ndarray:
+        """Agent id of each code."""
+        return np.load(os.path.join(self.path, "ids.npy"))
+
+
+def positions_dir(root: str, files: List[str]) -> str:
+    """
+    Directory of the positions of some archives, under a root directory.
+
+    Keyed by the content of the archives and the settings of the pipeline,
+    as the trajectory cache, so other data or settings never replay stale
+    positions.
+    """
+    return TrajectoryCache(root).positions_path(
+        files, outlier_area=OUTLIER_AREA, crs=METRIC_CRS
+    )
+
+
+def run_simulation(path: str, params: Dict[str, Any], seed: int) -> pd.DataFrame:
+    """
+    Run one simulation over memory-mapped positions.
+
+    Parameters
+    ----------
+    path : str
+        directory of the positions saved by save_positions.
+    params : Dict[str, Any]
+        GeoCovidModel parameters, init_infected can list agent ids.
+    seed : int
+        model seed.
+    Returns
+    -------
+    pd.DataFrame
+        model reporters of each step, with the parameters and seed as columns.
+    """
+    positions = HourlyPositions(path)
+    model_params = params
+    if isinstance(params.get("init_infected"), list):
+        model_params = coded_params(params, positions.ids())
+    model = GeoCovidModel(
+        seed=seed, vectorized=True, collect_agents=False, **model_params
+    )
+    for codes, bounds in positions:
+        model.step_positions(codes, bounds)
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    model_vars = model_vars.rename_axis("Step").reset_index()
+    return model_vars.assign(seed=seed, **param_columns(params))
+
+
+def param_configs(param_grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Every combination of the values in a parameter grid."""
+    for name in param_grid:
+        if name not in BATCH_PARAMS:
+            raise ValueError("unknown batch parameter {}".format(name))
+    names = list(param_grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(param_grid[name] for name in names))
+    ]
+
+
+def run_batch(
+    path: str,
+    param_grid: Dict[str, Sequence[Any]],
+    seeds: Sequence[int],
+    processes: int = None,
+    simulate: Callable[[str, Dict[str, Any], int], pd.DataFrame] = run_simulation,
+) -> pd.DataFrame:
+    """
+    Run every parameter config with every seed on a process pool.
+
+    Workers share one read-only copy of the positions through memory-mapped
+    arrays instead of running the data pipeline again.
+
+    Parameters
+    ----------
+    path : str
+        directory of the positions saved by save_positions, or of the
+        contacts saved by save_contacts when replaying.
+    param_grid : Dict[str, Sequence[Any]]
+        values of each GeoCovidModel parameter to combine.
+    seeds : Sequence[int]
+        seeds to replicate each config with.
+    processes : int
+        amount of worker processes, one per CPU by default.
+    simulate : Callable[[str, Dict[str, Any], int], pd.DataFrame]
+        function running one simulation, run_simulation or run_replay.
+    Returns
+    -------
+    pd.DataFrame
+        tidy table of model reporters per step, config and seed.
+    """
+    runs = list(itertools.product(param_configs(param_grid), seeds))
+    logger.info("running %d simulations", len(runs))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(simulate, path, params, seed) for params, seed in runs
+        ]
+        results = [future.result() for future in futures]
+    return pd.concat(results, ignore_index=True)
+
+
+@click.command()
+@click.option(
+    "--grid",
+    type=click.STRING,
+    default="{}",
+    help="Parameter grid as JSON, e.g. '{\"infection_prob\": [0.0005, 0.001]}'",
+)
+@click.option(
+    "--pipeline",
+    type=click.Choice(["spark", "local"]),
+    default="spark",
+    help="Data pipeline engine to build the positions with",
+)
+@click.option("--replicates", type=click.INT, default=1, help="Seeds per config")
+@click.option("--processes", type=click.INT, default=None, help="Worker processes")
+@click.option(
+    "--positions",
+    type=click.STRING,
+    default=POSITIONS_DIR,
+    help="Root of the positions dirs, one per set of archives and settings",
+)
+@click.option(
+    "--replay",
+    is_flag=True,
+    help="Replay the contact network extracted once, instead of the positions",
+)
+@click.option(
+    "--output_file", type=click.STRING, default="batch.parquet", help="Output filename"
+)
+def main(
+    grid: str,
+    pipeline: str,
+    replicates: int,
+    processes: int,
+    positions: str,
+    replay: bool,
+    output_file: str,
+) -> None:
+    """Batch run script."""
+    files = sorted(glob.glob(os.path.join(DATA_DIR, "*.tar.gz")))
+    root, positions = positions, positions_dir(positions, files)
+    if not os.path.exists(os.path.join(positions, "offsets.npy")):
+        from geocovid.main import iter_hours  # pylint: disable=import-outside-toplevel
+
+        hourly_gdfs = (
+            hour_gdf
+            for _, day_gdfs, _ in iter_hours(files, pipeline)
+            for hour_gdf in day_gdfs
+        )
+        TrajectoryCache(root).store_dir(
+            positions, lambda path: save_positions(hourly_gdfs, path)
+        )
+
+    param_grid = json.loads(grid)
+    path, simulate = positions, run_simulation
+    if replay:
+        distances = param_grid.get("exposure_distance", [EXPOSURE_DISTANCE])
+        if len(distances) != 1:
+            raise click.BadParameter("replay needs a single exposure_distance")
+        path = os.path.join(positions, "contacts-{}".format(distances[0]))
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            hourly_positions = HourlyPositions(positions)
+            save_contacts(hourly_positions, distances[0], path, hourly_positions.ids())
+        simulate = run_replay
+
+    results = run_batch(path, param_grid, range(replicates), processes, simulate)
+    results.to_parquet(os.path.join(OUTPUT_DIR, output_file), index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Benchmark suite of the Geo Covid Model over synthetic trajectories."""
+from datetime import datetime
+import itertools
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+import click
+import numpy as np
+import pandas as pd
+
+from geocovid.agent import Status
+from geocovid.constants import OUTPUT_DIR, ROOT_DIR
+from geocovid.model import STEP_PHASES, GeoCovidModel
+from geocovid.synthetic import synthetic_hours
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_FILE = os.path.join(OUTPUT_DIR, "benchmarks.csv")
+ENGINES = ("agents", "vectorized")
+# Scenario columns identifying the same benchmark across commits.
+SCENARIO = ["engine", "agents", "hours", "clusters", "churn", "presence", "seed"]
+INIT_INFECTED = 0.01
+MAX_INTERACT_AGENTS = 1000
+
+
+def git_commit() -> str:
+    """Commit of the working tree, with a + when it has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + "+" if changes else commit
+
+
+def peak_memory_mb() -> float:
+    """Peak resident memory of the process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on Linux.
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def time_person_interact(model: GeoCovidModel) -> Dict[str, float]:
+    """Time PersonAgent.interact of a sample of the infected agents."""
+    infected = [
+        agent for agent in model.schedule.agents if agent.status is Status.INFECTED
+    ][:MAX_INTERACT_AGENTS]
+    start = time.perf_counter()
+    for agent in infected:
+        agent.interact()
+    seconds = time.perf_counter() - start
+    return {
+        "person_interact_s": seconds,
+        "person_interact_agents_per_s": len(infected) / seconds if seconds else 0.0,
+    }
+
+
+def run_benchmark(
+    engine: str,
+    agents: int,
+    hours: int,
+    clusters: int = 50,
+    churn: float = 0.01,
+    presence: float = 0.7,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Run one benchmark scenario in the current process.
+
+    The model steps over synthetic hours generated with a fixed seed, so a
+    scenario runs the same work on every commit. Only the steps are timed,
+    not the generation of their input.
+
+    Parameters
+    ----------
+    engine : str
+        agents to step PersonAgent objects, vectorized for the array engine.
+    agents : int
+        amount of synthetic devices at any time.
+    hours : int
+        amount of steps.
+    clusters : int
+        amount of clusters of the device homes.
+    churn : float
+        fraction of the devices replaced each hour.
+    presence : float
+        probability of a device being seen on an hour.
+    seed : int
+        seed of the trajectories and of the model.
+    Returns
+    -------
+    Dict[str, Any]
+        scenario, timings, agent-steps per second and peak memory.
+    """
+    model = GeoCovidModel(
+        init_infected=max(1, int(agents * INIT_INFECTED)),
+        seed=seed,
+        vectorized=engine == "vectorized",
+        profile=True,
+    )
+    trajectories = synthetic_hours(
+        agents,
+        hours=hours,
+        clusters=clusters,
+        churn=churn,
+        presence=presence,
+        seed=seed,
+    )
+    step_seconds, agent_steps = 0.0, 0
+    for hour_gdf in trajectories:
+        start = time.perf_counter()
+        model.step(hour_gdf)
+        step_seconds += time.perf_counter() - start
+        agent_steps += len(hour_gdf)
+
+    start = time.perf_counter()
+    model.datacollector.get_agent_vars_dataframe()
+    agent_vars_seconds = time.perf_counter() - start
+
+    result: Dict[str, Any] = {
+        "engine": engine,
+        "agents": agents,
+        "hours": hours,
+        "clusters": clusters,
+        "churn": churn,
+        "presence": presence,
+        "seed": seed,
+        "step_s": step_seconds,
+        "agent_steps": agent_steps,
+        "agent_steps_per_s": agent_steps / step_seconds if step_seconds else 0.0,
+        "model_agents": model.count_agents(),
+        "infected": model.count_status(Status.INFECTED),
+        "agent_vars_s": agent_vars_seconds,
+    }
+    totals = model.timer.totals
+    for phase in STEP_PHASES + ("collect",):
+        result["{}_s".format(phase)] = totals.get(phase, 0.0)
+    if model.engine is None:
+        result.update(time_person_interact(model))
+    result["peak_rss_mb"] = peak_memory_mb()
+    return result
+
+
+def _run_isolated(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a scenario in a new process, so its peak memory is its own."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_benchmark, kwds=scenario)
+
+
+def run_suite(scenarios: List[Dict[str, Any]], isolate: bool = True) -> pd.DataFrame:
+    """
+    Run the benchmark scenarios one after the other.
+
+    Parameters
+    ----------
+    scenarios : List[Dict[str, Any]]
+        keyword arguments of run_benchmark.
+    isolate : bool
+        run each scenario in a new process.
+    Returns
+    -------
+    pd.DataFrame
+        one row per scenario, with the commit, date and environment.
+    """
+    rows = []
+    for scenario in scenarios:
+        logger.info("benchmark %s", scenario)
+        rows.append(_run_isolated(scenario) if isolate else run_benchmark(**scenario))
+    results = pd.DataFrame(rows)
+    results.insert(0, "commit", git_commit())
+    results.insert(1, "date", datetime.now().isoformat(timespec="seconds"))
+    results.insert(2, "python", platform.python_version())
+    results.insert(3, "numpy", np.__version__)
+    return results
+
+
+def compare(history: pd.DataFrame, commit: str) -> pd.DataFrame:
+    """
+    Throughput of a commit against the previous run of each scenario.
+
+    Parameters
+    ----------
+    history : pd.DataFrame
+        benchmark rows of several runs, in run order.
+    commit : str
+        commit to compare.
+    Returns
+    -------
+    pd.DataFrame
+        agent-steps per second of the previous and the compared commit, and
+        their ratio, by scenario.
+    """
+    current = history[history["commit"] == commit].groupby(SCENARIO).last()
+    previous = history[history["commit"] != commit].groupby(SCENARIO).last()
+    comparison = pd.DataFrame(
+        {
+            "previous_commit": previous["commit"],
+            "previous": previous["agent_steps_per_s"],
+            "current": current["agent_steps_per_s"],
+        }
+    ).dropna()
+    comparison["speedup"] = comparison["current"] / comparison["previous"]
+    return comparison
+
+
+def scenarios(
+    engines: Sequence[str],
+    agents: Sequence[int],
+    hours: int,
+    clusters: int,
+    churn: float,
+    presence: float,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    """Every combination of the engines and scales."""
+    return [
+        {
+            "engine": engine,
+            "agents": scale,
+            "hours": hours,
+            "clusters": clusters,
+            "churn": churn,
+            "presence": presence,
+            "seed": seed,
+        }
+        for engine, scale in itertools.product(engines, agents)
+    ]
+
+
+@click.command()
+@click.option(
+    "--engine",
+    "engines",
+    type=click.Choice(ENGINES),
+    multiple=True,
+    default=ENGINES,
+    help="Engine to benchmark, repeat for several",
+)
+@click.option(
+    "--agents",
+    type=click.INT,
+    multiple=True,
+    default=(10000,),
+    help="Devices at any time, repeat for several scales, e.g. 10000 to 1000000",
+)
+@click.option("--hours", type=click.INT, default=24, help="Steps of each run")
+@click.option("--clusters", type=click.INT, default=50, help="Clusters of homes")
+@click.option(
+    "--churn", type=click.FLOAT, default=0.01, help="Devices replaced each hour"
+)
+@click.option(
+    "--presence", type=click.FLOAT, default=0.7, help="Chance of being seen an hour"
+)
+@click.option("--seed", type=click.INT, default=0, help="Seed of the runs")
+@click.option(
+    "--output_file",
+    type=click.STRING,
+    default=BENCHMARK_FILE,
+    help="CSV the results are appended to",
+)
+def main(
+    engines: Sequence[str],
+    agents: Sequence[int],
+    hours: int,
+    clusters: int,
+    churn: float,
+    presence: float,
+    seed: int,
+    output_file: str,
+) -> None:
+    """Benchmark script."""
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    results = run_suite(
+        scenarios(engines, agents, hours, clusters, churn, presence, seed)
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    history = results
+    if os.path.exists(output_file):
+        history = pd.concat(
+            [pd.read_csv(output_file, dtype={"commit": str}), results],
+            ignore_index=True,
+        )
+    history.to_csv(output_file, index=False)
+
+    columns = SCENARIO[:2] + ["agent_steps_per_s", "step_s", "peak_rss_mb"]
+    click.echo(results[columns].to_string(index=False))
+    comparison = compare(history, results["commit"].iloc[0])
+    if not comparison.empty:
+        click.echo(comparison.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Cache of preprocessed trajectories."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Callable, List, Optional
+import warnings
+
+import geopandas as gpd
+from geopandas import GeoDataFrame
+import pandas as pd
+
+from geocovid.local_pipeline import read_contacts
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """Hash the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TrajectoryCache:
+    """
+    On disk cache of the per (hour, id) aggregated positions of an input file.
+
+    Entries are Parquet files with WKB geometry, keyed by the content hash of
+    the input file and the pipeline settings used to build them, so a change
+    in either builds a new entry. Contact pairs are cached as directories of
+    Parquet edge lists partitioned by hour.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        """Init method."""
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path: str, **settings: Any) -> str:
+        """
+        Cache key of an input file processed with the given settings.
+
+        Parameters
+        ----------
+        path : str
+            input file path.
+        settings : Any
+            pipeline settings that change its output.
+        Returns
+        -------
+        str
+            cache key.
+        """
+        return self.digest_key(file_digest(path), **settings)
+
+    @staticmethod
+    def digest_key(digest: str, **settings: Any) -> str:
+        """
+        Cache key of an input file of a known digest, as key without hashing it.
+
+        Parameters
+        ----------
+        digest : str
+            file_digest of the input file.
+        settings : Any
+            pipeline settings that change its output.
+        Returns
+        -------
+        str
+            cache key.
+        """
+        settings_digest = hashlib.sha256(
+            json.dumps(settings, sort_keys=True).encode()
+        ).hexdigest()
+        return "{}-{}".format(digest[:32], settings_digest[:16])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "{}.parquet".format(key))
+
+    def load(self, key: str) -> Optional[GeoDataFrame]:
+        """Load a cached GeoDataFrame, None if it is not cached."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        logger.info("loading cached trajectories %s", path)
+        return gpd.read_parquet(path)
+
+    def store(self, key: str, gdf: GeoDataFrame) -> None:
+        """Store a GeoDataFrame, written aside and moved to stay consistent."""
+        path = self._path(key)
+        tmp_path = "{}.tmp".format(path)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*initial implementation.*")
+            gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        logger.info("cached trajectories %s", path)
+
+    def contacts_path(self, key: str) -> str:
+        """Directory of the cached contact pairs of a key."""
+        return os.path.join(self.cache_dir, "{}.contacts".format(key))
+
+    def load_contacts(self, key: str) -> Optional[pd.DataFrame]:
+        """Load cached contact pairs, None if they are not cached."""
+        path = self.contacts_path(key)
+        if not os.path.isdir(path):
+            return None
+        logger.info("loading cached contacts %s", path)
+        return read_contacts(path)
+
+    def store_contacts(self, key: str, write: Callable[[str], None]) -> None:
+        """
+        Store contact pairs, written aside and moved to stay consistent.
+
+        Parameters
+        ----------
+        key : str
+            cache key.
+        write : Callable[[str], None]
+            function writing the edge lists under a given directory.
+        """
+        self.store_dir(self.contacts_path(key), write)
+        logger.info("cached contacts %s", self.contacts_path(key))
+
+    def positions_path(self, paths: List[str], **settings: Any) -> str:
+        """
+        Directory of the positions of all days of several input files.
+
+        Keyed by the content hash of all the files and the settings that
+        change the positions, so adding a day builds a new entry. The
+        outlier rule is applied when reading, so it does not change it.
+        """
+        digest = hashlib.sha256(
+            "".join(sorted(file_digest(path) for path in paths)).encode()
+            + json.dumps(settings, sort_keys=True).encode()
+        ).hexdigest()
+        return os.path.join(self.cache_dir, "positions-{}".format(digest[:32]))
+
+    def store_dir(self, path: str, write: Callable[[str], None]) -> None:
+        """Write a directory entry aside and move it, to stay consistent."""
+        tmp_path = "{}.tmp".format(path)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        write(tmp_path)
+        os.makedirs(tmp_path, exist_ok=True)
+        os.replace(tmp_path, path)
@@ -0,0 +1,201 @@
+"""Checkpoints of a Geo Covid Model run, to resume it where it stopped."""
+import json
+import logging
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from geocovid.agent import PersonAgent, Status
+from geocovid.datacollection import TypedColumn
+from geocovid.model import GeoCovidModel
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.npz"
+
+
+def _model_params(model: GeoCovidModel) -> Dict[str, Any]:
+    """Constructor parameters of a model, besides the seed."""
+    return {
+        "infection_prob": model.infection_prob,
+        "death_prob": model.death_prob,
+        "treatment_period": model.treatment_period,
+        "exposure_distance": model.exposure_distance,
+        "init_infected": model.init_infected,
+        "min_death_period": model.min_death_period,
+        "vectorized": model.engine is not None,
+        "debug": model.debug,
+        "collect_agents": bool(model.datacollector.agent_reporters),
+        "dormant_after": model.dormant_after,
+        "profile": model.timer.enabled,
+    }
+
+
+def _agent_arrays(model: GeoCovidModel) -> Dict[str, np.ndarray]:
+    """State of the agents, by agent code."""
+    if model.engine is not None:
+        engine, size = model.engine, len(model.engine)
+        return {
+            "ids": engine.index.ids().astype(str),
+            "status": engine.status[:size],
+            "infected_at": engine.infected_at[:size],
+            "bounds": engine.bounds[:size],
+            "active": engine.active[:size],
+            "last_seen": engine.last_seen[:size],
+        }
+    agents = model._code_agents
+    codes = {agent.unique_id: code for code, agent in enumerate(agents)}
+    grid = model.grid.index
+    return {
+        "ids": model.agent_index.ids().astype(str),
+        "status": np.array([agent.status for agent in agents], dtype=np.int8),
+        "infected_at": np.array([agent.infected_at for agent in agents], np.int64),
+        "bounds": model.positions.bounds[model._code_rows.values()],
+        "active": model._active.values(),
+        "last_seen": model._last_seen.values(),
+        "schedule_codes": np.array(
+            [codes[key] for key in model.schedule._agents], dtype=np.int64
+        ),
+        "infected_codes": np.array(
+            [codes[key] for key in model.infected], dtype=np.int64
+        ),
+        "grid_codes": np.array(
+            [-1 if item is None else codes[item.unique_id] for item in grid.items],
+            dtype=np.int64,
+        ),
+        "grid_free": np.array(grid.free_slots(), dtype=np.int64),
+    }
+
+
+def save_checkpoint(model: GeoCovidModel, path: str, **state: Any) -> None:
+    """
+    Save the state of a model as a compressed npz file.
+
+    Agent state is saved as arrays by agent code, with the id mapping, the
+    random generators, the counters and the collected reporters, so a model
+    loaded from it steps exactly as the saved one. The file is written aside
+    and moved, so a failure keeps the previous checkpoint.
+
+    Parameters
+    ----------
+    model : GeoCovidModel
+        model to save.
+    path : str
+        checkpoint file.
+    state : Any
+        JSON serializable state of the run, given back by load_checkpoint.
+    """
+    meta = {
+        "params": _model_params(model),
+        "steps": model.steps,
+        "schedule_steps": model.schedule.steps,
+        "time": model.schedule.time,
+        "new_agents": model.new_agents,
+        "status_counts": {
+            status.name: count for status, count in model.status_counts.items()
+        },
+        "rng": model.rng.bit_generator.state,
+        "random": model.random.getstate(),
+        "state": state,
+    }
+    arrays = _agent_arrays(model)
+    collector = model.datacollector
+    for name, values in collector.model_vars.items():
+        arrays["model_vars.{}".format(name)] = np.array(values)
+    for name, column in collector._agent_columns.items():
+        values = column.values()
+        arrays["agent_vars.{}".format(name)] = (
+            values.astype(str) if values.dtype == object else values
+        )
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "wb") as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(tmp_path, path)
+    logger.info("checkpoint of step %d saved to %s", model.steps, path)
+
+
+def _restore_agents(model: GeoCovidModel, arrays: Dict[str, np.ndarray]) -> None:
+    """Set the agent state of a new model, by agent code."""
+    ids = arrays["ids"].astype(object)
+    status, bounds = arrays["status"], arrays["bounds"]
+    if model.engine is not None:
+        engine, size = model.engine, len(ids)
+        engine.index.add(ids)
+        engine._reserve(size)
+        engine.status[:size] = status
+        engine.infected_at[:size] = arrays["infected_at"]
+        engine.bounds[:size] = bounds
+        engine.active[:size] = arrays["active"]
+        engine.last_seen[:size] = arrays["last_seen"]
+        return
+
+    model.agent_index.add(ids)
+    agents = PersonAgent.create_many(ids, model, bounds)
+    for agent, agent_status, infected_at in zip(
+        agents, status.tolist(), arrays["infected_at"].tolist()
+    ):
+        agent._status = Status(agent_status)
+        agent.infected_at = infected_at
+    model._code_agents.extend(agents)
+    model._code_rows.extend(np.array([agent.row for agent in agents]))
+    model._active.extend(arrays["active"])
+    model._last_seen.extend(arrays["last_seen"])
+    model.schedule.add_agents([agents[code] for code in arrays["schedule_codes"]])
+    model.infected.update(
+        (agents[code].unique_id, agents[code]) for code in arrays["infected_codes"]
+    )
+    model.dormant.update(
+        (agent.unique_id, agent)
+        for agent, active in zip(agents, arrays["active"])
+        if not active
+    )
+    grid_codes = arrays["grid_codes"]
+    model.grid.index.restore(
+        [agents[code] if code >= 0 else None for code in grid_codes.tolist()],
+        np.where((grid_codes >= 0)[:, None], bounds[grid_codes], np.nan),
+        arrays["grid_free"].tolist(),
+    )
+
+
+def load_checkpoint(path: str) -> Tuple[GeoCovidModel, Dict[str, Any]]:
+    """
+    Load a model saved by save_checkpoint.
+
+    Parameters
+    ----------
+    path : str
+        checkpoint file.
+    Returns
+    -------
+    Tuple[GeoCovidModel, Dict[str, Any]]
+        model as it was saved, and the state of the run saved with it.
+    """
+    with np.load(path) as npz:
+        arrays = dict(npz.items())
+    meta = json.loads(str(arrays.pop("meta")))
+    model = GeoCovidModel(**meta["params"])
+    _restore_agents(model, arrays)
+    model.status_counts = {
+        status: meta["status_counts"][status.name] for status in Status
+    }
+    model.steps = meta["steps"]
+    model.schedule.steps = meta["schedule_steps"]
+    model.schedule.time = meta["time"]
+    model.new_agents = meta["new_agents"]
+    model.rng.bit_generator.state = meta["rng"]
+    version, internal, gauss_next = meta["random"]
+    model.random.setstate((version, tuple(internal), gauss_next))
+
+    collector = model.datacollector
+    for name in collector.model_vars:
+        collector.model_vars[name] = arrays["model_vars.{}".format(name)].tolist()
+    for name, column in collector._agent_columns.items():
+        values = arrays["agent_vars.{}".format(name)]
+        restored = TypedColumn(column.values().dtype)
+        restored.extend(values.astype(restored.values().dtype))
+        collector._agent_columns[name] = restored
+    logger.info("checkpoint of step %d loaded from %s", model.steps, path)
+    return model, meta["state"]
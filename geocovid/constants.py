@@ -4,13 +4,18 @@ import os
 DEATH_PROB = 0.005
 INFECTION_PROB = 0.0005
 TREATMENT_PERIOD = 10
-EXPOSURE_DISTANCE = 0.0001
+EXPOSURE_DISTANCE = 10.0  # meters
+GRID_CELL_SIZE = 100.0  # meters
 INIT_INFECTED = 100
 MIN_DEATH_PERIOD = 7
+OUTLIER_AREA = 1000000.0  # square meters
 STEPS_PER_DAY = 24
+DORMANT_AFTER = None  # hours unseen before an agent goes dormant, never if None
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(ROOT_DIR, "data/")
 OUTPUT_DIR = os.path.join(ROOT_DIR, "outputs/")
-TMP_DIR = "/tmp/geocovid"
+CACHE_DIR = os.path.join(ROOT_DIR, "cache/")
 MAP_COORDS = [-34.8416827, -56.154205]
+# Positions are projected to meters, UTM zone 21S holds MAP_COORDS.
+METRIC_CRS = "EPSG:32721"
@@ -9,6 +9,17 @@ from pyspark.sql import SparkSession
 from pandas import DataFrame as p_df
 from geopandas import GeoDataFrame
 
+from geocovid.archive import COLUMNS
+from geocovid.constants import (
+    EXPOSURE_DISTANCE,
+    GRID_CELL_SIZE,
+    METRIC_CRS,
+    OUTLIER_AREA,
+)
+from geocovid.local_pipeline import remove_outliers_local
+from geocovid.profiling import PhaseTimer
+from geocovid.projection import PROJECTED_SCHEMA, project_batches
+
 
 def extract_data_spark(path, spark: SparkSession):
     """Read and return dataframe."""
@@ -16,58 +27,271 @@ def extract_data_spark(path, spark: SparkSession):
     return sdf
 
 
-def transform_data_spark(sdf, spark: SparkSession) -> GeoDataFrame:
-    """Transform Data."""
-    agg_df = aggregate_spatial_data(sdf, spark)
-    clean_df = remove_outliers(agg_df, spark)
-    gdf = spark_to_geopandas(clean_df)
+def project_data_spark(sdf, crs: str = METRIC_CRS):
+    """
+    Projection stage, the raw points with their coordinates in meters.
+
+    The executors project each Arrow batch with the same vectorized pyproj
+    transformation as project_data_local, instead of a geometry per point.
+
+    Parameters
+    ----------
+    sdf : DataFrame
+        raw points with id, timestamp, latitude and longitude.
+    crs : str
+        metric CRS to project to.
+    Returns
+    -------
+    DataFrame
+        id, timestamp, x and y of every point with all of them valid.
+    """
+    return sdf.select(*COLUMNS).mapInPandas(
+        lambda batches: project_batches(batches, crs), PROJECTED_SCHEMA
+    )
+
+
+def transform_data_spark(
+    sdf,
+    spark: SparkSession,
+    outlier_area: float = OUTLIER_AREA,
+    timer: PhaseTimer = None,
+) -> GeoDataFrame:
+    """
+    Transform Data.
+
+    The envelope of each (hour, id) leaves Spark as bbox float columns, and
+    the geometry with the outlier rule is built in pandas. Spark runs the
+    projection and the aggregation lazily, on toPandas, which is timed as
+    its own phase.
+    """
+    agg_df = aggregate_bounds_spark(project_data_spark(sdf), spark)
+    gdf = spark_to_geopandas(agg_df, outlier_area, timer)
     set_index_df(gdf)
     return gdf
 
 
-def aggregate_spatial_data(sdf, spark: SparkSession):
+def aggregate_bounds_spark(sdf, spark: SparkSession):
     """
-    Aggregate spatial data by hour and id.
+    Aggregate spatial data by hour and id, as bbox float columns.
 
-    Parameters
+    The envelope of the projected points of project_data_spark, as min/max
+    float columns instead of Sedona geometries.
     """
     sdf.createOrReplaceTempView("points")
-    point_df = spark.sql(
+    bounds_df = spark.sql(
         """
         SELECT points.id, hour(cast(points.timestamp AS timestamp)) AS h,
-                ST_Envelope_Aggr(ST_Point(cast(points.latitude AS Decimal(24,20)),
-                                          cast(points.longitude AS Decimal(24,20)))) 
-                AS geometry
-        FROM points group by h, id
+                min(points.x) AS minx, min(points.y) AS miny,
+                max(points.x) AS maxx, max(points.y) AS maxy
+        FROM points
+        group by h, id
+        """
+    )
+    return bounds_df
+
+
+def aggregate_days_spark(sdf, spark: SparkSession):
+    """
+    Aggregate spatial data by date, hour and id.
+
+    As aggregate_bounds_spark, over points of any amount of days, so the
+    day of each point is its date and not the file it came from.
+    """
+    sdf.createOrReplaceTempView("pings")
+    bounds_df = spark.sql(
+        """
+        SELECT to_date(cast(pings.timestamp AS timestamp)) AS date,
+                hour(cast(pings.timestamp AS timestamp)) AS h, pings.id,
+                min(pings.x) AS minx, min(pings.y) AS miny,
+                max(pings.x) AS maxx, max(pings.y) AS maxy
+        FROM pings
+        group by date, h, id
+        """
+    )
+    return bounds_df
+
+
+def build_positions_spark(paths, spark: SparkSession, path: str) -> None:
+    """
+    Aggregate the points of all days in one job, written partitioned.
+
+    Only the pipeline columns are read from the parquet files, exact
+    duplicate pings are dropped before the projection, and the envelopes
+    are written by date and hour, one file per hour, so the simulation reads
+    them back one hour at a time with read_position_days.
+
+    Parameters
+    ----------
+    paths : List[str]
+        directories of the parquet files of all days.
+    spark : SparkSession
+        spark session.
+    path : str
+        directory to write the positions.
+    """
+    sdf = spark.read.parquet(*paths).select(*COLUMNS).dropDuplicates()
+    bounds_df = aggregate_days_spark(project_data_spark(sdf), spark)
+    (
+        bounds_df.repartition("date", "h")
+        .write.mode("overwrite")
+        .partitionBy("date", "h")
+        .parquet(path)
+    )
+
+
+def carried_bounds_spark(bounds_df, carried_df, spark: SparkSession):
+    """
+    Envelopes of the agents before the move of each hour of a day.
+
+    As contact_pairs_local, agents seen on an earlier hour, of the day or
+    carried from the previous ones, keep their last envelope, and agents
+    seen for the first time are at their envelope of the hour. Each
+    envelope spans the hours after it up to the next one of its agent.
+
+    Parameters
+    ----------
+    bounds_df : DataFrame
+        h, id and bbox columns of the envelopes of a day.
+    carried_df : DataFrame
+        id and bbox columns of the last envelopes before the day, None if
+        no agent was seen before.
+    spark : SparkSession
+        spark session.
+    Returns
+    -------
+    DataFrame
+        h, id and bbox columns of every agent known on each hour of the day.
+    """
+    if carried_df is None:
+        carried_df = bounds_df.drop("h").limit(0)
+    bounds_df.createOrReplaceTempView("day_bounds")
+    carried_df.createOrReplaceTempView("carried_bounds")
+    carried_bounds_df = spark.sql(
+        """
+        WITH states AS (
+            SELECT id, h, minx, miny, maxx, maxy FROM day_bounds
+            UNION ALL
+            SELECT id, -1 AS h, minx, miny, maxx, maxy FROM carried_bounds
+        ), spans AS (
+            SELECT *,
+                lead(h) OVER (PARTITION BY id ORDER BY h) AS next_h,
+                min(h) OVER (PARTITION BY id) = h AS is_first
+            FROM states
+        ), hours AS (
+            SELECT DISTINCT h FROM day_bounds
+        )
+        SELECT hours.h, spans.id, spans.minx, spans.miny, spans.maxx, spans.maxy
+        FROM spans JOIN hours
+            ON (spans.h < hours.h
+                AND (spans.next_h IS NULL OR hours.h <= spans.next_h))
+            OR (spans.is_first AND spans.h = hours.h)
         """
     )
-    return point_df
+    return carried_bounds_df
 
 
-def remove_outliers(sdf, spark: SparkSession):
+def contact_pairs_spark(
+    sdf,
+    spark: SparkSession,
+    exposure_distance: float = EXPOSURE_DISTANCE,
+    cell_size: float = GRID_CELL_SIZE,
+):
     """
-    Remove outliers when the aggregated area is too big.
+    Find the pairs of agents within exposure distance on each hour.
 
-    If the area is too big it returns the centroid.
+    A bucketed self-join: every envelope, grown by half the exposure
+    distance, is exploded into the grid cells it covers, and envelopes of
+    the same (h, cell) are matched. A pair shares several cells when the
+    envelopes are big, so it is only kept in the cell of the lower corner of
+    the intersection of the grown envelopes, that both cover.
+
+    Parameters
+    ----------
+    sdf : DataFrame
+        id, h and minx, miny, maxx, maxy of each envelope, without outliers.
+    spark : SparkSession
+        spark session.
+    exposure_distance : float
+        maximum distance between the envelopes of a contact.
+    cell_size : float
+        side of the grid cells, at least the exposure distance.
+    Returns
+    -------
+    DataFrame
+        h, src and dst id of each contact, with src < dst.
     """
-    sdf.createOrReplaceTempView("points_agg")
-    clean_df = spark.sql(
+    cell = max(exposure_distance, cell_size)
+    half = exposure_distance / 2
+    sdf.createOrReplaceTempView("envelopes")
+    spark.sql(
         """
-        SELECT id, h,
-            CASE WHEN ST_Area(points_agg.geometry) < 0.0001
-            THEN points_agg.geometry
-            ELSE ST_Centroid(points_agg.geometry)
-            END as geometry
-        FROM points_agg
+        SELECT id, h, minx, miny, maxx, maxy, cx, cy
+        FROM envelopes
+        LATERAL VIEW explode(sequence(
+            cast(floor((minx - {half}) / {cell}) AS bigint),
+            cast(floor((maxx + {half}) / {cell}) AS bigint))) AS cx
+        LATERAL VIEW explode(sequence(
+            cast(floor((miny - {half}) / {cell}) AS bigint),
+            cast(floor((maxy + {half}) / {cell}) AS bigint))) AS cy
+        """.format(half=half, cell=cell)
+    ).createOrReplaceTempView("envelope_cells")
+    pairs_df = spark.sql(
         """
+        SELECT a.h, a.id AS src, b.id AS dst
+        FROM envelope_cells a JOIN envelope_cells b
+            ON a.h = b.h AND a.cx = b.cx AND a.cy = b.cy AND a.id < b.id
+        WHERE floor((greatest(a.minx, b.minx) - {half}) / {cell}) = a.cx
+            AND floor((greatest(a.miny, b.miny) - {half}) / {cell}) = a.cy
+            AND hypot(greatest(0, a.minx - b.maxx, b.minx - a.maxx),
+                      greatest(0, a.miny - b.maxy, b.miny - a.maxy))
+                <= {distance}
+        """.format(half=half, cell=cell, distance=exposure_distance)
     )
-    return clean_df
+    return pairs_df
+
+
+def write_contacts_spark(sdf, path: str) -> None:
+    """Write contact pairs as Parquet edge lists, partitioned by hour."""
+    sdf.write.mode("overwrite").partitionBy("h").parquet(path)
 
 
-def spark_to_geopandas(sdf) -> GeoDataFrame:
-    """Convert Spark DF to GeoPandas DF."""
-    pandas_df = sdf.toPandas()
-    gdf = gpd.GeoDataFrame(pandas_df, geometry="geometry")
+def extract_contacts_spark(
+    bounds_df,
+    carried_df,
+    spark: SparkSession,
+    path: str,
+    exposure_distance: float = EXPOSURE_DISTANCE,
+) -> None:
+    """
+    Contact extraction stage, written by the cluster as hourly edge lists.
+
+    The pairwise proximity work runs inside Spark, from the envelopes of
+    transform_data_spark, outliers already removed, as h, id and bbox
+    columns, carried forward over the last envelopes of the previous days.
+    """
+    write_contacts_spark(
+        contact_pairs_spark(
+            carried_bounds_spark(bounds_df, carried_df, spark),
+            spark,
+            exposure_distance,
+        ),
+        path,
+    )
+
+
+def spark_to_geopandas(
+    sdf, outlier_area: float = OUTLIER_AREA, timer: PhaseTimer = None
+) -> GeoDataFrame:
+    """
+    Convert Spark DF of envelopes to GeoPandas DF.
+
+    Only float columns are collected, so toPandas moves them with Arrow
+    instead of deserializing a geometry UDT row by row.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    with timer.phase("toPandas"):
+        pandas_df = sdf.toPandas()
+    gdf = remove_outliers_local(pandas_df, outlier_area)
     return gdf
 
 
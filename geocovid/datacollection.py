@@ -1,32 +1,124 @@
 """Data collectors."""
-import itertools
+from typing import Any, Callable, Dict
 
+from mesa import Model
 from mesa.datacollection import DataCollector
+import numpy as np
 import pandas as pd
 
 from geocovid.constants import STEPS_PER_DAY
 
 
+class TypedColumn:
+    """Growable column of values with a fixed dtype."""
+
+    def __init__(self, dtype: Any, capacity: int = 1024) -> None:
+        """Init method."""
+        self._values = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Amount of values."""
+        return self._size
+
+    def extend(self, values: np.ndarray) -> None:
+        """Append values, doubling the preallocated capacity when full."""
+        size = self._size + len(values)
+        if size > len(self._values):
+            capacity = max(size, 2 * len(self._values))
+            grown = np.empty(capacity, dtype=self._values.dtype)
+            grown[: self._size] = self._values[: self._size]
+            self._values = grown
+        self._values[self._size : size] = values
+        self._size = size
+
+    def truncate(self, size: int) -> None:
+        """Keep only the first values."""
+        self._size = min(size, self._size)
+
+    def values(self) -> np.ndarray:
+        """Collected values."""
+        return self._values[: self._size]
+
+
 class AggDataCollector(DataCollector):
-    """Data Collector with aggregation."""
+    """
+    Data Collector with aggregation.
+
+    Model variables are collected on every step, agent variables only once per
+    day, into typed columns instead of one tuple per agent.
+    Agent reporters are column reporters: they take the model and return one
+    value per agent, in the order given by agent_ids.
+    """
 
-    def get_agent_vars_dataframe(self):
+    def __init__(
+        self,
+        model_reporters: Dict[str, Callable] = None,
+        agent_reporters: Dict[str, Callable[[Model], np.ndarray]] = None,
+        tables: Dict[str, list] = None,
+        agent_ids: Callable[[Model], np.ndarray] = None,
+        dtypes: Dict[str, Any] = None,
+    ) -> None:
+        """
+        Init method.
+
+        Parameters
+        ----------
+        model_reporters : Dict[str, Callable]
+            model variable names and functions of the model.
+        agent_reporters : Dict[str, Callable[[Model], np.ndarray]]
+            agent variable names and column reporters.
+        tables : Dict[str, list]
+            table names and columns.
+        agent_ids : Callable[[Model], np.ndarray]
+            ids of the agents, in the order of the column reporters.
+        dtypes : Dict[str, Any]
+            dtype to store each agent variable with, float64 by default.
+        """
+        super().__init__(model_reporters, agent_reporters, tables)
+        self.agent_ids = agent_ids
+        dtypes = dtypes or {}
+        self._agent_columns = {
+            "Step": TypedColumn(np.int32),
+            "AgentID": TypedColumn(object),
+        }
+        for rep_name in self.agent_reporters:
+            self._agent_columns[rep_name] = TypedColumn(
+                dtypes.get(rep_name, np.float64)
+            )
+
+    def collect(self, model: Model) -> None:
+        """Collect model variables every step, agent variables once per day."""
+        for var, reporter in self.model_reporters.items():
+            if isinstance(reporter, list):
+                self.model_vars[var].append(reporter[0](*reporter[1]))
+            else:
+                self.model_vars[var].append(reporter(model))
+
+        step = model.schedule.steps
+        if self.agent_reporters and step % STEPS_PER_DAY == 0:
+            agent_ids = self.agent_ids(model)
+            self._agent_columns["Step"].extend(np.full(len(agent_ids), step))
+            self._agent_columns["AgentID"].extend(agent_ids)
+            for rep_name, reporter in self.agent_reporters.items():
+                self._agent_columns[rep_name].extend(reporter(model))
+
+    def get_agent_vars_dataframe(self) -> pd.DataFrame:
         """
         Create a pandas DataFrame from the agent variables.
 
         The DataFrame has one column for each variable, with two additional
         columns for tick and agent_id.
         """
-        subset_records = [
-            record
-            for step, record in self._agent_records.items()
-            if step % STEPS_PER_DAY == 0
-        ]
-        records_iterable = itertools.chain.from_iterable(subset_records)
-        rep_names = [rep_name for rep_name in self.agent_reporters]
-
-        df_agents = pd.DataFrame.from_records(
-            data=records_iterable, columns=["Step", "AgentID"] + rep_names,
+        df_agents = pd.DataFrame(
+            {name: column.values() for name, column in self._agent_columns.items()}
         )
         df_agents = df_agents.set_index(["Step", "AgentID"])
         return df_agents
+
+    def pop_agent_vars_dataframe(self) -> pd.DataFrame:
+        """Create a pandas DataFrame from the agent variables and release them."""
+        df_agents = self.get_agent_vars_dataframe()
+        for name, column in self._agent_columns.items():
+            self._agent_columns[name] = TypedColumn(column.values().dtype)
+        return df_agents
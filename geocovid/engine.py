@@ -0,0 +1,512 @@
+"""Vectorized engine for a SIR Model."""
+import logging
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+from geopandas import GeoDataFrame
+from mesa import Model
+import numpy as np
+import pandas as pd
+
+from geocovid.agent import Status
+from geocovid.constants import STEPS_PER_DAY
+from geocovid.datacollection import TypedColumn
+from geocovid.spatial import query_pairs
+
+logger = logging.getLogger(__name__)
+
+
+def frame_bounds(gdf: GeoDataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split a step GeoDataFrame into agent ids and bounding boxes.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        positions of a step, indexed by agent id.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        agent ids and (n, 4) array of minx, miny, maxx, maxy.
+    """
+    keys = gdf.index.to_numpy()
+    bounds = gdf.geometry.bounds.to_numpy(dtype=np.float64)
+    return keys, bounds
+
+
+class DenseIds:
+    """
+    Map of agent ids to dense int32 codes, numbered by first appearance.
+
+    The mapping is kept across steps and days, and looked up in bulk with a
+    pandas hash index instead of one dict access per agent. Ids coded since the
+    index was built are kept in a dict, and merged into a new index once they
+    are an eighth of all the ids, so adding ids takes amortized constant time
+    instead of copying and hashing the whole index again.
+    """
+
+    def __init__(self) -> None:
+        """Init method."""
+        self._index = pd.Index([], dtype=object)
+        self._recent: Dict[Hashable, int] = {}
+        self._ids = TypedColumn(object)
+        self._moved = False
+
+    def __len__(self) -> int:
+        """Amount of ids."""
+        return len(self._ids)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check if an id has a code."""
+        return self._code(key) >= 0
+
+    def __getitem__(self, key: Hashable) -> int:
+        """Code of an id."""
+        code = self._code(key)
+        if code < 0:
+            raise KeyError(key)
+        return code
+
+    def _code(self, key: Hashable) -> int:
+        """Code of an id, -1 if unknown."""
+        keys = np.empty(1, dtype=object)
+        keys[0] = key
+        return int(self.codes(keys)[0])
+
+    def codes(self, keys: np.ndarray) -> np.ndarray:
+        """Codes of the given ids, -1 for unknown ones."""
+        keys = np.asarray(keys)
+        codes = self._index.get_indexer(keys).astype(np.int32)
+        found = codes >= 0
+        if self._moved:
+            # ids moved or removed since the index was built keep stale codes
+            found[found] = codes[found] < len(self)
+            found[found] = self._ids.values()[codes[found]] == keys[found]
+            codes[~found] = -1
+        if self._recent:
+            missing = np.flatnonzero(~found)
+            codes[missing] = [self._recent.get(key, -1) for key in keys[missing]]
+        return codes
+
+    def add(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Code the given ids, adding the unknown ones after the known.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            ids, unique.
+        Returns
+        -------
+        np.ndarray
+            int32 code of each id.
+        """
+        codes = self.codes(keys)
+        is_new = codes < 0
+        if is_new.any():
+            start = len(self)
+            self._ids.extend(keys[is_new])
+            codes[is_new] = np.arange(start, len(self), dtype=np.int32)
+            self._recent.update(zip(keys[is_new].tolist(), range(start, len(self))))
+            self._merge()
+        return codes
+
+    def remove(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Remove ids, moving the last ones into their codes to keep them dense.
+
+        Parameters
+        ----------
+        codes : np.ndarray
+            codes of the ids to remove, unique.
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            old and new codes of the moved ids, to move their data alike.
+        """
+        size = len(self) - len(codes)
+        removed = np.zeros(len(self), dtype=bool)
+        removed[codes] = True
+        moved_to = np.flatnonzero(removed[:size])
+        moved_from = size + np.flatnonzero(~removed[size:])
+        ids = self._ids.values()
+        for key in ids[codes].tolist():
+            self._recent.pop(key, None)
+        ids[moved_to] = ids[moved_from]
+        self._ids.truncate(size)
+        self._recent.update(zip(ids[moved_to].tolist(), moved_to.tolist()))
+        self._moved = True
+        self._merge()
+        return moved_from, moved_to
+
+    def _merge(self) -> None:
+        """Index the recent ids once they are an eighth of all the ids."""
+        if 8 * len(self._recent) > len(self):
+            self._index = pd.Index(self._ids.values().copy(), dtype=object)
+            self._recent = {}
+            self._moved = False
+
+    def ids(self) -> np.ndarray:
+        """Ids of all the codes."""
+        return self._ids.values()
+
+
+def align_positions(
+    codes: np.ndarray, bounds: np.ndarray, size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Align the positions of a step to the dense agent codes.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        codes of the agents of the step.
+    bounds : np.ndarray
+        (n, 4) positions of those agents.
+    size : int
+        amount of agents.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        mask of the agents with a position in the step, and (size, 4)
+        positions aligned to the codes, NaN for the rest.
+    """
+    known = codes >= 0
+    has_shape = np.isfinite(bounds).all(axis=1)
+    present = np.zeros(size, dtype=bool)
+    present[codes[known & has_shape]] = True
+    aligned = np.full((size, 4), np.nan)
+    aligned[codes[known]] = bounds[known]
+    return present, aligned
+
+
+def draw_infections(
+    rng: np.random.Generator, contacts: np.ndarray, infection_prob: float
+) -> np.ndarray:
+    """
+    Draw the new infections among the contacts of all infected agents.
+
+    Every (infected, contact) pair is an independent chance to infect with
+    infection_prob, all drawn at once.
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        random generator of the model.
+    contacts : np.ndarray
+        contact of each (infected, contact) pair within exposure distance.
+    infection_prob : float
+        probability of infection for each pair.
+    Returns
+    -------
+    np.ndarray
+        unique contacts that get infected.
+    """
+    infect = rng.random(len(contacts)) <= infection_prob
+    return np.unique(contacts[infect])
+
+
+def pair_contacts(status: np.ndarray, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Susceptible contacts of the infected agent of each undirected pair.
+
+    Parameters
+    ----------
+    status : np.ndarray
+        status of the agents, by code.
+    src : np.ndarray
+        code of the first agent of each pair.
+    dst : np.ndarray
+        code of the second agent of each pair.
+    Returns
+    -------
+    np.ndarray
+        code of the contact of each (infected, susceptible) pair, sorted by
+        infected and contact code, so draws do not depend on the pair order.
+    """
+    infected = status == Status.INFECTED
+    susceptible = status == Status.SUSCEPTIBLE
+    forward = infected[src] & susceptible[dst]
+    backward = infected[dst] & susceptible[src]
+    sources = np.concatenate([src[forward], dst[backward]])
+    contacts = np.concatenate([dst[forward], src[backward]])
+    return contacts[np.lexsort((contacts, sources))]
+
+
+def draw_transitions(
+    rng: np.random.Generator,
+    elapsed: np.ndarray,
+    death_prob: float,
+    min_death_period: int,
+    treatment_period: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw deaths and recoveries of all infected agents at once.
+
+    Agents infected for at least min_death_period steps die with death_prob,
+    the survivors recover once treatment_period steps have elapsed.
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        random generator of the model.
+    elapsed : np.ndarray
+        steps elapsed since each infected agent got infected.
+    death_prob : float
+        probability of death on each step.
+    min_death_period : int
+        steps before an infected agent may die or recover.
+    treatment_period : int
+        steps before an infected agent recovers.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        positions in elapsed of the dead and the recovered agents.
+    """
+    eligible = np.flatnonzero(elapsed >= min_death_period)
+    dies = rng.random(len(eligible)) < death_prob
+    recovers = ~dies & (elapsed[eligible] >= treatment_period)
+    return eligible[dies], eligible[recovers]
+
+
+class VectorizedEngine:
+    """
+    Array-backed alternative to stepping PersonAgent objects.
+
+    Status, infection time and position of every agent are kept in NumPy
+    arrays indexed by the dense agent code, so a model step runs as a few bulk
+    operations: check, interact and move, in the same order as PersonAgent.step.
+    Agents not seen for model.dormant_after steps are marked dormant and left
+    out of the contact candidates until they are seen again.
+    """
+
+    def __init__(self, model: Model, capacity: int = 1024) -> None:
+        """Init method."""
+        self.model = model
+        self.index = DenseIds()
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.infected_at = np.zeros(capacity, dtype=np.int64)
+        self.bounds = np.full((capacity, 4), np.nan)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        """Amount of agents."""
+        return len(self.index)
+
+    def _reserve(self, size: int) -> None:
+        """Grow the state arrays to hold at least size agents."""
+        capacity = len(self.status)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        used = len(self.status)
+        status = np.zeros(capacity, dtype=np.int8)
+        status[:used] = self.status[:used]
+        infected_at = np.zeros(capacity, dtype=np.int64)
+        infected_at[:used] = self.infected_at[:used]
+        bounds = np.full((capacity, 4), np.nan)
+        bounds[:used] = self.bounds[:used]
+        active = np.zeros(capacity, dtype=bool)
+        active[:used] = self.active[:used]
+        last_seen = np.zeros(capacity, dtype=np.int64)
+        last_seen[:used] = self.last_seen[:used]
+        self.status, self.infected_at, self.bounds = status, infected_at, bounds
+        self.active, self.last_seen = active, last_seen
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Dense agent codes of the given agent ids."""
+        return self.index.codes(keys)
+
+    def add_agents(self, keys: np.ndarray, bounds: np.ndarray) -> int:
+        """
+        Create agents not currently present in the engine.
+
+        Dormant agents with a position in the step are brought back, at that
+        position.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            agent ids of a step.
+        bounds : np.ndarray
+            (n, 4) positions of those agents.
+        Returns
+        -------
+        int
+            amount of new agents created.
+        """
+        start = len(self)
+        codes = self.index.add(keys)
+        stop = len(self)
+        self._reserve(stop)
+        self.status[start:stop] = Status.SUSCEPTIBLE
+        self.model.update_counts(None, Status.SUSCEPTIBLE, stop - start)
+        self.infected_at[start:stop] = 0
+        is_new = codes >= start
+        self.bounds[codes[is_new]] = bounds[is_new]
+        self.active[start:stop] = True
+        woken = ~self.active[codes] & np.isfinite(bounds).all(axis=1)
+        self.active[codes[woken]] = True
+        self.bounds[codes[woken]] = bounds[woken]
+        logger.info("new %d agents created", stop - start)
+        if woken.any():
+            logger.info("%d dormant agents woken", np.count_nonzero(woken))
+        return stop - start
+
+    def init_infected(self, init_infected: Union[int, List]) -> None:
+        """Infect the initial agents, chosen by id or at random."""
+        if isinstance(init_infected, List):
+            selected = np.asarray(
+                [self.index[key] for key in init_infected if key in self.index],
+                dtype=np.int64,
+            )
+            proportion = len(selected) / len(init_infected)
+            logger.info("init infected from list, with a proportion %f", proportion)
+        elif len(self):
+            selected = self.model.rng.integers(len(self), size=init_infected)
+        else:
+            selected = np.empty(0, dtype=np.int64)
+        self.set_status(np.unique(selected), Status.INFECTED)
+        logger.info("init %d agents infected", len(selected))
+
+    def check(self, time: int) -> None:
+        """Check the status of all infected agents."""
+        infected = np.flatnonzero(self.status[: len(self)] == Status.INFECTED)
+        dead, recovered = draw_transitions(
+            self.model.rng,
+            time - self.infected_at[infected],
+            self.model.death_prob,
+            self.model.min_death_period * STEPS_PER_DAY,
+            self.model.treatment_period * STEPS_PER_DAY,
+        )
+        self.set_status(infected[dead], Status.DEAD)
+        self.set_status(infected[recovered], Status.RECOVERED)
+
+    def interact(self, time: int) -> int:
+        """
+        Infected agents interact with the active susceptible agents.
+
+        Returns
+        -------
+        int
+            amount of new infected agents.
+        """
+        status = self.status[: len(self)]
+        infected = np.flatnonzero(status == Status.INFECTED)
+        others = np.flatnonzero(
+            (status == Status.SUSCEPTIBLE) & self.active[: len(self)]
+        )
+        _, contacts = query_pairs(
+            self.bounds[infected], self.bounds[others], self.model.exposure_distance
+        )
+        new_infected = draw_infections(
+            self.model.rng, others[contacts], self.model.infection_prob
+        )
+        self.set_status(new_infected, Status.INFECTED)
+        self.infected_at[new_infected] = time
+        return len(new_infected)
+
+    def interact_contacts(self, src: np.ndarray, dst: np.ndarray, time: int) -> int:
+        """
+        Infected agents interact with their susceptible contacts.
+
+        Parameters
+        ----------
+        src : np.ndarray
+            code of the first agent of each contact.
+        dst : np.ndarray
+            code of the second agent of each contact.
+        time : int
+            step time.
+        Returns
+        -------
+        int
+            amount of new infected agents.
+        """
+        contacts = pair_contacts(self.status[: len(self)], src, dst)
+        new_infected = draw_infections(
+            self.model.rng, contacts, self.model.infection_prob
+        )
+        self.set_status(new_infected, Status.INFECTED)
+        self.infected_at[new_infected] = time
+        return len(new_infected)
+
+    def move(self, keys: np.ndarray, bounds: np.ndarray, time: int) -> None:
+        """Move the agents present in a step, the rest stay in the same place."""
+        present, aligned = align_positions(self.rows(keys), bounds, len(self))
+        self.bounds[: len(self)][present] = aligned[present]
+        self.last_seen[: len(self)][present] = time
+
+    def sleep(self, time: int) -> None:
+        """
+        Mark dormant the agents not seen for model.dormant_after steps.
+
+        Infected agents stay active, so their status keeps being checked.
+        """
+        if self.model.dormant_after is None:
+            return
+        idle = (
+            self.active[: len(self)]
+            & (time - self.last_seen[: len(self)] >= self.model.dormant_after)
+            & (self.status[: len(self)] != Status.INFECTED)
+        )
+        self.active[: len(self)][idle] = False
+        logger.info("%d agents dormant", np.count_nonzero(idle))
+
+    def active_rows(self) -> np.ndarray:
+        """Dense codes of the agents that are not dormant."""
+        return np.flatnonzero(self.active[: len(self)])
+
+    def step(
+        self,
+        keys: np.ndarray,
+        bounds: np.ndarray,
+        time: int,
+        contacts: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> int:
+        """
+        One step of all the agents.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            ids of the agents present in the step.
+        bounds : np.ndarray
+            (n, 4) positions of those agents.
+        time : int
+            step time.
+        contacts : Optional[Tuple[np.ndarray, np.ndarray]]
+            ids of the agent pairs in contact in the step, used instead of
+            querying the positions.
+        Returns
+        -------
+        int
+            amount of new infected agents.
+        """
+        timer = self.model.timer
+        with timer.phase("check"):
+            self.check(time)
+        with timer.phase("interact"):
+            if contacts is None:
+                infections = self.interact(time)
+            else:
+                src, dst = (self.rows(ids) for ids in contacts)
+                known = (src >= 0) & (dst >= 0)
+                infections = self.interact_contacts(src[known], dst[known], time)
+        with timer.phase("move"):
+            self.move(keys, bounds, time)
+        with timer.phase("dormancy"):
+            self.sleep(time)
+        return infections
+
+    def set_status(self, rows: np.ndarray, status: Status) -> None:
+        """Set the status of unique agents, keeping the model counters up to date."""
+        previous, amounts = np.unique(self.status[rows], return_counts=True)
+        for old_status, amount in zip(previous, amounts):
+            self.model.update_counts(Status(old_status), status, int(amount))
+        self.status[rows] = status
+
+    def count(self, status: Status) -> int:
+        """Amount of agents in a given status, scanning all agents."""
+        return int(np.count_nonzero(self.status[: len(self)] == status))
@@ -0,0 +1,485 @@
+"""Single node data pipeline, the same transformation as Spark with pandas."""
+from datetime import datetime
+import glob
+import logging
+import os
+from typing import Iterator, List, Tuple
+
+from dateutil import tz
+from geopandas import GeoDataFrame
+from geopandas.array import GeometryArray
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from shapely.geometry import Point, Polygon
+
+from geocovid.archive import COLUMNS
+from geocovid.constants import EXPOSURE_DISTANCE, OUTLIER_AREA
+from geocovid.projection import project_data_local
+from geocovid.spatial import carried_pairs
+
+logger = logging.getLogger(__name__)
+
+QUARTER_HOUR = 15 * 60
+
+
+def parquet_files(path: str) -> List[str]:
+    """Parquet files under a directory, without hidden and metadata files."""
+    files = glob.glob(os.path.join(path, "**", "*"), recursive=True)
+    return sorted(
+        file
+        for file in files
+        if os.path.isfile(file) and not os.path.basename(file).startswith((".", "_"))
+    )
+
+
+def extract_data_local(path: str) -> pd.DataFrame:
+    """
+    Read the raw points of all the parquet files under a directory.
+
+    Only the columns used by the pipeline are read. Corrupt files are skipped,
+    as Spark does with spark.sql.files.ignoreCorruptFiles.
+
+    Parameters
+    ----------
+    path : str
+        directory with the parquet files.
+    Returns
+    -------
+    pd.DataFrame
+        id, timestamp, latitude and longitude of every point.
+    """
+    tables = []
+    for file in parquet_files(path):
+        try:
+            tables.append(pq.read_table(file, columns=COLUMNS))
+        except (pa.ArrowException, OSError) as error:
+            logger.warning("skipped corrupt file %s: %s", file, error)
+    if not tables:
+        return pd.DataFrame(columns=COLUMNS)
+    return pa.concat_tables(tables, promote=True).to_pandas()
+
+
+def local_hours(timestamp: pd.Series) -> np.ndarray:
+    """
+    Hour of the day of unix timestamps in the local timezone.
+
+    Timezone offsets change on quarter hours, so only one timestamp of each
+    quarter hour is converted, instead of every point.
+
+    Parameters
+    ----------
+    timestamp : pd.Series
+        seconds since the epoch, NaN when missing.
+    Returns
+    -------
+    np.ndarray
+        local hour of each timestamp, NaN when missing.
+    """
+    hours = np.full(len(timestamp), np.nan)
+    valid = timestamp.notna().to_numpy()
+    quarters, inverse = np.unique(
+        timestamp[valid].to_numpy() // QUARTER_HOUR, return_inverse=True
+    )
+    quarter_hours = [
+        datetime.fromtimestamp(quarter * QUARTER_HOUR, tz.tzlocal()).hour
+        for quarter in quarters
+    ]
+    hours[valid] = np.array(quarter_hours, dtype=np.float64)[inverse]
+    return hours
+
+
+def local_dates(timestamp: pd.Series) -> np.ndarray:
+    """
+    Date of unix timestamps in the local timezone, as ISO strings.
+
+    Converted once per quarter hour, as local_hours.
+
+    Parameters
+    ----------
+    timestamp : pd.Series
+        seconds since the epoch, NaN when missing.
+    Returns
+    -------
+    np.ndarray
+        local date of each timestamp, None when missing.
+    """
+    dates = np.full(len(timestamp), None, dtype=object)
+    valid = timestamp.notna().to_numpy()
+    quarters, inverse = np.unique(
+        timestamp[valid].to_numpy() // QUARTER_HOUR, return_inverse=True
+    )
+    quarter_dates = [
+        datetime.fromtimestamp(quarter * QUARTER_HOUR, tz.tzlocal()).date().isoformat()
+        for quarter in quarters
+    ]
+    dates[valid] = np.array(quarter_dates, dtype=object)[inverse]
+    return dates
+
+
+def aggregate_spatial_data_local(points: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate spatial data by hour and id.
+
+    The envelope of the points of each (hour, id) is computed with a groupby
+    min/max over the projected coordinates, x being the easting and y the
+    northing in meters. Hours are taken in the local timezone, as Spark
+    hour() does.
+
+    Parameters
+    ----------
+    points : pd.DataFrame
+        projected points with id, timestamp, x and y, as project_data_local.
+    Returns
+    -------
+    pd.DataFrame
+        id, h and the minx, miny, maxx, maxy envelope of each group.
+    """
+    points = pd.DataFrame(
+        {
+            "id": points["id"],
+            "h": local_hours(points["timestamp"]),
+            "x": points["x"],
+            "y": points["y"],
+        }
+    ).dropna()
+    agg_df = (
+        points.groupby(["h", "id"], sort=True)
+        .agg(minx=("x", "min"), miny=("y", "min"), maxx=("x", "max"), maxy=("y", "max"))
+        .reset_index()
+    )
+    agg_df["h"] = agg_df["h"].astype(np.int32)
+    return agg_df
+
+
+def remove_outliers_local(
+    agg_df: pd.DataFrame, outlier_area: float = OUTLIER_AREA
+) -> GeoDataFrame:
+    """
+    Remove outliers when the aggregated area is too big.
+
+    If the area is not below outlier_area the centroid is returned, otherwise
+    the envelope polygon, with the same ring as ST_Envelope_Aggr.
+    """
+    minx, miny, maxx, maxy = (
+        agg_df[column].to_numpy() for column in ["minx", "miny", "maxx", "maxy"]
+    )
+    is_outlier = (maxx - minx) * (maxy - miny) >= outlier_area
+    centroid_x, centroid_y = (minx + maxx) / 2, (miny + maxy) / 2
+    geometry = np.empty(len(agg_df), dtype=object)
+    for row in np.flatnonzero(is_outlier).tolist():
+        geometry[row] = Point(centroid_x[row], centroid_y[row])
+    for row in np.flatnonzero(~is_outlier).tolist():
+        x0, y0, x1, y1 = minx[row], miny[row], maxx[row], maxy[row]
+        geometry[row] = Polygon([(x0, y0), (x0, y1), (x1, y1), (x1, y0), (x0, y0)])
+    # GeometryArray takes the shapely objects as they are, GeoDataFrame would
+    # convert a list of them through the numpy array interface, one by one.
+    return GeoDataFrame(agg_df[["id", "h"]], geometry=GeometryArray(geometry))
+
+
+def transform_data_local(
+    df: pd.DataFrame, outlier_area: float = OUTLIER_AREA
+) -> GeoDataFrame:
+    """
+    Transform Data, as transform_data_spark without Spark.
+
+    Points are projected to meters before their envelopes are aggregated.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        raw points with id, timestamp, latitude and longitude.
+    outlier_area : float
+        area from which an envelope is replaced by its centroid.
+    Returns
+    -------
+    GeoDataFrame
+        position of each agent, indexed by hour and id.
+    """
+    agg_df = aggregate_spatial_data_local(project_data_local(df))
+    gdf = remove_outliers_local(agg_df, outlier_area)
+    gdf.set_index(["h", "id"], inplace=True)
+    return gdf
+
+
+def last_positions_local(
+    gdf: GeoDataFrame, carried: pd.DataFrame = None
+) -> pd.DataFrame:
+    """
+    Last known envelope of each agent after a day, carried to the next one.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        positions of the day, indexed by hour and id.
+    carried : pd.DataFrame
+        last envelopes before the day, as returned for the previous one.
+    Returns
+    -------
+    pd.DataFrame
+        minx, miny, maxx and maxy of every agent seen so far, indexed by id.
+    """
+    last = gdf.geometry.bounds.sort_index(level=0, kind="stable").droplevel(0)
+    if carried is not None:
+        last = pd.concat([carried, last])
+    return last[~last.index.duplicated(keep="last")]
+
+
+def contact_pairs_local(
+    gdf: GeoDataFrame,
+    exposure_distance: float = EXPOSURE_DISTANCE,
+    carried: pd.DataFrame = None,
+) -> pd.DataFrame:
+    """
+    Find the pairs of agents within exposure distance on each hour.
+
+    The contacts the models query on each step, the carried_pairs of the
+    transformed positions: agents missing on an hour, of this day or of the
+    carried ones, keep their last envelope, and the pairs of an hour are
+    found before moving the agents to it. The same pairs as
+    contact_pairs_spark over carried_bounds_spark.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        positions of each agent, indexed by hour and id.
+    exposure_distance : float
+        maximum distance between the positions of a contact.
+    carried : pd.DataFrame
+        last envelopes of the agents seen before the day, indexed by id, as
+        last_positions_local returns them.
+    Returns
+    -------
+    pd.DataFrame
+        h, src and dst id of each contact, with src < dst, sorted.
+    """
+    gdf = gdf.sort_index()
+    hours = gdf.index.get_level_values(0).to_numpy()
+    ids = gdf.index.get_level_values(1)
+    bounds = gdf.geometry.bounds.to_numpy(dtype=np.float64)
+    known, initial = pd.Index([], dtype=object), np.empty((0, 4))
+    if carried is not None:
+        known = carried.index
+        initial = carried[["minx", "miny", "maxx", "maxy"]].to_numpy(np.float64)
+    known = known.append(ids).unique()
+    codes = known.get_indexer(ids)
+    starts = np.flatnonzero(np.r_[len(hours) > 0, hours[1:] != hours[:-1]])
+    stops = np.r_[starts[1:], len(hours)]
+    hourly_pairs = carried_pairs(
+        ((codes[start:stop], bounds[start:stop]) for start, stop in zip(starts, stops)),
+        exposure_distance,
+        initial,
+    )
+    hour, src, dst = [np.empty(0, dtype=np.int32)], [], []
+    for start, (_, hour_src, hour_dst) in zip(starts, hourly_pairs):
+        hour.append(np.full(len(hour_src), hours[start], dtype=np.int32))
+        src.append(known[hour_src].to_numpy())
+        dst.append(known[hour_dst].to_numpy())
+    src = np.concatenate([np.empty(0, dtype=object)] + src)
+    dst = np.concatenate([np.empty(0, dtype=object)] + dst)
+    swap = src > dst
+    src[swap], dst[swap] = dst[swap], src[swap]
+    pairs = pd.DataFrame({"h": np.concatenate(hour), "src": src, "dst": dst})
+    return pairs.sort_values(["h", "src", "dst"], ignore_index=True)
+
+
+def write_contacts_local(pairs: pd.DataFrame, path: str) -> None:
+    """Write contact pairs as Parquet edge lists, partitioned by hour."""
+    os.makedirs(path, exist_ok=True)
+    if pairs.empty:
+        return
+    pq.write_to_dataset(
+        pa.Table.from_pandas(pairs, preserve_index=False), path, partition_cols=["h"]
+    )
+
+
+def read_contacts(path: str) -> pd.DataFrame:
+    """
+    Read the contact pairs written by write_contacts_local or the Spark stage.
+
+    Parameters
+    ----------
+    path : str
+        directory of the edge lists, partitioned by hour.
+    Returns
+    -------
+    pd.DataFrame
+        h, src and dst id of each contact.
+    """
+    files = parquet_files(path)
+    if not files:
+        return pd.DataFrame(
+            {
+                "h": np.empty(0, dtype=np.int32),
+                "src": np.empty(0, dtype=object),
+                "dst": np.empty(0, dtype=object),
+            }
+        )
+    pairs = pq.ParquetDataset(path).read().to_pandas()
+    pairs["h"] = pairs["h"].astype(np.int32)
+    return pairs[["h", "src", "dst"]]
+
+
+def aggregate_days_local(points: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate spatial data by date, hour and id.
+
+    As aggregate_spatial_data_local, over points of any amount of days, with
+    the local date of each point next to its hour.
+
+    Parameters
+    ----------
+    points : pd.DataFrame
+        projected points with id, timestamp, x and y, as project_data_local.
+    Returns
+    -------
+    pd.DataFrame
+        date, h, id and the minx, miny, maxx, maxy envelope of each group.
+    """
+    points = pd.DataFrame(
+        {
+            "date": local_dates(points["timestamp"]),
+            "h": local_hours(points["timestamp"]),
+            "id": points["id"],
+            "x": points["x"],
+            "y": points["y"],
+        }
+    ).dropna()
+    agg_df = (
+        points.groupby(["date", "h", "id"], sort=True)
+        .agg(minx=("x", "min"), miny=("y", "min"), maxx=("x", "max"), maxy=("y", "max"))
+        .reset_index()
+    )
+    agg_df["h"] = agg_df["h"].astype(np.int32)
+    return agg_df
+
+
+def daily_envelopes_local(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Envelopes of raw points by date, hour and id, without duplicate pings.
+
+    Exact duplicate pings are dropped before the projection. The envelopes
+    of several archives are combined with merge_envelopes_local, so only one
+    archive of raw points is held at a time.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        raw points with id, timestamp, latitude and longitude.
+    Returns
+    -------
+    pd.DataFrame
+        date, h, id and the minx, miny, maxx, maxy envelope of each group.
+    """
+    return aggregate_days_local(project_data_local(df[COLUMNS].drop_duplicates()))
+
+
+def merge_envelopes_local(agg_dfs: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge the envelopes of the same date, hour and id of several aggregates."""
+    agg_df = pd.concat(
+        [pd.DataFrame(columns=["date", "h", "id", "minx", "miny", "maxx", "maxy"])]
+        + agg_dfs,
+        ignore_index=True,
+    )
+    agg_df = (
+        agg_df.groupby(["date", "h", "id"], sort=True)
+        .agg(
+            minx=("minx", "min"),
+            miny=("miny", "min"),
+            maxx=("maxx", "max"),
+            maxy=("maxy", "max"),
+        )
+        .reset_index()
+    )
+    agg_df["h"] = agg_df["h"].astype(np.int32)
+    return agg_df
+
+
+def write_positions_local(agg_dfs: List[pd.DataFrame], path: str) -> None:
+    """
+    Write the envelopes of all days as partitioned Parquet.
+
+    The same output as build_positions_spark: the envelopes of each (date,
+    hour, id) of all the aggregates are merged and written as bbox columns,
+    partitioned by date and hour, so the hours are read back one at a time
+    with read_position_days.
+
+    Parameters
+    ----------
+    agg_dfs : List[pd.DataFrame]
+        envelopes of each archive, as daily_envelopes_local.
+    path : str
+        directory to write the positions.
+    """
+    os.makedirs(path, exist_ok=True)
+    agg_df = merge_envelopes_local(agg_dfs)
+    if agg_df.empty:
+        return
+    pq.write_to_dataset(
+        pa.Table.from_pandas(agg_df, preserve_index=False),
+        path,
+        partition_cols=["date", "h"],
+    )
+
+
+def _partitions(path: str, name: str) -> List[str]:
+    """Hive partition directories of a column under a directory, sorted."""
+    prefix = "{}=".format(name)
+    values = [
+        entry[len(prefix) :] for entry in os.listdir(path) if entry.startswith(prefix)
+    ]
+    if name == "h":
+        values.sort(key=int)
+    else:
+        values.sort()
+    return [os.path.join(path, prefix + value) for value in values]
+
+
+def read_position_hours(
+    path: str, outlier_area: float = OUTLIER_AREA
+) -> Iterator[GeoDataFrame]:
+    """
+    Read the positions of each hour partition of a date, one at a time.
+
+    Parameters
+    ----------
+    path : str
+        date partition written by write_positions_local or Spark.
+    outlier_area : float
+        area from which an envelope is replaced by its centroid.
+    Returns
+    -------
+    Iterator[GeoDataFrame]
+        positions of each hour, indexed by id.
+    """
+    for hour_path in _partitions(path, "h"):
+        table = pa.concat_tables(
+            pq.read_table(file, columns=["id", "minx", "miny", "maxx", "maxy"])
+            for file in parquet_files(hour_path)
+        )
+        agg_df = table.to_pandas().sort_values("id", ignore_index=True)
+        agg_df["h"] = int(os.path.basename(hour_path)[len("h=") :])
+        gdf = remove_outliers_local(agg_df, outlier_area)
+        yield gdf.drop(columns="h").set_index("id")
+
+
+def read_position_days(
+    path: str, outlier_area: float = OUTLIER_AREA
+) -> Iterator[Tuple[str, Iterator[GeoDataFrame]]]:
+    """
+    Read the positions of all days, partitioned by date and hour.
+
+    Parameters
+    ----------
+    path : str
+        directory written by write_positions_local or build_positions_spark.
+    outlier_area : float
+        area from which an envelope is replaced by its centroid.
+    Returns
+    -------
+    Iterator[Tuple[str, Iterator[GeoDataFrame]]]
+        name of each date partition, and its hours read lazily.
+    """
+    for date_path in _partitions(path, "date"):
+        yield os.path.basename(date_path), read_position_hours(date_path, outlier_area)
@@ -1,68 +1,645 @@
 """Main file CLI for run the simulation of the Geo Covid Model."""
 
+import cProfile
 from datetime import datetime
 import glob
+import hashlib
+import itertools
 import logging
 import os
-import tarfile
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypeVar
 
 import click
+from geopandas import GeoDataFrame
+import numpy as np
+import pandas as pd
 
-from geocovid.constants import DATA_DIR, OUTPUT_DIR, TMP_DIR
-from geocovid.data_pipeline import extract_data_spark, transform_data_spark
+from geocovid.archive import read_archive, stage_archive
+from geocovid.cache import TrajectoryCache, file_digest
+from geocovid.checkpoint import CHECKPOINT_FILE, load_checkpoint, save_checkpoint
+from geocovid.constants import (
+    CACHE_DIR,
+    DATA_DIR,
+    EXPOSURE_DISTANCE,
+    METRIC_CRS,
+    OUTLIER_AREA,
+    OUTPUT_DIR,
+)
+from geocovid.local_pipeline import (
+    contact_pairs_local,
+    daily_envelopes_local,
+    last_positions_local,
+    read_position_days,
+    transform_data_local,
+    write_contacts_local,
+    write_positions_local,
+)
 from geocovid.model import GeoCovidModel
-from geocovid.utils import start_spark
+from geocovid.profiling import PhaseTimer
+from geocovid.results import ParquetResultWriter
+from geocovid.tiles import TiledModel
 
 LOG_FMT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FMT)
 logger = logging.getLogger(__name__)
 
 
-@click.command()
-def main():
-    """Main function to run geo covid simulation.
+PIPELINES = ("spark", "local")
+PREFETCH_DAYS = 1
+CHECKPOINT_DAYS = 1
+
+T = TypeVar("T")
+
+
+def extract_transform(
+    file: str, spark: Any = None, timer: PhaseTimer = None
+) -> Optional[GeoDataFrame]:
+    """
+    Read a daily archive and transform it with Spark or pandas.
+
+    With Spark the data members are staged to disk and read by the cluster,
+    so the points never go through the driver, else they are read from the
+    archive in memory.
+
+    Parameters
+    ----------
+    file : str
+        path of the tar.gz archive.
+    spark : SparkSession
+        spark session, the single node pipeline is used when None.
+    timer : PhaseTimer
+        timer of the extract and transform stages, toPandas with Spark.
+    Returns
+    -------
+    Optional[GeoDataFrame]
+        positions indexed by hour and id, None if no member could be read.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    if spark is None:
+        with timer.phase("extract"):
+            df = read_archive(file)
+        if df.empty:
+            logger.info("FAILED no data read from %s", file)
+            return None
+        logger.info("extracted data")
+        with timer.phase("transform"):
+            gdf = transform_data_local(df, OUTLIER_AREA)
+        logger.info("transformed data")
+        return gdf
+
+    # pylint: disable=import-outside-toplevel
+    from geocovid.data_pipeline import extract_data_spark, transform_data_spark
+
+    staging = os.path.join(CACHE_DIR, "staging", os.path.basename(file))
+    shutil.rmtree(staging, ignore_errors=True)
+    with timer.phase("extract"):
+        stage_archive(file, staging)
+    if not os.listdir(staging):
+        logger.info("FAILED no data read from %s", file)
+        shutil.rmtree(staging)
+        return None
+    logger.info("extracted data")
+    try:
+        with timer.phase("transform"):
+            gdf = transform_data_spark(
+                extract_data_spark(staging, spark), spark, OUTLIER_AREA, timer
+            )
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info("transformed data")
+    return gdf
+
+
+def extract_contacts(
+    gdf: GeoDataFrame,
+    carried: Optional[pd.DataFrame],
+    path: str,
+    spark: Any = None,
+    timer: PhaseTimer = None,
+) -> None:
+    """
+    Extract the hourly contact pairs of a daily archive, as Parquet edge lists.
+
+    The pairs are found from the transformed positions of the archive, so
+    it is not read nor aggregated again, with the agents of the previous
+    archives at their last envelope, as the models query them. With Spark,
+    the envelopes are staged as Parquet and the pairs are found and written
+    by the cluster.
 
     Parameters
     ----------
+    gdf : GeoDataFrame
+        positions of the archive, indexed by hour and id.
+    carried : Optional[pd.DataFrame]
+        last envelopes of the agents of the previous archives, indexed by
+        id, None for the first one.
+    path : str
+        directory to write the edge lists, partitioned by hour.
+    spark : SparkSession
+        spark session, the single node pipeline is used when None.
+    timer : PhaseTimer
+        timer of the staging of the envelopes with Spark.
+    """
+    if spark is None:
+        write_contacts_local(contact_pairs_local(gdf, EXPOSURE_DISTANCE, carried), path)
+        return
+    # pylint: disable=import-outside-toplevel
+    from geocovid.data_pipeline import extract_contacts_spark
+
+    timer = timer or PhaseTimer(enabled=False)
+    staging = "{}.staging".format(path)
+    shutil.rmtree(staging, ignore_errors=True)
+    staged = {"envelopes": gdf.geometry.bounds}
+    if carried is not None and not carried.empty:
+        staged["carried"] = carried
+    with timer.phase("extract"):
+        for name, df in staged.items():
+            os.makedirs(os.path.join(staging, name))
+            df.reset_index().to_parquet(
+                os.path.join(staging, name, "part-0.parquet"), index=False
+            )
+    try:
+        bounds_df = spark.read.parquet(os.path.join(staging, "envelopes"))
+        carried_df = None
+        if "carried" in staged:
+            carried_df = spark.read.parquet(os.path.join(staging, "carried"))
+        extract_contacts_spark(bounds_df, carried_df, spark, path, EXPOSURE_DISTANCE)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _start_spark(pipeline: str, spark: Any, timer: PhaseTimer) -> Any:
+    """Spark session of a pipeline, started on first use, None if local."""
+    if pipeline != "spark" or spark is not None:
+        return spark
+    from geocovid.utils import start_spark  # pylint: disable=import-outside-toplevel
+
+    with timer.phase("start_spark"):
+        return start_spark()
+
+
+def iter_days(
+    files: List[str],
+    pipeline: str = "spark",
+    timer: PhaseTimer = None,
+    contacts: bool = False,
+    done: List[str] = None,
+) -> Iterator[Tuple[str, Optional[GeoDataFrame], Optional[pd.DataFrame]]]:
+    """
+    Yield the positions of each daily archive, from the cache when possible.
+
+    Spark is only started for archives that are not cached yet, and never
+    with the single node pipeline. Both pipelines give the same positions,
+    so they share the cache. With contacts, the hourly contact pairs of each
+    archive are extracted and cached too, else None is yielded instead.
+    Agents keep their last position across the archives, so the contacts of
+    an archive are keyed by the previous ones too, and the archives done
+    are still read to carry their positions, without being yielded.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    done = done or []
+    cache = TrajectoryCache(CACHE_DIR)
+    spark = None
+    carried, previous = None, ""
+    for file in files:
+        skip = os.path.basename(file) in done
+        if skip and not contacts:
+            continue
+        start = time.perf_counter()
+        with timer.phase("cache"):
+            digest = file_digest(file)
+            key = cache.digest_key(digest, outlier_area=OUTLIER_AREA, crs=METRIC_CRS)
+            gdf = cache.load(key)
+        if gdf is None:
+            spark = _start_spark(pipeline, spark, timer)
+            gdf = extract_transform(file, spark, timer)
+            if gdf is not None:
+                with timer.phase("cache"):
+                    cache.store(key, gdf)
+        pairs = None
+        if contacts and gdf is not None and not skip:
+            with timer.phase("cache"):
+                contacts_key = cache.digest_key(
+                    digest,
+                    outlier_area=OUTLIER_AREA,
+                    exposure_distance=EXPOSURE_DISTANCE,
+                    crs=METRIC_CRS,
+                    previous=previous,
+                )
+                pairs = cache.load_contacts(contacts_key)
+            if pairs is None:
+                spark = _start_spark(pipeline, spark, timer)
+                with timer.phase("contacts"):
+                    cache.store_contacts(
+                        contacts_key,
+                        lambda path: extract_contacts(gdf, carried, path, spark, timer),
+                    )
+                pairs = cache.load_contacts(contacts_key)
+        if contacts:
+            previous = hashlib.sha256((previous + digest).encode()).hexdigest()
+            if gdf is not None:
+                with timer.phase("contacts"):
+                    carried = last_positions_local(gdf, carried)
+        if skip:
+            continue
+        logger.info("prepared %s in %.2fs", file, time.perf_counter() - start)
+        yield file, gdf, pairs
+
+
+def build_positions(
+    files: List[str], pipeline: str = "spark", timer: PhaseTimer = None
+) -> str:
+    """
+    Aggregate the positions of all the daily archives at once, or get them cached.
+
+    With Spark the data members of the archives are staged to disk and
+    aggregated by a single job, else each archive is aggregated with pandas
+    and their envelopes merged. Both give the same envelopes, partitioned by
+    date and hour.
+
+    Parameters
+    ----------
+    files : List[str]
+        paths of the tar.gz archives.
+    pipeline : str
+        data pipeline engine, spark or local.
+    timer : PhaseTimer
+        timer of the cache, extract and transform stages.
+    Returns
+    -------
+    str
+        directory of the positions, to read with read_position_days.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    cache = TrajectoryCache(CACHE_DIR)
+    with timer.phase("cache"):
+        path = cache.positions_path(files, crs=METRIC_CRS)
+    if os.path.isdir(path):
+        logger.info("loading cached positions %s", path)
+        return path
+    if pipeline == "spark":
+        # pylint: disable=import-outside-toplevel
+        from geocovid.data_pipeline import build_positions_spark
+
+        spark = _start_spark(pipeline, None, timer)
+        staging = os.path.join(CACHE_DIR, "staging")
+        shutil.rmtree(staging, ignore_errors=True)
+        with timer.phase("extract"):
+            members = []
+            for number, file in enumerate(files):
+                members.append(os.path.join(staging, "{:05d}".format(number)))
+                stage_archive(file, members[-1])
+            members = [member for member in members if os.listdir(member)]
+
+        def write_positions(tmp_path: str) -> None:
+            # A job over no members could not infer their schema.
+            if members:
+                build_positions_spark(members, spark, tmp_path)
+
+        with timer.phase("transform"):
+            cache.store_dir(path, write_positions)
+        shutil.rmtree(staging)
+    else:
+        # Each archive is reduced to its envelopes before the next is read.
+        agg_dfs = []
+        for file in files:
+            with timer.phase("extract"):
+                df = read_archive(file)
+            with timer.phase("transform"):
+                agg_dfs.append(daily_envelopes_local(df))
+            del df
+        with timer.phase("transform"):
+            cache.store_dir(
+                path, lambda tmp_path: write_positions_local(agg_dfs, tmp_path)
+            )
+    logger.info("built positions of %d archives in %s", len(files), path)
+    return path
+
 
+def iter_batch_days(
+    files: List[str],
+    pipeline: str = "spark",
+    timer: PhaseTimer = None,
+    done: List[str] = None,
+) -> Iterator[Tuple[str, Iterator[GeoDataFrame], Iterator[None]]]:
     """
-    gcm = GeoCovidModel()
-    files = glob.glob(os.path.join(DATA_DIR, "*.tar.gz"))
-    sorted_files = sorted(files)
-    spark = start_spark()
-    for file in sorted_files:
-        with tarfile.open(file, "r:gz") as tfile:
+    Yield the hourly positions of each date of all the daily archives.
+
+    Days are the dates of the points, not the archives they came from, and
+    the hours of each day are read lazily, one at a time. Contacts are not
+    extracted, so None is yielded for every hour.
+    """
+    done = done or []
+    path = build_positions(files, pipeline, timer)
+    for day, hourly_gdfs in read_position_days(path, OUTLIER_AREA):
+        if day in done:
+            continue
+        yield day, hourly_gdfs, itertools.repeat(None)
+
+
+def split_hours(gdf: Optional[GeoDataFrame]) -> List[GeoDataFrame]:
+    """Positions of each hour of a day, indexed by id."""
+    if gdf is None:
+        return []
+    return [hour_gdf.droplevel(0) for _, hour_gdf in gdf.groupby(level=0, sort=True)]
+
+
+def split_contacts(
+    pairs: pd.DataFrame, gdf: Optional[GeoDataFrame]
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Contact pairs of each hour of a day, as src and dst id arrays."""
+    if gdf is None:
+        return []
+    hourly_pairs = dict(list(pairs.groupby("h", sort=False)))
+    empty = pairs.iloc[:0]
+    return [
+        (hour_pairs["src"].to_numpy(), hour_pairs["dst"].to_numpy())
+        for hour_pairs in (
+            hourly_pairs.get(hour, empty)
+            for hour in gdf.index.get_level_values(0).unique().sort_values()
+        )
+    ]
+
+
+def iter_hours(
+    files: List[str],
+    pipeline: str = "spark",
+    timer: PhaseTimer = None,
+    contacts: bool = False,
+    done: List[str] = None,
+) -> Iterator[Tuple[str, List[GeoDataFrame], List[Optional[Tuple]]]]:
+    """
+    Yield the hourly positions of each daily archive, and their contacts.
+
+    Contacts of each hour are src and dst id arrays, None without contacts.
+    The archives done are skipped.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    for file, gdf, pairs in iter_days(files, pipeline, timer, contacts, done):
+        with timer.phase("split_hours"):
+            hourly_gdfs = split_hours(gdf)
+            if pairs is None:
+                hourly_contacts: List[Optional[Tuple]] = [None] * len(hourly_gdfs)
+            else:
+                hourly_contacts = split_contacts(pairs, gdf)
+        yield file, hourly_gdfs, hourly_contacts
+
+
+class _Failure:
+    """Exception raised while prefetching, to raise again in the consumer."""
+
+    def __init__(self, error: BaseException) -> None:
+        """Init method."""
+        self.error = error
+
+
+def prefetch(items: Iterator[T], maxsize: int = PREFETCH_DAYS) -> Iterator[T]:
+    """
+    Yield the items of an iterator, produced ahead in a background thread.
+
+    At most maxsize items wait in a bounded queue, besides the one being
+    produced, so the next days are prepared while the current one is used.
+    Errors of the producer are raised in the consumer.
+
+    Parameters
+    ----------
+    items : Iterator[T]
+        iterator to produce in the background.
+    maxsize : int
+        amount of items produced ahead.
+    Returns
+    -------
+    Iterator[T]
+        the same items, in the same order.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                buffer.put(item)
+                if stop.is_set():
+                    return
+        except BaseException as error:  # pylint: disable=broad-except
+            buffer.put(_Failure(error))
+            return
+        buffer.put(done)
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive():
             try:
-                path = os.path.join(TMP_DIR, os.path.basename(file).split(".")[0])
-                tfile.extractall(path=path, members=tfile)
-                logger.info("dirname %s", path)
-                sdf = extract_data_spark(path, spark)
-                logger.info("extracted data")
-                gdf = transform_data_spark(sdf, spark)
-                logger.info("transformed data")
-                hours = gdf.index.levels[0]
-
-                for hour in hours:
-                    gcm.step(gdf.loc[hour, :])
-                    logger.info("data collector %s", gcm.datacollector.model_vars)
-
-            except EOFError as eof:
-                logger.info("FAILED dirname %s", eof)
-
-            tfile.close()
-
-    date = datetime.now().strftime("%Y_%m_%d-%I:%M")
-    logger.info("dumping model vars results to json")
-    model_vars_df = gcm.datacollector.get_model_vars_dataframe()
-    model_vars_df.to_json(
-        os.path.join(OUTPUT_DIR, "results_model_{}.json".format(date))
-    )
-
-    logger.info("dumping agent vars results to json")
-    agent_vars_df = gcm.datacollector.get_agent_vars_dataframe()
-    agent_vars_df.to_json(
-        os.path.join(OUTPUT_DIR, "results_agents_{}.json".format(date)), orient="table"
-    )
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def profile_summary(timers: Dict[str, PhaseTimer]) -> pd.DataFrame:
+    """Summary table of the phases of some timers, indexed by stage and phase."""
+    return pd.concat(
+        [timer.summary() for timer in timers.values()], keys=list(timers)
+    ).rename_axis(["stage", "phase"])
+
+
+def latest_checkpoint(output_dir: str) -> Optional[str]:
+    """Most recent checkpoint of the runs under an output directory."""
+    checkpoints = glob.glob(os.path.join(output_dir, "results_*", CHECKPOINT_FILE))
+    return max(checkpoints, key=os.path.getmtime, default=None)
+
+
+@click.command()
+@click.option(
+    "--pipeline",
+    type=click.Choice(PIPELINES),
+    default="spark",
+    help="Data pipeline engine, Spark or single node pandas",
+)
+@click.option(
+    "--prefetch_days",
+    type=click.INT,
+    default=PREFETCH_DAYS,
+    help="Days prepared ahead while simulating, 0 to run sequentially",
+)
+@click.option(
+    "--checkpoint_days",
+    type=click.INT,
+    default=CHECKPOINT_DAYS,
+    help="Days simulated between checkpoints, 0 to never checkpoint",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume the last checkpointed run, skipping the days already simulated",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Time the simulation phases and pipeline stages, and run cProfile",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Aggregate all days in one pipeline job, read back hour by hour",
+)
+@click.option(
+    "--contacts",
+    is_flag=True,
+    help="Step over the contact pairs extracted by the pipeline, cached by day",
+)
+@click.option(
+    "--tile_workers",
+    type=click.INT,
+    default=0,
+    help="Processes of a simulation split in map tiles, 0 to run in this one",
+)
+def main(
+    pipeline: str,
+    prefetch_days: int,
+    checkpoint_days: int,
+    resume: bool,
+    profile: bool,
+    batch: bool,
+    contacts: bool,
+    tile_workers: int,
+):
+    """Main function to run geo covid simulation.
+
+    Parameters
+    ----------
+    pipeline : str
+        data pipeline engine, spark or local.
+    prefetch_days : int
+        days prepared in the background while the current one is simulated.
+    checkpoint_days : int
+        days simulated between checkpoints, saved in the results directory.
+    resume : bool
+        resume the run of the most recent checkpoint.
+    profile : bool
+        time the phases of each step as model reporters, and write a summary
+        table and the cProfile stats of the run to the results directory.
+    batch : bool
+        aggregate the points of all archives at once, partitioned by date
+        and hour, and simulate each date instead of each archive.
+    contacts : bool
+        extract the hourly contact pairs in the data pipeline, and interact
+        over them instead of querying the positions.
+    tile_workers : int
+        worker processes stepping the agents of their map tiles, without
+        checkpoints.
+    """
+    done: List[str] = []
+    if batch and contacts:
+        raise click.ClickException("contacts are extracted by archive, not in batch")
+    mode = "batch" if batch else "contacts" if contacts else "hours"
+    if tile_workers > 0:
+        if contacts:
+            raise click.ClickException("tiled runs query their own contacts")
+        if resume:
+            raise click.ClickException("tiled runs can not be resumed")
+        if checkpoint_days > 0:
+            logger.warning("tiled runs are not checkpointed")
+            checkpoint_days = 0
+    if resume:
+        checkpoint = latest_checkpoint(OUTPUT_DIR)
+        if checkpoint is None:
+            raise click.ClickException("no checkpoint to resume in " + OUTPUT_DIR)
+        gcm, state = load_checkpoint(checkpoint)
+        if state.get("mode") != mode:
+            raise click.ClickException(
+                "{} was saved in {} mode, not {}".format(
+                    checkpoint, state.get("mode"), mode
+                )
+            )
+        done = state["files"]
+        writer = ParquetResultWriter(os.path.dirname(checkpoint))
+        writer.rollback(state["parts"])
+        logger.info("resuming %s after %d days", checkpoint, len(done))
+    else:
+        if tile_workers > 0:
+            gcm = TiledModel(workers=tile_workers, profile=profile)
+        else:
+            gcm = GeoCovidModel(profile=profile)
+        date = datetime.now().strftime("%Y_%m_%d-%I:%M")
+        writer = ParquetResultWriter(
+            os.path.join(OUTPUT_DIR, "results_{}".format(date))
+        )
+    checkpoint_path = os.path.join(writer.path, CHECKPOINT_FILE)
+    written_steps = len(gcm.datacollector.get_model_vars_dataframe())
+    files = sorted(glob.glob(os.path.join(DATA_DIR, "*.tar.gz")))
+    pipeline_timer = PhaseTimer(enabled=profile)
+    if batch:
+        days = iter_batch_days(files, pipeline, pipeline_timer, done)
+    else:
+        days = iter_hours(files, pipeline, pipeline_timer, contacts, list(done))
+    if prefetch_days > 0:
+        days = prefetch(days, prefetch_days)
+
+    run_timer = PhaseTimer(enabled=profile)
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    wait_start = time.perf_counter()
+    try:
+        for file, hourly_gdfs, hourly_contacts in days:
+            step_start = time.perf_counter()
+            for hour_gdf, hour_contacts in zip(hourly_gdfs, hourly_contacts):
+                gcm.step(hour_gdf, hour_contacts)
+                logger.info("data collector %s", gcm.datacollector.model_vars)
+
+            write_start = time.perf_counter()
+            logger.info("writing results of %s", file)
+            model_vars_df = gcm.datacollector.get_model_vars_dataframe()
+            writer.append(
+                "model", model_vars_df.iloc[written_steps:].rename_axis("Step")
+            )
+            written_steps = len(model_vars_df)
+            writer.append("agents", gcm.datacollector.pop_agent_vars_dataframe())
+            writer.flush()
+            done.append(os.path.basename(file))
+            if checkpoint_days > 0 and len(done) % checkpoint_days == 0:
+                save_checkpoint(
+                    gcm, checkpoint_path, files=done, parts=writer.parts, mode=mode
+                )
+            write_end = time.perf_counter()
+            logger.info(
+                "day %s timings: wait %.2fs, simulate %.2fs, write %.2fs",
+                file,
+                step_start - wait_start,
+                write_start - step_start,
+                write_end - write_start,
+            )
+            if profile:
+                run_timer.add("wait", step_start - wait_start)
+                run_timer.add("simulate", write_start - step_start)
+                run_timer.add("write", write_end - write_start)
+            wait_start = time.perf_counter()
+    finally:
+        if tile_workers > 0:
+            gcm.close()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(writer.path, "profile.prof"))
+            summary = profile_summary(
+                {"run": run_timer, "pipeline": pipeline_timer, "model": gcm.timer}
+            )
+            summary.to_csv(os.path.join(writer.path, "profile.csv"))
+            logger.info("profile summary\n%s", summary.to_string())
 
 
 if __name__ == "__main__":
@@ -1,26 +1,44 @@
 """Geo Covid Model."""
 import enum
 import logging
-from typing import Any, List
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from geopandas import GeoDataFrame
 from mesa import Model
-from mesa_geo import GeoSpace
+import numpy as np
 
 from geocovid.agent import PersonAgent, Status
 from geocovid.constants import (
     DEATH_PROB,
+    DORMANT_AFTER,
     EXPOSURE_DISTANCE,
+    GRID_CELL_SIZE,
     INFECTION_PROB,
     INIT_INFECTED,
     MIN_DEATH_PERIOD,
+    STEPS_PER_DAY,
     TREATMENT_PERIOD,
 )
-from geocovid.datacollection import AggDataCollector
+from geocovid.datacollection import AggDataCollector, TypedColumn
+from geocovid.engine import (
+    DenseIds,
+    VectorizedEngine,
+    align_positions,
+    draw_infections,
+    draw_transitions,
+    frame_bounds,
+    pair_contacts,
+)
+from geocovid.profiling import PhaseTimer
+from geocovid.projection import unproject_points
 from geocovid.scheduler import DataScheduler
+from geocovid.spatial import BoundsArray, GridSpace, bounds_centroid
 
 logger = logging.getLogger(__name__)
 
+# Phases of a step reported as model variables when profiling, in seconds.
+STEP_PHASES = ("input", "create", "check", "interact", "move", "index", "dormancy")
+
 
 class StepSize(enum.IntEnum):
     """Agent Status."""
@@ -33,7 +51,21 @@ class StepSize(enum.IntEnum):
 class GeoCovidModel(Model):
     """A model with some number of agents."""
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        infection_prob: float = INFECTION_PROB,
+        death_prob: float = DEATH_PROB,
+        treatment_period: int = TREATMENT_PERIOD,
+        exposure_distance: float = EXPOSURE_DISTANCE,
+        init_infected: Union[int, List] = INIT_INFECTED,
+        min_death_period: int = MIN_DEATH_PERIOD,
+        seed: int = None,
+        vectorized: bool = False,
+        debug: bool = False,
+        collect_agents: bool = True,
+        dormant_after: Optional[int] = DORMANT_AFTER,
+        profile: bool = False,
+    ) -> None:
         """
         Geo Covid Model initialization.
 
@@ -45,65 +77,199 @@ class GeoCovidModel(Model):
         exposure_distance: float = EXPOSURE_DISTANCE,
         init_infected: Union[int, List] = INIT_INFECTED,
         min_death_period: int = MIN_DEATH_PERIOD,
-        seed: int = None
+        seed: int = None,
+        vectorized: bool = False, keep the agents state in arrays instead of
+            PersonAgent objects.
+        debug: bool = False, check the status counters against a full scan of
+            the agents on every step.
+        collect_agents: bool = True, collect the agent variables once per day,
+            model variables are always collected.
+        dormant_after: Optional[int] = DORMANT_AFTER, steps an agent may go
+            unseen before it leaves the scheduler and the space, until it is
+            seen again. Agents are never dormant if None.
+        profile: bool = False, time the phases of each step, reported as
+            t_<phase> model variables and summarized by timer.summary().
 
         """
         super().__init__()
         self.schedule = DataScheduler(self)
-        self.grid = GeoSpace()
-        self.infection_prob = INFECTION_PROB
-        self.death_prob = DEATH_PROB
-        self.treatment_period = TREATMENT_PERIOD
-        self.exposure_distance = EXPOSURE_DISTANCE
-        self.init_infected = INIT_INFECTED
-        self.min_death_period = MIN_DEATH_PERIOD
+        self.grid = GridSpace(cell_size=max(exposure_distance, GRID_CELL_SIZE))
+        self.positions = BoundsArray()
+        self.agent_index = DenseIds()
+        self._code_agents: List[PersonAgent] = []
+        self._code_rows = TypedColumn(np.int64)
+        self._active = TypedColumn(bool)
+        self._last_seen = TypedColumn(np.int64)
+        self.dormant: Dict[str, PersonAgent] = {}
+        # Infected agents in infection order, they are never dormant.
+        self.infected: Dict[str, PersonAgent] = {}
+        self.rng = np.random.default_rng(seed)
+        self.status_counts = {status: 0 for status in Status}
+        self.debug = debug
+        self.timer = PhaseTimer(enabled=profile)
+        self.engine = VectorizedEngine(self) if vectorized else None
+        self.infection_prob = infection_prob
+        self.death_prob = death_prob
+        self.treatment_period = treatment_period
+        self.exposure_distance = exposure_distance
+        self.init_infected = init_infected
+        self.min_death_period = min_death_period
+        self.dormant_after = dormant_after
         self.steps = 0
-        self.deaths = 0
         self.infections_step = 0
         self.new_agents = 0
-
+        self._snapshot: Dict[str, np.ndarray] = {}
+        self._snapshot_step = -1
+
+        model_reporters = {
+            "S": compute_s,
+            "I": compute_i,
+            "R": compute_r,
+            "D": compute_d,
+            "IS": compute_is,
+            "A": total_agents,
+            "NA": compute_new_agents,
+        }
+        if profile:
+            for phase in STEP_PHASES:
+                model_reporters["t_{}".format(phase)] = phase_time(phase)
         self.datacollector = AggDataCollector(
-            model_reporters={
-                "S": compute_s,
-                "I": compute_i,
-                "R": compute_r,
-                "D": compute_d,
-                "IS": compute_is,
-                "A": total_agents,
-                "NA": compute_new_agents,
-            },
+            model_reporters=model_reporters,
             agent_reporters={
-                "status": "status",
-                "lat": lambda agent: agent.shape.centroid.x,
-                "lon": lambda agent: agent.shape.centroid.y,
-            },
+                "status": agent_status,
+                "lat": agent_lat,
+                "lon": agent_lon,
+            }
+            if collect_agents
+            else None,
+            agent_ids=agent_ids,
+            dtypes={"status": np.int8, "lat": np.float64, "lon": np.float64},
         )
         logger.info("model initialized")
 
-    def _create_new_agents(self, gdf: GeoDataFrame) -> None:
+    def _create_new_agents(self, keys: np.ndarray, bounds: np.ndarray) -> None:
         """
         Create new agents not currently present in the model.
 
-        Based on a given GeoDataFrame.
+        Based on the ids and positions of a step, as frame_bounds. Agent ids
+        get a dense code, kept for the whole run, so new ids are found with
+        one vectorized lookup and all new agents are created, scheduled and
+        indexed in bulk. Dormant agents with a position in the step are
+        brought back.
         """
-        new_agents = []
-        step_agents_ids = set(gdf.index)
-        current_agents_ids = set(self.schedule._agents.keys())
-        new_agents_ids = list(step_agents_ids - current_agents_ids)
-        new_gdf = gdf[gdf.index.isin(new_agents_ids)]
-        for idx, row in new_gdf.iterrows():
-            agent = PersonAgent(idx, self, row["geometry"])
-            self.schedule.add(agent)
-            new_agents.append(agent)
-
-        self.grid.add_agents(new_agents)
-        logger.info("new %f agents created", len(new_agents))
+        with self.timer.phase("create"):
+            start = len(self.agent_index)
+            codes = self.agent_index.add(keys)
+            is_new = codes >= start
+            new_agents = PersonAgent.create_many(keys[is_new], self, bounds[is_new])
+            self.schedule.add_agents(new_agents)
+            self._code_agents.extend(new_agents)
+            self._code_rows.extend(np.array([agent.row for agent in new_agents]))
+            self._active.extend(np.ones(len(new_agents), dtype=bool))
+            self._last_seen.extend(np.zeros(len(new_agents), dtype=np.int64))
+        with self.timer.phase("index"):
+            self.grid.add_agents(new_agents, bounds[is_new])
+        logger.info("new %d agents created", len(new_agents))
         self.new_agents = len(new_agents)
+        if self.dormant:
+            with self.timer.phase("dormancy"):
+                active = self._active.values()[codes]
+                woken = ~active & np.isfinite(bounds).all(axis=1)
+                self._wake_agents(codes[woken], bounds[woken])
+
+    def _wake_agents(self, codes: np.ndarray, bounds: np.ndarray) -> None:
+        """Bring dormant agents back to the scheduler and the space."""
+        self._active.values()[codes] = True
+        self.positions.bounds[self._code_rows.values()[codes]] = bounds
+        agents = [self.dormant.pop(self._code_agents[code].unique_id) for code in codes]
+        self.schedule.add_agents(agents)
+        for agent, box in zip(agents, bounds):
+            if agent.status is Status.SUSCEPTIBLE:
+                self.grid.index.insert(agent, box)
+        logger.info("%d dormant agents woken", len(agents))
+
+    def sleep_agents(self) -> None:
+        """
+        Move the agents not seen for dormant_after steps to the dormant store.
+
+        Dormant agents leave the scheduler and the space, so they are not
+        stepped nor queried. Infected agents stay, so their status keeps being
+        checked.
+        """
+        if self.dormant_after is None:
+            return
+        with self.timer.phase("dormancy"):
+            idle = self._active.values() & (
+                self.schedule.time - self._last_seen.values() >= self.dormant_after
+            )
+            dormant = 0
+            for code in np.flatnonzero(idle).tolist():
+                agent = self._code_agents[code]
+                if agent.status is Status.INFECTED:
+                    continue
+                self._active.values()[code] = False
+                self.schedule.remove(agent)
+                self.leave_space(agent)
+                self.dormant[agent.unique_id] = agent
+                dormant += 1
+        logger.info("%d agents dormant", dormant)
+
+    def leave_space(self, agent: PersonAgent) -> None:
+        """Remove an agent from the space, if it is there."""
+        if agent in self.grid.index:
+            self.grid.remove_agent(agent)
+
+    def align_positions(
+        self, keys: np.ndarray, bounds: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Align the positions of a step to the agent codes, with one reindex.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            agent id of each position.
+        bounds : np.ndarray
+            (n, 4) positions of the step.
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            mask of the agents present in the step, and their positions.
+        """
+        codes = self.agent_index.codes(keys)
+        return align_positions(codes, bounds, len(self.agent_index))
+
+    def move_agents(self, present: np.ndarray, positions: np.ndarray) -> None:
+        """
+        Move the agents present in a step, the rest stay in the same place.
+
+        Only the agents in the space, the susceptible and infected ones, are
+        updated in the spatial index.
+
+        Parameters
+        ----------
+        present : np.ndarray
+            mask of the agents present, by agent code.
+        positions : np.ndarray
+            (n, 4) positions aligned to the agent codes.
+        """
+        with self.timer.phase("move"):
+            codes = np.flatnonzero(present)
+            rows = self._code_rows.values()[codes]
+            self.positions.bounds[rows] = positions[codes]
+            self._last_seen.values()[codes] = self.schedule.time
+        with self.timer.phase("index"):
+            for code in codes.tolist():
+                agent = self._code_agents[code]
+                if agent in self.grid.index:
+                    self.grid.update_agent(agent)
 
     def _init_infected(self) -> None:
         if isinstance(self.init_infected, List):
             selected_agents = [
-                agent for agent in self.init_infected if agent in self.schedule.agents
+                self.schedule._agents[agent_id]
+                for agent_id in self.init_infected
+                if agent_id in self.schedule._agents
             ]
             proportion = len(selected_agents) / len(self.init_infected)
             logger.info("init infected from list, with a proportion %f", proportion)
@@ -114,19 +280,341 @@ class GeoCovidModel(Model):
         for agent in selected_agents:
             agent.status = Status.INFECTED
 
-        logger.info("int %f agents infected", len(selected_agents))
+        logger.info("init %d agents infected", len(selected_agents))
+
+    def check(self) -> None:
+        """
+        Check the status of all infected agents.
+
+        Deaths of all agents past the minimum death period are drawn at once
+        from the model generator, instead of one draw per agent. Dead and
+        recovered agents leave the space, they are no longer contacts.
+        """
+        infected = list(self.infected.values())
+        infected_at = np.fromiter(
+            (agent.infected_at for agent in infected),
+            dtype=np.int64,
+            count=len(infected),
+        )
+        dead, recovered = draw_transitions(
+            self.rng,
+            self.schedule.time - infected_at,
+            self.death_prob,
+            self.min_death_period * STEPS_PER_DAY,
+            self.treatment_period * STEPS_PER_DAY,
+        )
+        for position in dead:
+            infected[position].status = Status.DEAD
+            self.leave_space(infected[position])
+        for position in recovered:
+            infected[position].status = Status.RECOVERED
+            self.leave_space(infected[position])
+
+    def interact(self) -> None:
+        """
+        Infected agents interact with the susceptible ones and may infect them.
+
+        Contacts of all infected agents are found in one batched query over
+        the spatial index, instead of one neighbors query per agent. Draws
+        follow the positions rows of the infected agent and the contact,
+        created in agent code order, as in interact_contacts, so the same
+        contacts give the same infections.
+        """
+        infected = list(self.infected.values())
+        src, slots = self.grid.index.query_pairs(
+            self.agents_bounds(infected), self.exposure_distance
+        )
+        contacts = [self.grid.index.items[slot] for slot in slots]
+        candidates = np.fromiter(
+            (contact.status is Status.SUSCEPTIBLE for contact in contacts),
+            dtype=bool,
+            count=len(contacts),
+        )
+        infected_rows = np.fromiter(
+            (agent.row for agent in infected), np.int64, len(infected)
+        )
+        contact_rows = np.fromiter(
+            (contact.row for contact in contacts), np.int64, len(contacts)
+        )
+        order = np.lexsort((contact_rows, infected_rows[src]))
+        order = order[candidates[order]]
+        new_infected = draw_infections(
+            self.rng, contact_rows[order], self.infection_prob
+        )
+        row_contacts = {contact.row: contact for contact in contacts}
+        for row in new_infected:
+            contact = row_contacts[row]
+            contact.status = Status.INFECTED
+            contact.infected_at = self.schedule.time
+        self.infections_step += len(new_infected)
+
+    def interact_contacts(self, src: np.ndarray, dst: np.ndarray) -> None:
+        """
+        Infected agents interact with their susceptible contacts of the step.
+
+        Contacts are given as pairs of agent ids, as extracted by the data
+        pipelines, instead of being queried from the spatial index.
+
+        Parameters
+        ----------
+        src : np.ndarray
+            id of the first agent of each contact.
+        dst : np.ndarray
+            id of the second agent of each contact.
+        """
+        src, dst = self.agent_index.codes(src), self.agent_index.codes(dst)
+        known = (src >= 0) & (dst >= 0)
+        src, dst = src[known], dst[known]
+        involved = np.unique(np.concatenate([src, dst]))
+        status = np.full(len(self.agent_index), -1, dtype=np.int8)
+        status[involved] = [self._code_agents[code].status for code in involved]
+        contacts = pair_contacts(status, src, dst)
+        new_infected = draw_infections(self.rng, contacts, self.infection_prob)
+        for code in new_infected:
+            contact = self._code_agents[code]
+            contact.status = Status.INFECTED
+            contact.infected_at = self.schedule.time
+        self.infections_step += len(new_infected)
+
+    def step_positions(
+        self,
+        keys: np.ndarray,
+        bounds: np.ndarray,
+        contacts: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        """
+        Run one step of the vectorized engine from position arrays.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            ids of the agents present in the step.
+        bounds : np.ndarray
+            (n, 4) bounding boxes of those agents.
+        contacts : Optional[Tuple[np.ndarray, np.ndarray]]
+            ids of the agent pairs in contact in the step, queried from the
+            positions when None.
+        """
+        if self.engine is None:
+            raise ValueError("stepping positions needs a vectorized model")
+        with self.timer.phase("create"):
+            self.new_agents = self.engine.add_agents(keys, bounds)
+        if self.steps == 0:
+            self.engine.init_infected(self.init_infected)
+        self.infections_step = self.engine.step(
+            keys, bounds, self.schedule.time, contacts
+        )
+        self.schedule.tick()
+        self._finish_step()
+
+    def step_contacts(self, present: int, src: np.ndarray, dst: np.ndarray) -> None:
+        """
+        Run one step of a contact engine from a precomputed contact network.
+
+        Parameters
+        ----------
+        present : int
+            amount of agents seen up to the step.
+        src : np.ndarray
+            first agent of each contact of the step.
+        dst : np.ndarray
+            second agent of each contact of the step.
+        """
+        if not hasattr(self.engine, "step_contacts"):
+            raise ValueError("stepping contacts needs a contact engine")
+        with self.timer.phase("create"):
+            self.new_agents = self.engine.add_present(present)
+        if self.steps == 0:
+            self.engine.init_infected(self.init_infected)
+        self.infections_step = self.engine.step_contacts(src, dst, self.schedule.time)
+        self.schedule.tick()
+        self._finish_step()
+
+    def step(
+        self,
+        gdf: GeoDataFrame,
+        contacts: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        """
+        Run one step of the model.
 
-    def step(self, gdf: GeoDataFrame) -> None:
-        """Run one step of the model."""
-        self._create_new_agents(gdf)
+        Parameters
+        ----------
+        gdf : GeoDataFrame
+            positions of the step, indexed by agent id.
+        contacts : Optional[Tuple[np.ndarray, np.ndarray]]
+            ids of the agent pairs in contact in the step, as extracted by the
+            data pipelines, queried from the positions when None.
+        """
+        if contacts is not None and self.dormant_after is not None:
+            raise ValueError("contacts carry every agent forward, without dormancy")
+        with self.timer.phase("input"):
+            keys, bounds = frame_bounds(gdf)
+        if self.engine is not None:
+            self.step_positions(keys, bounds, contacts)
+            return
+        self._create_new_agents(keys, bounds)
         if self.steps == 0:
             self._init_infected()
-        self.schedule.step(gdf)
-        self.grid._recreate_rtree()  # Recalculate spatial tree, agents are moving
-        self.datacollector.collect(self)
-        logger.info("model step %f executed", self.steps)
+        self.schedule.step(keys, bounds, contacts)
+        self._finish_step()
+
+    def _finish_step(self) -> None:
+        """Collect the data of a step and move to the next one."""
+        if self.debug:
+            self.check_counts()
+        with self.timer.phase("collect"):
+            self.datacollector.collect(self)
+        logger.info("model step %d executed", self.steps)
         self.steps += 1
         self.infections_step = 0  # reset infections per step
+        self.timer.next_step()
+
+    def update_counts(
+        self, old_status: Optional[Status], new_status: Status, amount: int = 1
+    ) -> None:
+        """
+        Move agents between status counters on a status transition.
+
+        Parameters
+        ----------
+        old_status : Optional[Status]
+            previous status, None for new agents.
+        new_status : Status
+            status after the transition.
+        amount : int
+            amount of agents in the transition.
+        """
+        if old_status is not None:
+            self.status_counts[old_status] -= amount
+        self.status_counts[new_status] += amount
+
+    def count_status(self, status: Status) -> int:
+        """Amount of agents in a given status."""
+        return self.status_counts[status]
+
+    def count_agents(self) -> int:
+        """Amount of agents in the model."""
+        return sum(self.status_counts.values())
+
+    def agent_state(self) -> Dict[str, np.ndarray]:
+        """Ids, statuses and bounding boxes of all agents that are not dormant."""
+        if self.engine is not None:
+            rows = self.engine.active_rows()
+            return {
+                "keys": self.engine.index.ids()[rows],
+                "status": self.engine.status[rows],
+                "bounds": self.engine.bounds[rows],
+            }
+        agents = self.schedule.agents
+        return {
+            "keys": np.array(list(self.schedule._agents), dtype=object),
+            "status": np.fromiter(
+                (agent.status for agent in agents), dtype=np.int8, count=len(agents)
+            ),
+            "bounds": self.agents_bounds(agents),
+        }
+
+    def agent_snapshot(self) -> Dict[str, np.ndarray]:
+        """
+        Ids, statuses and coordinates of all agents that are not dormant.
+
+        Taken once per step, so the agent reporters of a collection report the
+        same agents in the same order, and unproject their centroids once.
+        """
+        if self._snapshot_step != self.steps:
+            state = self.agent_state()
+            centroids = bounds_centroid(state["bounds"])
+            lat, lon = unproject_points(centroids[:, 0], centroids[:, 1])
+            self._snapshot = {
+                "keys": state["keys"],
+                "status": state["status"],
+                "lat": lat,
+                "lon": lon,
+            }
+            self._snapshot_step = self.steps
+        return self._snapshot
+
+    def agent_ids(self) -> np.ndarray:
+        """Ids of all agents that are not dormant."""
+        return self.agent_state()["keys"]
+
+    def agent_statuses(self) -> np.ndarray:
+        """Status of all agents, in agent_ids order."""
+        return self.agent_state()["status"]
+
+    def agent_centroids(self) -> np.ndarray:
+        """
+        Centroid of all agents, in agent_ids order.
+
+        Positions are envelopes or points, so the centroid is the middle of
+        the bounding box.
+        """
+        return bounds_centroid(self.agent_state()["bounds"])
+
+    def agents_bounds(self, agents: List[PersonAgent]) -> np.ndarray:
+        """Bounding boxes of the agents positions, as an (n, 4) array."""
+        rows = np.fromiter((agent.row for agent in agents), np.int64, len(agents))
+        return self.positions.bounds[rows]
+
+    @property
+    def deaths(self) -> int:
+        """Amount of dead agents."""
+        return self.status_counts[Status.DEAD]
+
+    def check_counts(self) -> None:
+        """Check the status counters against a full scan of the agents."""
+        agents = self.schedule.agents + list(self.dormant.values())
+        for status in Status:
+            if self.engine is not None:
+                scanned = self.engine.count(status)
+            else:
+                scanned = len([agent for agent in agents if agent.status == status])
+            if scanned != self.status_counts[status]:
+                raise RuntimeError(
+                    "{} counter is {}, but {} agents were found".format(
+                        status.name, self.status_counts[status], scanned
+                    )
+                )
+        if self.engine is None:
+            scanned = len(
+                [agent for agent in agents if agent.status is Status.INFECTED]
+            )
+            if scanned != len(self.infected):
+                raise RuntimeError(
+                    "{} agents are tracked as infected, but {} were found".format(
+                        len(self.infected), scanned
+                    )
+                )
+
+
+def phase_time(phase: str) -> Callable[[Model], float]:
+    """Model reporter of the seconds taken by a phase in the current step."""
+
+    def reporter(model: Model) -> float:
+        return model.timer.last.get(phase, 0.0)
+
+    return reporter
+
+
+def agent_ids(model: Model) -> np.ndarray:
+    """Ids of all agents."""
+    return model.agent_snapshot()["keys"]
+
+
+def agent_status(model: Model) -> np.ndarray:
+    """Status of all agents."""
+    return model.agent_snapshot()["status"]
+
+
+def agent_lat(model: Model) -> np.ndarray:
+    """Latitude of the centroid of all agents, back from the metric CRS."""
+    return model.agent_snapshot()["lat"]
+
+
+def agent_lon(model: Model) -> np.ndarray:
+    """Longitude of the centroid of all agents, back from the metric CRS."""
+    return model.agent_snapshot()["lon"]
 
 
 def compute_s(model: Model) -> int:
@@ -142,14 +630,7 @@ def compute_s(model: Model) -> int:
     int
         amount of suceptible agents.
     """
-    agents = len(
-        [
-            agent.status
-            for agent in model.schedule.agents
-            if agent.status == Status.SUSCEPTIBLE
-        ]
-    )
-    return agents
+    return model.count_status(Status.SUSCEPTIBLE)
 
 
 def compute_i(model: Model) -> int:
@@ -165,14 +646,7 @@ def compute_i(model: Model) -> int:
     int
         amount of infected agents.
     """
-    agents = len(
-        [
-            agent.status
-            for agent in model.schedule.agents
-            if agent.status == Status.INFECTED
-        ]
-    )
-    return agents
+    return model.count_status(Status.INFECTED)
 
 
 def compute_r(model: Model) -> int:
@@ -189,14 +663,7 @@ def compute_r(model: Model) -> int:
         amount of recovered agents.
 
     """
-    agents = len(
-        [
-            agent.status
-            for agent in model.schedule.agents
-            if agent.status == Status.RECOVERED
-        ]
-    )
-    return agents
+    return model.count_status(Status.RECOVERED)
 
 
 def compute_d(model: Model) -> int:
@@ -213,7 +680,7 @@ def compute_d(model: Model) -> int:
         amount of dead agents.
 
     """
-    return model.deaths
+    return model.count_status(Status.DEAD)
 
 
 def compute_is(model: Model) -> int:
@@ -245,8 +712,7 @@ def total_agents(model: Model) -> int:
     int
         total amount of agents in a step.
     """
-    agents = len([agent.status for agent in model.schedule.agents])
-    return agents
+    return model.count_agents()
 
 
 def compute_new_agents(model: Model) -> int:
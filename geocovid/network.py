@@ -0,0 +1,200 @@
+"""Precomputed contact network of the agents and SIR replay over it."""
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from geocovid.agent import Status
+from geocovid.engine import VectorizedEngine
+from geocovid.model import GeoCovidModel
+from geocovid.spatial import carried_pairs
+
+logger = logging.getLogger(__name__)
+
+
+def save_contacts(
+    hourly_positions: Iterable[Tuple[np.ndarray, np.ndarray]],
+    exposure_distance: float,
+    path: str,
+    ids: np.ndarray = None,
+) -> None:
+    """
+    Extract every pair of agents within exposure distance on each hour.
+
+    Contacts do not depend on the infection status, so they are found once
+    and replayed by any amount of simulations. They are the carried_pairs of
+    the positions, found before moving the agents of the hour, as in
+    VectorizedEngine.step.
+    The edges of each hour are saved as (src, dst) arrays with src < dst,
+    sorted and concatenated, with the offsets of each hour.
+
+    Parameters
+    ----------
+    hourly_positions : Iterable[Tuple[np.ndarray, np.ndarray]]
+        dense agent codes, numbered by first appearance, and (n, 4) bounding
+        boxes of each hour, as read from HourlyPositions.
+    exposure_distance : float
+        maximum distance between the agents of a contact.
+    path : str
+        directory to save the arrays.
+    ids : np.ndarray
+        agent id of each code, to infect agents by id when replaying.
+    """
+    hour_src, hour_dst, offsets, present = [], [], [0], []
+    for known, src, dst in carried_pairs(hourly_positions, exposure_distance):
+        hour_src.append(src.astype(np.int32))
+        hour_dst.append(dst.astype(np.int32))
+        offsets.append(offsets[-1] + len(src))
+        present.append(known)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "src.npy"), np.concatenate(hour_src))
+    np.save(os.path.join(path, "dst.npy"), np.concatenate(hour_dst))
+    np.save(os.path.join(path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    np.save(os.path.join(path, "present.npy"), np.array(present, dtype=np.int64))
+    if ids is not None:
+        np.save(os.path.join(path, "ids.npy"), ids)
+    with open(os.path.join(path, "meta.json"), "w") as file:
+        json.dump({"exposure_distance": exposure_distance}, file)
+    logger.info("saved %d contacts of %d hours to %s", offsets[-1], len(present), path)
+
+
+class ContactNetwork:
+    """Read-only, memory-mapped hourly contacts saved by save_contacts."""
+
+    def __init__(self, path: str) -> None:
+        """Init method."""
+        self.path = path
+        self.src = np.load(os.path.join(path, "src.npy"), mmap_mode="r")
+        self.dst = np.load(os.path.join(path, "dst.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.present = np.load(os.path.join(path, "present.npy"))
+        with open(os.path.join(path, "meta.json")) as file:
+            self.exposure_distance = json.load(file)["exposure_distance"]
+
+    def __len__(self) -> int:
+        """Amount of hours."""
+        return len(self.present)
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """Yield the amount of agents seen and the contacts of each hour."""
+        for hour, (start, stop) in enumerate(zip(self.offsets[:-1], self.offsets[1:])):
+            yield int(self.present[hour]), self.src[start:stop], self.dst[start:stop]
+
+    def ids(self) -> np.ndarray:
+        """Agent id of each code, if saved with the contacts."""
+        path = os.path.join(self.path, "ids.npy")
+        if not os.path.exists(path):
+            raise ValueError("contacts were saved without the agent ids")
+        return np.load(path)
+
+
+def coded_params(params: Dict[str, Any], ids: np.ndarray) -> Dict[str, Any]:
+    """
+    Model parameters over the dense agent codes of saved positions.
+
+    A list of initial infected ids is mapped to their codes, with -1 for the
+    ids never seen, so they still count as missing.
+    """
+    codes = pd.Index(ids).get_indexer([str(key) for key in params["init_infected"]])
+    return dict(params, init_infected=codes.tolist())
+
+
+def param_columns(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Parameters as columns of the results, with lists as JSON strings."""
+    return {
+        name: json.dumps(value) if isinstance(value, list) else value
+        for name, value in params.items()
+    }
+
+
+class ContactEngine(VectorizedEngine):
+    """
+    Vectorized engine stepped over a precomputed contact network.
+
+    Agents are numbered by first appearance, so the agents of a step are the
+    first ones seen up to it, and interactions come from the stored contacts
+    instead of a proximity query. Draws are made in the same order as
+    VectorizedEngine, so a replay with the same seed gives the same results.
+    """
+
+    def add_present(self, present: int) -> int:
+        """
+        Create the agents seen for the first time in a step.
+
+        Parameters
+        ----------
+        present : int
+            amount of agents seen up to the step.
+        Returns
+        -------
+        int
+            amount of new agents created.
+        """
+        start = len(self)
+        self.index.add(np.arange(start, present))
+        self._reserve(present)
+        self.status[start:present] = Status.SUSCEPTIBLE
+        self.model.update_counts(None, Status.SUSCEPTIBLE, present - start)
+        self.infected_at[start:present] = 0
+        self.active[start:present] = True
+        logger.info("new %d agents created", present - start)
+        return present - start
+
+    def step_contacts(self, src: np.ndarray, dst: np.ndarray, time: int) -> int:
+        """
+        One step of all the agents over the contacts of the step.
+
+        Returns
+        -------
+        int
+            amount of new infected agents.
+        """
+        timer = self.model.timer
+        with timer.phase("check"):
+            self.check(time)
+        with timer.phase("interact"):
+            return self.interact_contacts(src, dst, time)
+
+
+def run_replay(path: str, params: Dict[str, Any], seed: int) -> pd.DataFrame:
+    """
+    Run one simulation over a contact network.
+
+    Parameters
+    ----------
+    path : str
+        directory of the contacts saved by save_contacts.
+    params : Dict[str, Any]
+        GeoCovidModel parameters, exposure_distance is the one of the network.
+    seed : int
+        model seed.
+    Returns
+    -------
+    pd.DataFrame
+        model reporters of each step, with the parameters and seed as columns.
+    """
+    if params.get("dormant_after") is not None:
+        raise ValueError("contact networks keep every agent, without dormancy")
+    network = ContactNetwork(path)
+    exposure_distance = params.get("exposure_distance", network.exposure_distance)
+    if exposure_distance != network.exposure_distance:
+        raise ValueError(
+            "contacts were extracted with exposure distance {}, got {}".format(
+                network.exposure_distance, exposure_distance
+            )
+        )
+    model_params = dict(params, exposure_distance=exposure_distance)
+    if isinstance(params.get("init_infected"), list):
+        model_params = coded_params(model_params, network.ids())
+    model = GeoCovidModel(seed=seed, collect_agents=False, **model_params)
+    model.engine = ContactEngine(model)
+    for present, src, dst in network:
+        model.step_contacts(present, src, dst)
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    model_vars = model_vars.rename_axis("Step").reset_index()
+    return model_vars.assign(seed=seed, **param_columns(params))
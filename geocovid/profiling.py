@@ -0,0 +1,80 @@
+"""Wall time instrumentation of the simulation and pipeline phases."""
+from collections import defaultdict
+import contextlib
+import logging
+import time
+from typing import ContextManager, Dict, Optional, Type
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+class _Phase:
+    """Context manager adding its wall time to a phase of a timer."""
+
+    def __init__(self, timer: "PhaseTimer", name: str) -> None:
+        """Init method."""
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self, exc_type: Optional[Type[BaseException]], *exc_info: object
+    ) -> None:
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+class PhaseTimer:
+    """
+    Wall time and calls of named phases, in total and in the current step.
+
+    A disabled timer hands out one shared no-op context, so instrumented
+    code only pays a method call when profiling is off.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        """Init method."""
+        self.enabled = enabled
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.last: Dict[str, float] = defaultdict(float)
+
+    def phase(self, name: str) -> ContextManager[None]:
+        """Time the block of a phase."""
+        if not self.enabled:
+            return _NOT_TIMED
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add one call of a phase that took the given seconds."""
+        self.totals[name] += seconds
+        self.calls[name] += 1
+        self.last[name] += seconds
+
+    def next_step(self) -> None:
+        """Start timing a new step, the totals are kept."""
+        self.last.clear()
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Summary table of the phases, slowest first.
+
+        Returns
+        -------
+        pd.DataFrame
+            calls, total seconds and mean milliseconds of each phase.
+        """
+        summary = pd.DataFrame(
+            {
+                "calls": pd.Series(self.calls, dtype="int64"),
+                "total_s": pd.Series(self.totals, dtype="float64"),
+            }
+        ).rename_axis("phase")
+        summary["mean_ms"] = 1000 * summary["total_s"] / summary["calls"]
+        return summary.sort_values("total_s", ascending=False)
@@ -0,0 +1,107 @@
+"""Projection of GPS coordinates to a local metric CRS, in bulk."""
+from functools import lru_cache
+from typing import Iterator, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+from geocovid.constants import METRIC_CRS
+
+WGS84 = "EPSG:4326"
+# Columns of the projected points, x the easting and y the northing in meters.
+PROJECTED_COLUMNS = ["id", "timestamp", "x", "y"]
+PROJECTED_SCHEMA = "id string, timestamp double, x double, y double"
+
+
+@lru_cache(maxsize=None)
+def transformer(source: str, target: str) -> Transformer:
+    """Transformer between two CRS, built once, with x the longitude or easting."""
+    return Transformer.from_crs(source, target, always_xy=True)
+
+
+def project_points(
+    latitude: Sequence[float], longitude: Sequence[float], crs: str = METRIC_CRS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project latitudes and longitudes to a metric CRS, all at once.
+
+    Parameters
+    ----------
+    latitude : Sequence[float]
+        latitude of each point, in degrees.
+    longitude : Sequence[float]
+        longitude of each point, in degrees.
+    crs : str
+        metric CRS to project to.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        x and y of each point in meters, NaN when it can not be projected.
+    """
+    x, y = transformer(WGS84, crs).transform(
+        np.asarray(longitude, dtype=np.float64), np.asarray(latitude, dtype=np.float64)
+    )
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    invalid = ~(np.isfinite(x) & np.isfinite(y))
+    x[invalid], y[invalid] = np.nan, np.nan
+    return x, y
+
+
+def unproject_points(
+    x: Sequence[float], y: Sequence[float], crs: str = METRIC_CRS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude and longitude of points of a metric CRS, as project_points inverse.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        latitude and longitude of each point, in degrees.
+    """
+    longitude, latitude = transformer(crs, WGS84).transform(
+        np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    )
+    return np.asarray(latitude), np.asarray(longitude)
+
+
+def project_data_local(df: pd.DataFrame, crs: str = METRIC_CRS) -> pd.DataFrame:
+    """
+    Projection stage, the raw points with their coordinates in meters.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        raw points with id, timestamp, latitude and longitude.
+    crs : str
+        metric CRS to project to.
+    Returns
+    -------
+    pd.DataFrame
+        id, timestamp, x and y of every point with all of them valid.
+    """
+    x, y = project_points(
+        pd.to_numeric(df["latitude"], errors="coerce"),
+        pd.to_numeric(df["longitude"], errors="coerce"),
+        crs,
+    )
+    points = pd.DataFrame(
+        {
+            "id": df["id"].to_numpy(),
+            "timestamp": pd.to_numeric(df["timestamp"], errors="coerce").to_numpy(),
+            "x": x,
+            "y": y,
+        }
+    )
+    return points.dropna().reset_index(drop=True)
+
+
+def project_batches(
+    batches: Iterator[pd.DataFrame], crs: str = METRIC_CRS
+) -> Iterator[pd.DataFrame]:
+    """Projection stage over Arrow batches, as Spark mapInPandas runs it."""
+    for df in batches:
+        points = project_data_local(df, crs)
+        points["id"] = points["id"].astype(str)
+        points["timestamp"] = points["timestamp"].astype(np.float64)
+        yield points
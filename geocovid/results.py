@@ -0,0 +1,109 @@
+"""Streaming result writer."""
+import glob
+import logging
+import os
+from typing import Dict, List
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER_ROWS = 1000000
+
+
+class ParquetResultWriter:
+    """
+    Append result tables to Parquet files as the simulation runs.
+
+    Each table is a directory of Parquet parts under the run path. Appended
+    rows are kept in a bounded buffer, written as a new part when the buffer
+    is full or on flush, so finished days are on disk if a run fails.
+    """
+
+    def __init__(self, path: str, max_buffer_rows: int = MAX_BUFFER_ROWS) -> None:
+        """
+        Init method.
+
+        Parameters
+        ----------
+        path : str
+            directory of the run results.
+        max_buffer_rows : int
+            maximum amount of rows kept in memory before writing a part.
+        """
+        self.path = path
+        self.max_buffer_rows = max_buffer_rows
+        self._buffers: Dict[str, List[pd.DataFrame]] = {}
+        self._buffered_rows = 0
+        self._parts = 0
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, table: str, df: pd.DataFrame) -> None:
+        """Append rows to a table, with the index stored as columns."""
+        if df.empty:
+            return
+        self._buffers.setdefault(table, []).append(df.reset_index())
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.max_buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows of every table as new Parquet parts."""
+        if not self._buffers:
+            return
+        for table, frames in self._buffers.items():
+            table_path = os.path.join(self.path, table)
+            os.makedirs(table_path, exist_ok=True)
+            part_path = os.path.join(
+                table_path, "part-{:05d}.parquet".format(self._parts)
+            )
+            pd.concat(frames, ignore_index=True).to_parquet(part_path, index=False)
+            logger.info("results written to %s", part_path)
+        self._parts += 1
+        self._buffers = {}
+        self._buffered_rows = 0
+
+    @property
+    def parts(self) -> int:
+        """Amount of parts written."""
+        return self._parts
+
+    def rollback(self, parts: int) -> None:
+        """
+        Remove the parts written after the first given amount of them.
+
+        Used on resume, so the rows written after a checkpoint are written
+        again once, by the resumed run, and new parts continue the numbering.
+        """
+        for part_path in glob.glob(os.path.join(self.path, "*", "part-*.parquet")):
+            number = int(os.path.basename(part_path)[5:10])
+            if number >= parts:
+                os.remove(part_path)
+                logger.info("removed %s, written after the checkpoint", part_path)
+        self._parts = parts
+        self._buffers = {}
+        self._buffered_rows = 0
+
+
+def read_results(path: str, table: str, index: List[str] = None) -> pd.DataFrame:
+    """
+    Read a result table written by ParquetResultWriter.
+
+    Parameters
+    ----------
+    path : str
+        directory of the run results.
+    table : str
+        name of the table.
+    index : List[str]
+        columns to set as index.
+    Returns
+    -------
+    pd.DataFrame
+        all the rows of the table, in writing order.
+    """
+    parts = sorted(glob.glob(os.path.join(path, table, "part-*.parquet")))
+    df = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+    if index:
+        df = df.set_index(index)
+    return df
@@ -1,9 +1,10 @@
 """Scheduler based on Mesa project."""
 import logging
-from typing import Iterator, Tuple
+from typing import Iterator, List, Optional, Tuple
 
-from geopandas import GeoDataFrame
+from mesa import Agent
 from mesa.time import BaseScheduler
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -22,14 +23,41 @@ class DataScheduler(BaseScheduler):
             if key in self._agents:
                 yield key, self._agents[key]
 
-    def step(self, gdf: GeoDataFrame) -> None:
-        """Execute the step of all agents, one at a time, in random order."""
-        for key, agent in self.agent_buffer():
-            try:
-                shape = gdf.at[key, "geometry"]
-            except KeyError:
-                shape = None
-            agent.step(shape)
-        logger.info("scheduler step %f executed", self.steps)
+    def add_agents(self, agents: List[Agent]) -> None:
+        """Add new agents to the schedule at once."""
+        self._agents.update((agent.unique_id, agent) for agent in agents)
+
+    def step(
+        self,
+        keys: np.ndarray,
+        bounds: np.ndarray,
+        contacts: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        """
+        Execute the step of all agents, by phases.
+
+        The ids and positions of the step, as frame_bounds gives them, are
+        aligned to the agents once, then the model checks the status and runs
+        the interactions of all infected agents at once, over the given
+        contacts if any, all present agents move, and the agents not seen
+        recently go dormant.
+        """
+        timer = self.model.timer
+        with timer.phase("input"):
+            present, positions = self.model.align_positions(keys, bounds)
+        with timer.phase("check"):
+            self.model.check()
+        with timer.phase("interact"):
+            if contacts is None:
+                self.model.interact()
+            else:
+                self.model.interact_contacts(*contacts)
+        self.model.move_agents(present, positions)
+        self.model.sleep_agents()
+        self.tick()
+
+    def tick(self) -> None:
+        """Advance the scheduler clock."""
+        logger.info("scheduler step %d executed", self.steps)
         self.steps += 1
         self.time += 1
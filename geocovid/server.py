@@ -31,7 +31,7 @@ model_params = {
         "slider", "Initial infected poblation", 100, 0, 1000, 10
     ),
     "exposure_distance": UserSettableParameter(
-        "slider", "Exposure distance", 0.0001, 0.0, 1.0, 0.0001,
+        "slider", "Exposure distance (m)", 10.0, 0.0, 100.0, 1.0,
     ),
     "death_prob": UserSettableParameter(
         "slider", "Death Probability", 0.05, 0.0, 1.0, 0.05,
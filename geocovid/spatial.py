@@ -0,0 +1,632 @@
+"""Spatial utilities over axis-aligned bounding boxes."""
+from collections import defaultdict
+import math
+from typing import (
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from mesa_geo import GeoSpace
+from mesa_geo.geoagent import GeoAgent
+import numpy as np
+from shapely.geometry import Point, Polygon
+from shapely.geometry.base import BaseGeometry
+
+from geocovid.constants import METRIC_CRS
+
+# Boxes covering more grid cells than this are matched by brute force.
+MAX_CELLS_PER_BOX = 64
+# Low 32 bits of a cell key, holding the y cell.
+CELL_MASK = 0xFFFFFFFF
+
+
+def bbox_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Compute the distance between pairs of bounding boxes.
+
+    Parameters
+    ----------
+    a : np.ndarray
+        (n, 4) array of minx, miny, maxx, maxy.
+    b : np.ndarray
+        (n, 4) array of minx, miny, maxx, maxy, or a single box.
+    Returns
+    -------
+    np.ndarray
+        distance between each pair of boxes, 0 when they intersect.
+    """
+    dx = np.maximum(0, np.maximum(a[..., 0] - b[..., 2], b[..., 0] - a[..., 2]))
+    dy = np.maximum(0, np.maximum(a[..., 1] - b[..., 3], b[..., 1] - a[..., 3]))
+    return np.hypot(dx, dy)
+
+
+def bounds_centroid(bounds: np.ndarray) -> np.ndarray:
+    """Centroid of bounding boxes, exact for envelopes and points."""
+    return (bounds[..., :2] + bounds[..., 2:]) / 2
+
+
+def bounds_shape(bounds: Sequence[float]) -> BaseGeometry:
+    """
+    Shapely geometry of a bounding box, built on demand.
+
+    Parameters
+    ----------
+    bounds : Sequence[float]
+        minx, miny, maxx, maxy.
+    Returns
+    -------
+    BaseGeometry
+        a Point if the box has no extent, else its envelope Polygon.
+    """
+    minx, miny, maxx, maxy = (float(value) for value in bounds)
+    if minx == maxx and miny == maxy:
+        return Point(minx, miny)
+    return Polygon([(minx, miny), (minx, maxy), (maxx, maxy), (maxx, miny)])
+
+
+def geometry_bounds(shape: BaseGeometry) -> Tuple[float, float, float, float]:
+    """Bounding box of a shapely geometry, NaN for empty ones."""
+    if shape is None or shape.is_empty:
+        return (np.nan, np.nan, np.nan, np.nan)
+    return shape.bounds
+
+
+def cell_key(
+    cell_x: Union[int, np.ndarray], cell_y: Union[int, np.ndarray]
+) -> Union[int, np.ndarray]:
+    """Pack the x and y cells of a grid in one integer, for ints and int64 arrays."""
+    return (cell_x << 32) | (cell_y & CELL_MASK)
+
+
+def cell_keys(points: np.ndarray, cell_size: float) -> np.ndarray:
+    """
+    Integer key of the grid cell of each point, to bucket them by proximity.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        (n, 2) array of projected x, y coordinates.
+    cell_size : float
+        side of the grid cells, in the unit of the coordinates.
+    Returns
+    -------
+    np.ndarray
+        int64 key of the cell of each point, the same for the same cell.
+    """
+    cells = np.floor(points / cell_size).astype(np.int64)
+    return cell_key(cells[:, 0], cells[:, 1])
+
+
+def _cell_size(bounds: np.ndarray, distance: float) -> float:
+    """Size grid cells by the exposure distance and the usual box extent."""
+    extent = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    cell_size = max(distance, float(np.percentile(extent, 90)))
+    if cell_size > 0:
+        return cell_size
+    span = np.max(bounds[:, 2:], axis=0) - np.min(bounds[:, :2], axis=0)
+    return float(np.max(span)) / np.sqrt(len(bounds)) or 1.0
+
+
+def _cell_ranges(
+    bounds: np.ndarray, cell_size: float, origin: np.ndarray
+) -> Tuple[np.ndarray, ...]:
+    """Return the first cell and the number of cells covered on each axis."""
+    first = np.floor((bounds[:, :2] - origin) / cell_size).astype(np.int64)
+    last = np.floor((bounds[:, 2:] - origin) / cell_size).astype(np.int64)
+    return (
+        first[:, 0],
+        first[:, 1],
+        last[:, 0] - first[:, 0] + 1,
+        last[:, 1] - first[:, 1] + 1,
+    )
+
+
+def _cover(
+    bounds: np.ndarray, cell_size: float, origin: np.ndarray, rows: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Expand every box into one (cell key, box position) entry per cell."""
+    x0, y0, nx, ny = _cell_ranges(bounds, cell_size, origin)
+    cells = nx * ny
+    box = np.repeat(np.arange(len(bounds)), cells)
+    offset = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+    cx = x0[box] + offset % nx[box]
+    cy = y0[box] + offset // nx[box]
+    return cx * rows + cy, box
+
+
+def _brute_pairs(
+    source_bounds: np.ndarray, target_bounds: np.ndarray, distance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Match every source against every target."""
+    src, tgt = np.meshgrid(
+        np.arange(len(source_bounds)), np.arange(len(target_bounds)), indexing="ij"
+    )
+    src, tgt = src.ravel(), tgt.ravel()
+    near = bbox_distance(source_bounds[src], target_bounds[tgt]) <= distance
+    return src[near], tgt[near]
+
+
+def query_pairs(
+    source_bounds: np.ndarray, target_bounds: np.ndarray, distance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find every (source, target) pair of boxes within a distance.
+
+    All sources are matched in one batch: boxes are hashed into a uniform
+    grid, candidate pairs are joined by cell key and filtered by their exact
+    box distance.
+
+    Parameters
+    ----------
+    source_bounds : np.ndarray
+        (n, 4) array of minx, miny, maxx, maxy.
+    target_bounds : np.ndarray
+        (m, 4) array of minx, miny, maxx, maxy.
+    distance : float
+        maximum distance between the boxes of a pair.
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        positions of the source and target boxes of each pair.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    src_valid = np.flatnonzero(np.isfinite(source_bounds).all(axis=1))
+    tgt_valid = np.flatnonzero(np.isfinite(target_bounds).all(axis=1))
+    if len(src_valid) == 0 or len(tgt_valid) == 0:
+        return empty, empty
+
+    sources = source_bounds[src_valid] + np.array([-1, -1, 1, 1]) * distance
+    targets = target_bounds[tgt_valid]
+    cell_size = _cell_size(np.concatenate([sources, targets]), distance)
+    origin = np.minimum(sources[:, :2].min(axis=0), targets[:, :2].min(axis=0))
+    top = np.maximum(sources[:, 3].max(), targets[:, 3].max())
+    rows = int(np.floor((top - origin[1]) / cell_size)) + 1
+
+    src_big = np.prod(_cell_ranges(sources, cell_size, origin)[2:], axis=0)
+    src_big = src_big > MAX_CELLS_PER_BOX
+    tgt_big = np.prod(_cell_ranges(targets, cell_size, origin)[2:], axis=0)
+    tgt_big = tgt_big > MAX_CELLS_PER_BOX
+    src_small, tgt_small = np.flatnonzero(~src_big), np.flatnonzero(~tgt_big)
+
+    src_cells, src_box = _cover(sources[src_small], cell_size, origin, rows)
+    tgt_cells, tgt_box = _cover(targets[tgt_small], cell_size, origin, rows)
+    order = np.argsort(tgt_cells, kind="stable")
+    tgt_cells, tgt_box = tgt_cells[order], tgt_box[order]
+    start = np.searchsorted(tgt_cells, src_cells, side="left")
+    count = np.searchsorted(tgt_cells, src_cells, side="right") - start
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    src = src_small[np.repeat(src_box, count)]
+    tgt = tgt_small[tgt_box[np.repeat(start, count) + offset]]
+
+    pairs = [(src, tgt)]
+    if src_big.any():
+        big = np.flatnonzero(src_big)
+        big_src, big_tgt = _brute_pairs(
+            source_bounds[src_valid[big]], targets, distance
+        )
+        pairs.append((big[big_src], big_tgt))
+    if tgt_big.any():
+        big = np.flatnonzero(tgt_big)
+        small_src, big_tgt = _brute_pairs(
+            source_bounds[src_valid[src_small]], targets[big], distance
+        )
+        pairs.append((src_small[small_src], big[big_tgt]))
+
+    src = np.concatenate([pair[0] for pair in pairs])
+    tgt = np.concatenate([pair[1] for pair in pairs])
+    keys = np.unique(src.astype(np.int64) * len(targets) + tgt)
+    src, tgt = np.divmod(keys, len(targets))
+    near = bbox_distance(source_bounds[src_valid[src]], targets[tgt]) <= distance
+    return src_valid[src[near]], tgt_valid[tgt[near]]
+
+
+def carried_pairs(
+    hourly_positions: Iterable[Tuple[np.ndarray, np.ndarray]],
+    distance: float,
+    bounds: np.ndarray = None,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Find every pair of agents within a distance on each hour, before its move.
+
+    Pairs are the contacts the models query on each step: agents keep their
+    last known position on the hours they are missing, agents seen for the
+    first time are at their position of the hour, and everyone else is
+    paired before moving to it.
+
+    Parameters
+    ----------
+    hourly_positions : Iterable[Tuple[np.ndarray, np.ndarray]]
+        dense agent codes, numbered by first appearance, and (n, 4) bounding
+        boxes of each hour.
+    distance : float
+        maximum distance between the boxes of a pair.
+    bounds : np.ndarray
+        (k, 4) last known boxes of the agents of codes below k, seen before
+        the first hour.
+    Returns
+    -------
+    Iterator[Tuple[int, np.ndarray, np.ndarray]]
+        amount of agents known, and codes of the agents of each pair, with
+        src < dst, on each hour.
+    """
+    bounds = np.empty((0, 4)) if bounds is None else np.array(bounds, dtype=float)
+    for codes, hour_bounds in hourly_positions:
+        seen = len(bounds)
+        if len(codes) and codes.max() >= seen:
+            bounds = np.concatenate(
+                [bounds, np.full((codes.max() + 1 - seen, 4), np.nan)]
+            )
+            new = codes >= seen
+            bounds[codes[new]] = hour_bounds[new]
+
+        src, dst = query_pairs(bounds, bounds, distance)
+        pair = src < dst
+        yield len(bounds), src[pair], dst[pair]
+
+        has_shape = np.isfinite(hour_bounds).all(axis=1)
+        bounds[codes[has_shape]] = hour_bounds[has_shape]
+
+
+class BoundsArray:
+    """
+    Growable (n, 4) array of bounding boxes, one row per agent.
+
+    Agents keep their row instead of a shapely object, so positions are
+    updated in place and read in bulk.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Init method."""
+        self.bounds = np.full((capacity, 4), np.nan)
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Amount of rows."""
+        return self._size
+
+    def extend(self, bounds: np.ndarray) -> range:
+        """Add (n, 4) bounding boxes, doubling the capacity when full."""
+        start, stop = self._size, self._size + len(bounds)
+        if stop > len(self.bounds):
+            capacity = max(stop, 2 * len(self.bounds))
+            grown = np.full((capacity, 4), np.nan)
+            grown[:start] = self.bounds[:start]
+            self.bounds = grown
+        self.bounds[start:stop] = bounds
+        self._size = stop
+        return range(start, stop)
+
+    def append(self, bounds: Sequence[float]) -> int:
+        """Add a bounding box, returning its row."""
+        return self.extend(np.array([bounds], dtype=np.float64))[0]
+
+    def values(self) -> np.ndarray:
+        """Bounding boxes of all the rows."""
+        return self.bounds[: self._size]
+
+
+class GridIndex:
+    """
+    Uniform grid spatial index, maintained incrementally.
+
+    Every item is hashed into the grid cells covered by its bounding box, so
+    moving an item only touches its own cells instead of rebuilding the whole
+    index. Cells are keyed by a packed integer, cheaper to hash than a tuple.
+    Items covering too many cells are kept apart and always checked.
+    """
+
+    def __init__(self, cell_size: float, capacity: int = 1024) -> None:
+        """Init method."""
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive, got {}".format(cell_size))
+        self.cell_size = cell_size
+        self.items: List[Optional[Hashable]] = []
+        self.slots: Dict[Hashable, int] = {}
+        self.bounds = np.full((capacity, 4), np.nan)
+        self._cells: Dict[int, Set[int]] = defaultdict(set)
+        self._ranges: Dict[int, Tuple[int, int, int, int]] = {}
+        self._oversized: Set[int] = set()
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        """Amount of items."""
+        return len(self.slots)
+
+    def __contains__(self, item: Hashable) -> bool:
+        """Check if an item is indexed."""
+        return item in self.slots
+
+    def _cell_range(self, bounds: Sequence[float]) -> Tuple[int, int, int, int]:
+        """First and last cells covered by a box on each axis."""
+        minx, miny, maxx, maxy = bounds
+        return (
+            math.floor(minx / self.cell_size),
+            math.floor(miny / self.cell_size),
+            math.floor(maxx / self.cell_size),
+            math.floor(maxy / self.cell_size),
+        )
+
+    def _link(self, slot: int) -> None:
+        """Hash a slot into the cells covered by its box."""
+        bounds = self.bounds[slot]
+        if not np.isfinite(bounds).all():
+            return
+        cell_range = self._cell_range(bounds)
+        x0, y0, x1, y1 = cell_range
+        self._ranges[slot] = cell_range
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_BOX:
+            self._oversized.add(slot)
+            return
+        for cell_x in range(x0, x1 + 1):
+            for cell_y in range(y0, y1 + 1):
+                self._cells[cell_key(cell_x, cell_y)].add(slot)
+
+    def _unlink(self, slot: int) -> None:
+        """Remove a slot from its cells."""
+        cell_range = self._ranges.pop(slot, None)
+        if cell_range is None:
+            return
+        if slot in self._oversized:
+            self._oversized.discard(slot)
+            return
+        x0, y0, x1, y1 = cell_range
+        for cell_x in range(x0, x1 + 1):
+            for cell_y in range(y0, y1 + 1):
+                key = cell_key(cell_x, cell_y)
+                cell = self._cells[key]
+                cell.discard(slot)
+                if not cell:
+                    del self._cells[key]
+
+    def insert(self, item: Hashable, bounds: Sequence[float]) -> None:
+        """Add an item with its bounding box."""
+        if item in self.slots:
+            self.update(item, bounds)
+            return
+        if self._free:
+            slot = self._free.pop()
+            self.items[slot] = item
+        else:
+            slot = len(self.items)
+            self.items.append(item)
+            if slot >= len(self.bounds):
+                grown = np.full((2 * len(self.bounds), 4), np.nan)
+                grown[: len(self.bounds)] = self.bounds
+                self.bounds = grown
+        self.slots[item] = slot
+        self.bounds[slot] = bounds
+        self._link(slot)
+
+    def insert_many(self, items: Sequence[Hashable], bounds: np.ndarray) -> None:
+        """
+        Add new items with their bounding boxes in one batch.
+
+        Slots are allocated at the end at once, and the cells of all the
+        boxes are computed together and filled once per cell.
+
+        Parameters
+        ----------
+        items : Sequence[Hashable]
+            items not yet indexed.
+        bounds : np.ndarray
+            (n, 4) array of minx, miny, maxx, maxy.
+        """
+        start, stop = len(self.items), len(self.items) + len(items)
+        if stop > len(self.bounds):
+            grown = np.full((max(stop, 2 * len(self.bounds)), 4), np.nan)
+            grown[:start] = self.bounds[:start]
+            self.bounds = grown
+        self.items.extend(items)
+        self.slots.update(zip(items, range(start, stop)))
+        self.bounds[start:stop] = bounds
+
+        slots = start + np.flatnonzero(np.isfinite(bounds).all(axis=1))
+        if len(slots) == 0:
+            return
+        first = np.floor(self.bounds[slots, :2] / self.cell_size).astype(np.int64)
+        last = np.floor(self.bounds[slots, 2:] / self.cell_size).astype(np.int64)
+        ranges = np.hstack([first, last])
+        self._ranges.update(zip(slots.tolist(), map(tuple, ranges.tolist())))
+        cells = np.prod(last - first + 1, axis=1)
+        oversized = cells > MAX_CELLS_PER_BOX
+        self._oversized.update(slots[oversized].tolist())
+
+        small = ~oversized
+        cells, first, last = cells[small], first[small], last[small]
+        box = np.repeat(np.arange(len(cells)), cells)
+        offset = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+        width = (last[:, 0] - first[:, 0] + 1)[box]
+        cell_x = first[box, 0] + offset % width
+        cell_y = first[box, 1] + offset // width
+        keys = cell_key(cell_x, cell_y)
+        order = np.argsort(keys, kind="stable")
+        keys, box_slots = keys[order], slots[small][box][order]
+        change = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate([[0], change])
+        stops = np.concatenate([change, [len(box_slots)]])
+        for key, cell_start, cell_stop in zip(
+            keys[starts].tolist(), starts.tolist(), stops.tolist()
+        ):
+            self._cells[key].update(box_slots[cell_start:cell_stop].tolist())
+
+    def restore(
+        self,
+        items: Sequence[Optional[Hashable]],
+        bounds: np.ndarray,
+        free: Sequence[int],
+    ) -> None:
+        """
+        Fill an empty index with items at given slots, as saved from another.
+
+        Keeping the slots keeps the order of query results, and the free
+        slots the ones taken by the next inserts.
+
+        Parameters
+        ----------
+        items : Sequence[Optional[Hashable]]
+            item of each slot, None for the free ones.
+        bounds : np.ndarray
+            (n, 4) bounding box of each slot, NaN for the free ones.
+        free : Sequence[int]
+            free slots, in the order they would be taken.
+        """
+        if self.items:
+            raise ValueError("only an empty index can be restored")
+        self.insert_many(items, bounds)
+        self.slots.pop(None, None)
+        self._free = list(free)
+
+    def free_slots(self) -> List[int]:
+        """Free slots, in the order they would be taken by restore."""
+        return list(self._free)
+
+    def update(self, item: Hashable, bounds: Sequence[float]) -> None:
+        """Move an item, touching its cells only if it covers different ones."""
+        slot = self.slots[item]
+        self.bounds[slot] = bounds
+        moved_cells = self._ranges.get(slot) != self._cell_range(bounds)
+        if moved_cells or slot in self._oversized:
+            self._unlink(slot)
+            self._link(slot)
+
+    def remove(self, item: Hashable) -> None:
+        """Remove an item from the index."""
+        slot = self.slots.pop(item)
+        self._unlink(slot)
+        self.items[slot] = None
+        self.bounds[slot] = np.nan
+        self._free.append(slot)
+
+    def _candidates(self, bounds: Sequence[float]) -> List[int]:
+        """Slots hashed into the cells covered by a box."""
+        x0, y0, x1, y1 = self._cell_range(bounds)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            return [slot for cell in self._cells.values() for slot in cell]
+        cells = self._cells
+        keys = [
+            cell_key(cell_x, cell_y)
+            for cell_x in range(x0, x1 + 1)
+            for cell_y in range(y0, y1 + 1)
+        ]
+        return [slot for key in keys if key in cells for slot in cells[key]]
+
+    def query_pairs(
+        self, bounds: np.ndarray, distance: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every indexed item within a distance of each of the given boxes.
+
+        Parameters
+        ----------
+        bounds : np.ndarray
+            (n, 4) array of minx, miny, maxx, maxy.
+        distance : float
+            maximum distance between the boxes of a pair.
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            positions in bounds and slots of the indexed items of each pair.
+        """
+        oversized = list(self._oversized)
+        sources, slots = [], []
+        for position, box in enumerate(bounds):
+            if not np.isfinite(box).all():
+                continue
+            candidates = self._candidates(box + np.array([-1, -1, 1, 1]) * distance)
+            candidates.extend(oversized)
+            sources.append(np.full(len(candidates), position, dtype=np.int64))
+            slots.append(np.array(candidates, dtype=np.int64))
+        if not sources:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        sources, slots = np.concatenate(sources), np.concatenate(slots)
+        keys = np.unique(sources * len(self.items) + slots)
+        sources, slots = np.divmod(keys, len(self.items))
+        near = bbox_distance(bounds[sources], self.bounds[slots]) <= distance
+        return sources[near], slots[near]
+
+    def query(self, bounds: Sequence[float], distance: float) -> List[Hashable]:
+        """Items within a distance of a bounding box."""
+        _, slots = self.query_pairs(np.array([bounds], dtype=np.float64), distance)
+        return [self.items[slot] for slot in slots]
+
+    def total_bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Bounding box of all the indexed items."""
+        if not self.slots:
+            return None
+        bounds = self.bounds[: len(self.items)]
+        minx, miny = np.nanmin(bounds[:, :2], axis=0)
+        maxx, maxy = np.nanmax(bounds[:, 2:], axis=0)
+        return minx, miny, maxx, maxy
+
+
+def agent_bounds(agent: GeoAgent) -> Sequence[float]:
+    """Bounding box of an agent, from its bounds when it keeps them."""
+    bounds = getattr(agent, "bounds", None)
+    return geometry_bounds(agent.shape) if bounds is None else bounds
+
+
+class GridSpace(GeoSpace):
+    """GeoSpace backed by an incremental GridIndex instead of an rtree."""
+
+    def __init__(self, cell_size: float, crs: str = METRIC_CRS) -> None:
+        """Init method."""
+        super().__init__(crs=crs)
+        self.index = GridIndex(cell_size)
+
+    def add_agents(
+        self, agents: Union[GeoAgent, List[GeoAgent]], bounds: np.ndarray = None
+    ) -> None:
+        """
+        Add a list of GeoAgents, or a single one, to the index.
+
+        New agents are inserted in one batch, with the given (n, 4) bounds
+        or the ones of the agents.
+        """
+        if isinstance(agents, GeoAgent):
+            agents = [agents]
+        if bounds is None:
+            bounds = [agent_bounds(agent) for agent in agents]
+            bounds = np.array(bounds, dtype=np.float64).reshape(-1, 4)
+        is_new = [agent not in self.index for agent in agents]
+        if all(is_new):
+            self.index.insert_many(agents, bounds)
+            return
+        for agent, box in zip(agents, bounds):
+            self.index.insert(agent, box)
+
+    def remove_agent(self, agent: GeoAgent) -> None:
+        """Remove an agent from the index."""
+        self.index.remove(agent)
+
+    def update_agent(self, agent: GeoAgent) -> None:
+        """Update the position of an agent whose shape changed."""
+        self.index.update(agent, agent_bounds(agent))
+
+    def get_neighbors_within_distance(
+        self, agent: GeoAgent, distance: float
+    ) -> Iterator[GeoAgent]:
+        """Yield the agents within distance of the agent bounding box."""
+        yield from self.index.query(agent_bounds(agent), distance)
+
+    def _recreate_rtree(self, new_agents: List[GeoAgent] = None) -> None:
+        """The grid index is kept up to date, only add the new agents."""
+        if new_agents:
+            self.add_agents(new_agents)
+
+    def update_bbox(self, bbox: Tuple[float, float, float, float] = None) -> None:
+        """Update bounding box of the space."""
+        self.bbox = bbox or self.index.total_bounds()
+
+    @property
+    def agents(self) -> List[GeoAgent]:
+        """All the agents in the space."""
+        return list(self.index.slots)
@@ -0,0 +1,134 @@
+"""Synthetic GPS trajectories, shaped as the output of the data pipelines."""
+import logging
+from typing import Iterator, Sequence
+
+from geopandas import GeoDataFrame
+import numpy as np
+import pandas as pd
+
+from geocovid.constants import MAP_COORDS, OUTLIER_AREA, STEPS_PER_DAY
+from geocovid.local_pipeline import remove_outliers_local
+from geocovid.projection import project_points
+
+logger = logging.getLogger(__name__)
+
+# Extent of the envelopes replaced by their centroid, above the outlier area.
+OUTLIER_EXTENT = 2 * np.sqrt(OUTLIER_AREA)
+
+
+def synthetic_envelopes(
+    agents: int,
+    hours: int = STEPS_PER_DAY,
+    clusters: int = 50,
+    spread: float = 200.0,
+    presence: float = 0.7,
+    churn: float = 0.01,
+    extent: float = 20.0,
+    outliers: float = 0.01,
+    area: float = 10000.0,
+    center: Sequence[float] = MAP_COORDS,
+    seed: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Generate the hourly envelopes of synthetic devices.
+
+    Every device has a home around one of the cluster centers, or anywhere in
+    the area without clusters, and is seen on each hour with a probability,
+    somewhere around its home. Each hour some devices are replaced by new
+    ones, with new ids and homes. Coordinates are in meters of the metric
+    CRS, as the pipelines project them.
+
+    Parameters
+    ----------
+    agents : int
+        amount of devices at any time.
+    hours : int
+        amount of hours to generate.
+    clusters : int
+        amount of cluster centers, 0 to spread the homes uniformly.
+    spread : float
+        standard deviation of the homes around their cluster, and twice the
+        one of the positions around their home, in meters.
+    presence : float
+        probability of a device being seen on an hour.
+    churn : float
+        fraction of the devices replaced by new ones each hour.
+    extent : float
+        mean width and height of the envelopes, in meters.
+    outliers : float
+        fraction of envelopes bigger than the outlier area.
+    area : float
+        side of the square holding the clusters, in meters.
+    center : Sequence[float]
+        latitude and longitude of the center of the area, in degrees.
+    seed : int
+        random seed, the same seed gives the same trajectories.
+    Returns
+    -------
+    Iterator[pd.DataFrame]
+        id, h and the minx, miny, maxx, maxy envelope of the devices seen on
+        each hour, as aggregate_spatial_data_local, sorted by id.
+    """
+    rng = np.random.default_rng(seed)
+    origin = np.concatenate(project_points([center[0]], [center[1]])) - area / 2
+
+    def homes(size: int) -> np.ndarray:
+        if clusters <= 0:
+            return origin + rng.random((size, 2)) * area
+        cluster = rng.integers(clusters, size=size)
+        return centers[cluster] + rng.normal(0, spread, (size, 2))
+
+    centers = origin + rng.random((max(clusters, 1), 2)) * area
+    ids = np.arange(agents, dtype=np.int64)
+    home = homes(agents)
+    next_id = agents
+    for hour in range(hours):
+        replaced = np.flatnonzero(rng.random(agents) < churn)
+        ids[replaced] = np.arange(next_id, next_id + len(replaced))
+        home[replaced] = homes(len(replaced))
+        next_id += len(replaced)
+
+        seen = np.flatnonzero(rng.random(agents) < presence)
+        position = home[seen] + rng.normal(0, spread / 2, (len(seen), 2))
+        size = rng.exponential(extent, (len(seen), 2))
+        size[rng.random(len(seen)) < outliers] = OUTLIER_EXTENT
+        yield pd.DataFrame(
+            {
+                "id": np.char.add("d", ids[seen].astype(str)).astype(object),
+                "h": np.full(len(seen), hour % STEPS_PER_DAY, dtype=np.int32),
+                "minx": position[:, 0] - size[:, 0] / 2,
+                "miny": position[:, 1] - size[:, 1] / 2,
+                "maxx": position[:, 0] + size[:, 0] / 2,
+                "maxy": position[:, 1] + size[:, 1] / 2,
+            }
+        ).sort_values("id", ignore_index=True)
+
+
+def synthetic_hours(agents: int, **kwargs) -> Iterator[GeoDataFrame]:
+    """
+    Generate the hourly positions of synthetic devices, one hour at a time.
+
+    Envelopes are turned into geometries with the outlier rule of the
+    pipelines, so each hour is shaped as a step input, indexed by id.
+    Keyword arguments are the ones of synthetic_envelopes.
+    """
+    for agg_df in synthetic_envelopes(agents, **kwargs):
+        gdf = remove_outliers_local(agg_df)
+        yield gdf.drop(columns="h").set_index("id")
+
+
+def synthetic_day(agents: int, **kwargs) -> GeoDataFrame:
+    """
+    Generate a day of synthetic positions, shaped as transform_data_spark.
+
+    Keyword arguments are the ones of synthetic_envelopes.
+
+    Returns
+    -------
+    GeoDataFrame
+        position of each device, indexed by hour and id.
+    """
+    agg_df = pd.concat(list(synthetic_envelopes(agents, **kwargs)), ignore_index=True)
+    gdf = remove_outliers_local(agg_df)
+    gdf.set_index(["h", "id"], inplace=True)
+    return gdf
@@ -0,0 +1,651 @@
+"""Spatially partitioned simulation, with the map tiles split among processes."""
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from geopandas import GeoDataFrame
+import numpy as np
+
+from geocovid.agent import Status
+from geocovid.datacollection import TypedColumn
+from geocovid.engine import VectorizedEngine, draw_infections, frame_bounds
+from geocovid.model import GeoCovidModel
+from geocovid.spatial import bounds_centroid, query_pairs
+
+logger = logging.getLogger(__name__)
+
+# Side of the tiles in meters, about the cell of a 5 character geohash.
+TILE_SIZE = 4000.0
+TILE_WORKERS = 2
+# Agent state handed off between workers, by agent.
+STATE = ("keys", "bounds", "status", "infected_at", "active", "last_seen")
+
+AgentState = Dict[str, np.ndarray]
+
+
+def empty_state() -> AgentState:
+    """State of no agents."""
+    return {
+        "keys": np.empty(0, dtype=object),
+        "bounds": np.empty((0, 4)),
+        "status": np.empty(0, dtype=np.int8),
+        "infected_at": np.empty(0, dtype=np.int64),
+        "active": np.empty(0, dtype=bool),
+        "last_seen": np.empty(0, dtype=np.int64),
+    }
+
+
+def new_state(keys: np.ndarray, bounds: np.ndarray) -> AgentState:
+    """State of new susceptible agents."""
+    return {
+        "keys": keys,
+        "bounds": bounds,
+        "status": np.full(len(keys), Status.SUSCEPTIBLE, dtype=np.int8),
+        "infected_at": np.zeros(len(keys), dtype=np.int64),
+        "active": np.ones(len(keys), dtype=bool),
+        "last_seen": np.zeros(len(keys), dtype=np.int64),
+    }
+
+
+def concat_states(states: List[AgentState]) -> AgentState:
+    """State of the agents of several states, in order."""
+    if not states:
+        return empty_state()
+    return {name: np.concatenate([state[name] for state in states]) for name in STATE}
+
+
+def split_state(
+    state: AgentState, owners: np.ndarray, workers: int
+) -> List[AgentState]:
+    """State of the agents going to each worker."""
+    return [
+        {name: values[owners == worker] for name, values in state.items()}
+        for worker in range(workers)
+    ]
+
+
+class Tiling:
+    """
+    Square tiles of the map, each one owned by a worker.
+
+    Tiles are cells of tile_size meters, the kind of grid of the geohash
+    prefixes, and are dealt to the workers by a hash of the cell, so the
+    agents of a dense area are spread among all workers. An agent belongs to
+    the tile of the centroid of its position.
+    """
+
+    def __init__(self, tile_size: float, workers: int) -> None:
+        """Init method."""
+        self.tile_size = tile_size
+        self.workers = workers
+
+    def _cell_owners(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """Worker owning each cell."""
+        return ((cx * 73856093) ^ (cy * 19349663)) % self.workers
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        """Cell of each (x, y) point."""
+        return np.floor(points / self.tile_size).astype(np.int64)
+
+    def owners(self, bounds: np.ndarray) -> np.ndarray:
+        """
+        Worker owning the tile of each position.
+
+        Parameters
+        ----------
+        bounds : np.ndarray
+            (n, 4) positions, all finite.
+        Returns
+        -------
+        np.ndarray
+            worker of each position.
+        """
+        cells = self._cells(bounds_centroid(bounds))
+        return self._cell_owners(cells[:, 0], cells[:, 1])
+
+    def border_owners(
+        self, bounds: np.ndarray, margin: float, worker: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Other workers owning tiles within a margin of each position.
+
+        Parameters
+        ----------
+        bounds : np.ndarray
+            (n, 4) positions of the agents of a worker, all finite.
+        margin : float
+            distance to the tiles, in each axis.
+        worker : int
+            worker of the agents.
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            position and other worker of each unique (position, worker) pair.
+        """
+        first = self._cells(bounds[:, :2] - margin)
+        last = self._cells(bounds[:, 2:] + margin)
+        span = last - first
+        rows, owners = [], []
+        if len(bounds):
+            for dx in range(int(span[:, 0].max()) + 1):
+                for dy in range(int(span[:, 1].max()) + 1):
+                    inside = np.flatnonzero((span[:, 0] >= dx) & (span[:, 1] >= dy))
+                    cell_owners = self._cell_owners(
+                        first[inside, 0] + dx, first[inside, 1] + dy
+                    )
+                    other = cell_owners != worker
+                    rows.append(inside[other])
+                    owners.append(cell_owners[other])
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        pairs = np.unique(
+            np.stack([np.concatenate(rows), np.concatenate(owners)], axis=1), axis=0
+        )
+        return pairs[:, 0], pairs[:, 1]
+
+
+class TileEngine(VectorizedEngine):
+    """
+    Vectorized engine of the agents owned by one worker of a tiled model.
+
+    Agents come and go with their whole state, as they move between the
+    tiles of different workers, and the last rows of the engine arrays take the
+    place of those that leave. Infected agents near the tiles of other workers
+    are sent to them as halo copies, so every infected-susceptible pair is
+    drawn once, by the worker of the susceptible agent.
+    """
+
+    def __init__(self, model: GeoCovidModel, tiling: Tiling, worker: int) -> None:
+        """Init method."""
+        super().__init__(model)
+        self.tiling = tiling
+        self.worker = worker
+
+    def receive(self, state: AgentState) -> None:
+        """Take the agents of a state, new to this worker."""
+        start = len(self)
+        self.index.add(state["keys"])
+        stop = len(self)
+        self._reserve(stop)
+        self.bounds[start:stop] = state["bounds"]
+        self.status[start:stop] = state["status"]
+        self.infected_at[start:stop] = state["infected_at"]
+        self.active[start:stop] = state["active"]
+        self.last_seen[start:stop] = state["last_seen"]
+        statuses, amounts = np.unique(state["status"], return_counts=True)
+        for status, amount in zip(statuses, amounts):
+            self.model.update_counts(None, Status(status), int(amount))
+
+    def release(self, keys: np.ndarray) -> AgentState:
+        """
+        Hand off agents to another worker.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            ids of agents of this worker.
+        Returns
+        -------
+        AgentState
+            state of those agents, that are no longer in the engine.
+        """
+        rows = self.rows(keys)
+        state = {
+            "keys": keys,
+            "bounds": self.bounds[rows],
+            "status": self.status[rows],
+            "infected_at": self.infected_at[rows],
+            "active": self.active[rows],
+            "last_seen": self.last_seen[rows],
+        }
+        statuses, amounts = np.unique(state["status"], return_counts=True)
+        for status, amount in zip(statuses, amounts):
+            self.model.status_counts[Status(status)] -= int(amount)
+
+        moved_from, moved_to = self.index.remove(rows)
+        for array in (
+            self.bounds,
+            self.status,
+            self.infected_at,
+            self.active,
+            self.last_seen,
+        ):
+            array[moved_to] = array[moved_from]
+        return state
+
+    def begin(
+        self,
+        time: int,
+        keys: np.ndarray,
+        bounds: np.ndarray,
+        arrivals: AgentState,
+        infect: np.ndarray,
+        margin: float,
+    ) -> Tuple[AgentState, np.ndarray, np.ndarray]:
+        """
+        Take the arrivals, wake the dormant agents and check the infected.
+
+        Parameters
+        ----------
+        time : int
+            step time.
+        keys : np.ndarray
+            ids of the agents of this worker present in the step.
+        bounds : np.ndarray
+            (n, 4) positions of those agents.
+        arrivals : AgentState
+            new agents and agents handed off by other workers.
+        infect : np.ndarray
+            ids of agents to infect before the check.
+        margin : float
+            distance to the tiles of other workers that needs a halo copy.
+        Returns
+        -------
+        Tuple[AgentState, np.ndarray, np.ndarray]
+            state of the woken agents now in the tiles of other workers, and
+            position and worker of the halo copies of the infected agents.
+        """
+        self.receive(arrivals)
+        rows = self.rows(keys)
+        woken = ~self.active[rows] & np.isfinite(bounds).all(axis=1)
+        self.active[rows[woken]] = True
+        self.bounds[rows[woken]] = bounds[woken]
+        if woken.any():
+            logger.info("%d dormant agents woken", np.count_nonzero(woken))
+        woken_keys = keys[woken]
+        away = self.tiling.owners(bounds[woken]) != self.worker
+        leaving = self.release(woken_keys[away]) if away.any() else empty_state()
+        infected = self.rows(infect)
+        self.set_status(np.unique(infected[infected >= 0]), Status.INFECTED)
+
+        self.check(time)
+        sources = self.bounds[: len(self)][self.status[: len(self)] == Status.INFECTED]
+        sources = sources[np.isfinite(sources).all(axis=1)]
+        halo, owners = self.tiling.border_owners(sources, margin, self.worker)
+        return leaving, sources[halo], owners
+
+    def interact_halo(self, time: int, arrivals: AgentState, halo: np.ndarray) -> int:
+        """
+        Infected agents and halo copies interact with the susceptible agents.
+
+        Parameters
+        ----------
+        time : int
+            step time.
+        arrivals : AgentState
+            woken agents handed off by other workers.
+        halo : np.ndarray
+            (n, 4) positions of the infected agents of other workers near
+            the tiles of this worker.
+        Returns
+        -------
+        int
+            amount of new infected agents.
+        """
+        self.receive(arrivals)
+        status = self.status[: len(self)]
+        infected = np.flatnonzero(status == Status.INFECTED)
+        others = np.flatnonzero(
+            (status == Status.SUSCEPTIBLE) & self.active[: len(self)]
+        )
+        sources = np.concatenate([self.bounds[infected], halo])
+        _, contacts = query_pairs(
+            sources, self.bounds[others], self.model.exposure_distance
+        )
+        new_infected = draw_infections(
+            self.model.rng, others[contacts], self.model.infection_prob
+        )
+        self.set_status(new_infected, Status.INFECTED)
+        self.infected_at[new_infected] = time
+        return len(new_infected)
+
+    def finish(
+        self, time: int, keys: np.ndarray, bounds: np.ndarray, leaving: np.ndarray
+    ) -> Tuple[AgentState, Dict[Status, int]]:
+        """
+        Move the present agents, mark the dormant ones and hand off the leaving.
+
+        Parameters
+        ----------
+        time : int
+            step time.
+        keys : np.ndarray
+            ids of the agents of this worker present in the step.
+        bounds : np.ndarray
+            (n, 4) positions of those agents.
+        leaving : np.ndarray
+            ids of the agents moved to the tiles of other workers.
+        Returns
+        -------
+        Tuple[AgentState, Dict[Status, int]]
+            state of the leaving agents, and status counts of the agents
+            left in this worker.
+        """
+        self.move(keys, bounds, time)
+        self.sleep(time)
+        state = self.release(leaving) if len(leaving) else empty_state()
+        return state, dict(self.model.status_counts)
+
+    def active_state(self) -> AgentState:
+        """State of the agents that are not dormant."""
+        rows = self.active_rows()
+        return {
+            "keys": self.index.ids()[rows],
+            "bounds": self.bounds[rows],
+            "status": self.status[rows],
+        }
+
+    def scan(self) -> Dict[Status, int]:
+        """Amount of agents in each status, scanning all agents."""
+        return {status: self.count(status) for status in Status}
+
+
+def _serve(
+    conn: Connection, tiling: Tiling, worker: int, params: Dict[str, Any]
+) -> None:
+    """Run the commands of a tiled model on the engine of one worker."""
+    model = GeoCovidModel(vectorized=True, collect_agents=False, **params)
+    engine = model.engine = TileEngine(model, tiling, worker)
+    while True:
+        method, kwargs = conn.recv()
+        if method is None:
+            break
+        try:
+            conn.send((True, getattr(engine, method)(**kwargs)))
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+    conn.close()
+
+
+class TiledModel(GeoCovidModel):
+    """
+    Geo Covid Model stepped by several processes, each one with its tiles.
+
+    The map is split into tiles dealt to worker processes, and every agent is
+    stepped by the worker of its tile, with a TileEngine. Each step runs in
+    three rounds over all workers:
+
+    - begin: take the new and handed off agents, wake and check them, and
+      send the infected agents within the exposure distance of the tiles of
+      other workers, as halo copies;
+    - interact: draw the infections of the susceptible agents of each worker,
+      from its infected agents and the halo copies it got;
+    - finish: move the agents, and hand off the ones that moved to a tile of
+      another worker.
+
+    The status counts of the workers are merged into the model reporters at
+    the end of each step. Results have the same distribution as a single
+    process run, but not the same random draws.
+    """
+
+    def __init__(
+        self,
+        workers: int = TILE_WORKERS,
+        tile_size: float = TILE_SIZE,
+        seed: int = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Tiled model initialization.
+
+        Parameters
+        ----------
+        workers : int
+            amount of worker processes.
+        tile_size : float
+            side of the tiles, in meters.
+        seed : int
+            seed of the model, each worker gets a seed derived from it.
+        kwargs : Any
+            GeoCovidModel parameters, the engine is always vectorized.
+        """
+        if kwargs.pop("vectorized", True) is False:
+            raise ValueError("tiled models always use the vectorized engine")
+        super().__init__(seed=seed, **kwargs)
+        self.tiling = Tiling(tile_size, workers)
+        self._owner = TypedColumn(np.int64)
+        self._transit = [empty_state() for _ in range(workers)]
+        self._extent = 0.0
+        self.handoffs = 0
+        self.halos = 0
+
+        params = {
+            name: kwargs[name]
+            for name in (
+                "infection_prob",
+                "death_prob",
+                "treatment_period",
+                "exposure_distance",
+                "min_death_period",
+                "dormant_after",
+            )
+            if name in kwargs
+        }
+        seeds = np.random.SeedSequence(seed).generate_state(workers)
+        context = multiprocessing.get_context("spawn")
+        self._conns: List[Connection] = []
+        self._processes = []
+        for worker in range(workers):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(
+                    worker_conn,
+                    self.tiling,
+                    worker,
+                    dict(params, seed=int(seeds[worker])),
+                ),
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+        logger.info("tiled model initialized with %d workers", workers)
+
+    def __enter__(self) -> "TiledModel":
+        """Enter method."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Exit method, stops the workers."""
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for conn in self._conns:
+            try:
+                conn.send((None, None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._conns, self._processes = [], []
+
+    def _call(self, method: str, kwargs: List[Dict[str, Any]]) -> List[Any]:
+        """Run a method on every worker engine, in parallel."""
+        for conn, worker_kwargs in zip(self._conns, kwargs):
+            conn.send((method, worker_kwargs))
+        results = [conn.recv() for conn in self._conns]
+        for worker, (ok, result) in enumerate(results):
+            if not ok:
+                raise RuntimeError("tile worker {} failed\n{}".format(worker, result))
+        return [result for _, result in results]
+
+    def _owners(self, codes: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+        """Worker of the tile of each position, the known one if it has none."""
+        owners = self._owner.values()[codes].copy()
+        placed = np.isfinite(bounds).all(axis=1)
+        owners[placed] = self.tiling.owners(bounds[placed])
+        return owners
+
+    def _initial_infected(self) -> np.ndarray:
+        """Ids of the initial infected agents, chosen by id or at random."""
+        ids = self.agent_index.ids()
+        if isinstance(self.init_infected, List):
+            selected = [key for key in self.init_infected if key in self.agent_index]
+            proportion = len(selected) / len(self.init_infected)
+            logger.info("init infected from list, with a proportion %f", proportion)
+            return np.array(selected, dtype=object)
+        if not len(ids):
+            return np.empty(0, dtype=object)
+        return ids[np.unique(self.rng.integers(len(ids), size=self.init_infected))]
+
+    def step_positions(self, keys: np.ndarray, bounds: np.ndarray) -> None:
+        """
+        Run one step of all workers from position arrays.
+
+        Parameters
+        ----------
+        keys : np.ndarray
+            ids of the agents present in the step.
+        bounds : np.ndarray
+            (n, 4) bounding boxes of those agents.
+        """
+        workers, time = self.tiling.workers, self.schedule.time
+        with self.timer.phase("create"):
+            start = len(self.agent_index)
+            codes = self.agent_index.add(keys)
+            is_new = codes >= start
+            self._owner.extend(np.arange(start, len(self.agent_index)) % workers)
+            self._owner.values()[codes[is_new]] = self._owners(
+                codes[is_new], bounds[is_new]
+            )
+            self.new_agents = int(np.count_nonzero(is_new))
+            placed = np.isfinite(bounds).all(axis=1)
+            if placed.any():
+                extent = np.max(bounds[placed, 2:] - bounds[placed, :2])
+                self._extent = max(self._extent, float(extent))
+            arrivals = split_state(
+                new_state(keys[is_new], bounds[is_new]),
+                self._owner.values()[codes[is_new]],
+                workers,
+            )
+            infect = (
+                self._initial_infected()
+                if self.steps == 0
+                else np.empty(0, dtype=object)
+            )
+            infect_owners = self._owner.values()[self.agent_index.codes(infect)]
+
+        with self.timer.phase("check"):
+            owners = self._owner.values()[codes]
+            margin = self.exposure_distance + self._extent / 2
+            results = self._call(
+                "begin",
+                [
+                    {
+                        "time": time,
+                        "keys": keys[owners == worker],
+                        "bounds": bounds[owners == worker],
+                        "arrivals": concat_states(
+                            [self._transit[worker], arrivals[worker]]
+                        ),
+                        "infect": infect[infect_owners == worker],
+                        "margin": margin,
+                    }
+                    for worker in range(workers)
+                ],
+            )
+            woken = concat_states([leaving for leaving, _, _ in results])
+            woken_owners = self.tiling.owners(woken["bounds"])
+            self._owner.values()[self.agent_index.codes(woken["keys"])] = woken_owners
+            woken_arrivals = split_state(woken, woken_owners, workers)
+            halos = [
+                np.concatenate(
+                    [halo[targets == worker] for _, halo, targets in results]
+                )
+                for worker in range(workers)
+            ]
+            self.halos = sum(len(halo) for halo in halos)
+
+        with self.timer.phase("interact"):
+            infections = self._call(
+                "interact_halo",
+                [
+                    {"time": time, "arrivals": woken_arrivals[worker], "halo": halo}
+                    for worker, halo in enumerate(halos)
+                ],
+            )
+            self.infections_step = sum(infections)
+
+        with self.timer.phase("move"):
+            owners = self._owner.values()[codes]
+            targets = self._owners(codes, bounds)
+            leaving = targets != owners
+            results = self._call(
+                "finish",
+                [
+                    {
+                        "time": time,
+                        "keys": keys[owners == worker],
+                        "bounds": bounds[owners == worker],
+                        "leaving": keys[leaving & (owners == worker)],
+                    }
+                    for worker in range(workers)
+                ],
+            )
+            self._owner.values()[codes[leaving]] = targets[leaving]
+            handed_off = concat_states([state for state, _ in results])
+            self._transit = split_state(
+                handed_off,
+                self._owner.values()[self.agent_index.codes(handed_off["keys"])],
+                workers,
+            )
+            self.handoffs += len(handed_off["keys"])
+            self.status_counts = self._merge_counts([counts for _, counts in results])
+        logger.info(
+            "%d halo copies, %d agents handed off", self.halos, len(handed_off["keys"])
+        )
+        self.schedule.tick()
+        self._finish_step()
+
+    def _merge_counts(self, counts: List[Dict[Status, int]]) -> Dict[Status, int]:
+        """Status counts of all workers and of the agents handed off."""
+        in_transit = np.concatenate([state["status"] for state in self._transit])
+        return {
+            status: sum(worker_counts[status] for worker_counts in counts)
+            + int(np.count_nonzero(in_transit == status))
+            for status in Status
+        }
+
+    def step(
+        self,
+        gdf: GeoDataFrame,
+        contacts: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        """Run one step of the model, contacts are queried by the workers."""
+        if contacts is not None:
+            raise ValueError("tiled models query the contacts of their tiles")
+        with self.timer.phase("input"):
+            keys, bounds = frame_bounds(gdf)
+        self.step_positions(keys, bounds)
+
+    def agent_state(self) -> AgentState:
+        """State of the agents that are not dormant, of all workers."""
+        states = self._call("active_state", [{}] * self.tiling.workers)
+        states += [
+            {
+                name: state[name][state["active"]]
+                for name in ("keys", "bounds", "status")
+            }
+            for state in self._transit
+        ]
+        return {
+            name: np.concatenate([state[name] for state in states])
+            for name in ("keys", "bounds", "status")
+        }
+
+    def check_counts(self) -> None:
+        """Check the merged status counters against a scan of all workers."""
+        scanned = self._merge_counts(self._call("scan", [{}] * self.tiling.workers))
+        for status in Status:
+            if scanned[status] != self.status_counts[status]:
+                raise RuntimeError(
+                    "{} counter is {}, but {} agents were found".format(
+                        status.name, self.status_counts[status], scanned[status]
+                    )
+                )
@@ -22,6 +22,7 @@ def start_spark(app_name: str = "Sedona App", master: str = "local[*]") -> Spark
         .appName(app_name)
         .config("spark.serializer", KryoSerializer.getName)
         .config("spark.kryo.registrator", SedonaKryoRegistrator.getName)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
         .config(
             "spark.jars.packages",
             """org.apache.sedona:sedona-python-adapter-3.0_2.12:1.0.1-incubating,org.datasyslab:geotools-wrapper:geotools-24.0""",
@@ -6,9 +6,9 @@ import os
 import click
 import folium
 from folium.plugins import HeatMapWithTime
-import pandas as pd
 
 from geocovid.constants import MAP_COORDS, OUTPUT_DIR
+from geocovid.results import read_results
 
 
 def generate_basemap(default_location=MAP_COORDS, default_zoom_start=11):
@@ -25,10 +25,10 @@ def generate_basemap(default_location=MAP_COORDS, default_zoom_start=11):
 )
 def main(output_file: str) -> None:
     """Heatmap script."""
-    files = glob.glob(os.path.join(OUTPUT_DIR, "results_agents_*.json"))
-    sorted_files = sorted(files)
-    last_agent_filename = sorted_files[-1]
-    a_df = pd.read_json(last_agent_filename, orient="table")
+    runs = glob.glob(os.path.join(OUTPUT_DIR, "results_*", "agents"))
+    sorted_runs = sorted(runs)
+    last_run = os.path.dirname(sorted_runs[-1])
+    a_df = read_results(last_run, "agents", index=["Step", "AgentID"])
     heat_data = [
         [
             [row["lat"], row["lon"]]
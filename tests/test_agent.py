@@ -1,16 +1,72 @@
 """Agent tests."""
 
-import pytest
+import numpy as np
 from shapely.geometry import Point
 
-from geocovid.agent import PersonAgent
+from geocovid.agent import PersonAgent, Status
+from geocovid.model import GeoCovidModel
 
 
-class TestAgentCreator(unittest.TestCase):
-    def test_create_agent(self):
-        AC = AgentCreator(agent_class=PersonAgent, agent_kwargs={"model": None})
-        shape = Point(1, 1)
-        agent = AC.create_agent(shape=shape, unique_id=0)
-        assert isinstance(agent, PersonAgent)
-        assert agent.shape == shape
-        assert agent.model is None
+def test_create_agent():
+    """Test an agent keeps its shape as a box of the model positions."""
+    model = GeoCovidModel()
+    shape = Point(1, 1)
+    agent = PersonAgent("a", model, shape)
+    assert isinstance(agent, PersonAgent)
+    assert agent.shape.equals(shape)
+    assert agent.model is model
+    assert agent.status is Status.SUSCEPTIBLE
+    assert model.count_status(Status.SUSCEPTIBLE) == 1
+
+
+def test_create_many():
+    """Test agents created in bulk are the same as one by one."""
+    model = GeoCovidModel()
+    bounds = np.array([[0, 0, 0, 0], [1, 1, 2, 2]], dtype=float)
+    agents = PersonAgent.create_many(["a", "b"], model, bounds)
+    assert [agent.unique_id for agent in agents] == ["a", "b"]
+    assert agents[1].bounds.tolist() == [1, 1, 2, 2]
+    assert all(agent.status is Status.SUSCEPTIBLE for agent in agents)
+    assert model.count_status(Status.SUSCEPTIBLE) == 2
+    agent = PersonAgent("c", model, Point(0, 0))
+    assert vars(agents[0]).keys() == vars(agent).keys()
+    assert agents[0].random is model.random
+
+
+def test_agent_interact():
+    """Test an infected agent only infects the susceptible agents near it."""
+    model = GeoCovidModel(infection_prob=1)
+    agents = [
+        PersonAgent("a", model, Point(0, 0)),
+        PersonAgent("b", model, Point(0, 0)),
+        PersonAgent("c", model, Point(0, 0)),
+        PersonAgent("d", model, Point(100, 100)),
+    ]
+    model.grid.add_agents(agents)
+    agents[0].status = Status.INFECTED
+    agents[2].status = Status.RECOVERED
+
+    agents[0].interact()
+
+    assert [agent.status for agent in agents] == [
+        Status.INFECTED,
+        Status.INFECTED,
+        Status.RECOVERED,
+        Status.SUSCEPTIBLE,
+    ]
+    assert model.infections_step == 1
+
+
+def test_agent_interact_draws_from_model_rng():
+    """Test infections are drawn from the model generator, as the bulk paths."""
+    model = GeoCovidModel(infection_prob=0.5, seed=0)
+    agents = [PersonAgent(i, model, Point(0, 0)) for i in range(2)]
+    model.grid.add_agents(agents)
+    agents[0].status = Status.INFECTED
+    random_state = model.random.getstate()
+
+    agents[0].interact()
+
+    expected = np.random.default_rng(0).random() <= 0.5
+    assert (agents[1].status is Status.INFECTED) == expected
+    assert model.random.getstate() == random_state
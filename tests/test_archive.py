@@ -0,0 +1,87 @@
+"""Archive reader tests."""
+
+import io
+import tarfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geocovid.archive import read_archive, stage_archive
+
+
+def add_member(tfile, name, data):
+    """Add a member with the given bytes to an archive."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tfile.addfile(info, io.BytesIO(data))
+
+
+def parquet_bytes(df):
+    """Parquet file content of a DataFrame."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def parts():
+    """Two parts of raw points, with an extra column."""
+    rng = np.random.default_rng(0)
+    return [
+        pd.DataFrame(
+            {
+                "id": ["id{}".format(i) for i in range(1000)],
+                "timestamp": rng.integers(1585700000, 1585786400, 1000),
+                "latitude": rng.uniform(-34.9, -34.8, 1000),
+                "longitude": rng.uniform(-56.2, -56.1, 1000),
+                "geohash_12": ["x"] * 1000,
+            }
+        )
+        for _ in range(2)
+    ]
+
+
+@pytest.fixture
+def archive(tmp_path, parts):
+    """Archive with the parts, a corrupt part and metadata."""
+    path = str(tmp_path / "day.tar.gz")
+    with tarfile.open(path, "w:gz") as tfile:
+        add_member(tfile, "day/_SUCCESS", b"")
+        add_member(tfile, "day/part-0.parquet", parquet_bytes(parts[0]))
+        add_member(tfile, "day/part-1.parquet", b"corrupt")
+        add_member(tfile, "day/part-2.parquet", parquet_bytes(parts[1]))
+    return path
+
+
+def test_read_archive(archive, parts):
+    """Test data members are read with the pipeline columns."""
+    df = read_archive(archive)
+    expected = pd.concat(parts, ignore_index=True).drop(columns="geohash_12")
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_read_truncated_archive(tmp_path, archive, parts):
+    """Test a truncated archive keeps the members read before the end."""
+    with open(archive, "rb") as file:
+        data = file.read()
+    truncated = str(tmp_path / "truncated.tar.gz")
+    with open(truncated, "wb") as file:
+        file.write(data[: len(data) - 2000])
+
+    df = read_archive(truncated)
+    pd.testing.assert_frame_equal(df, parts[0].drop(columns="geohash_12"))
+
+
+def test_stage_archive(tmp_path, archive, parts):
+    """Test data members are staged as files, in archive order."""
+    stage_archive(archive, str(tmp_path / "staged"))
+
+    names = sorted(path.name for path in (tmp_path / "staged").iterdir())
+    assert names == [
+        "00000-part-0.parquet",
+        "00001-part-1.parquet",
+        "00002-part-2.parquet",
+    ]
+    staged = pd.read_parquet(tmp_path / "staged" / names[2])
+    pd.testing.assert_frame_equal(staged, parts[1])
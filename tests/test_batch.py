@@ -0,0 +1,77 @@
+"""Batch runner tests."""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geocovid.batch import (
+    HourlyPositions,
+    positions_dir,
+    run_batch,
+    run_simulation,
+    save_positions,
+)
+from geocovid.model import GeoCovidModel
+
+
+@pytest.fixture
+def hourly_gdfs():
+    """Random positions of a few hours, indexed by id."""
+    rng = np.random.default_rng(0)
+    gdfs = []
+    for _ in range(4):
+        ids = ["id{}".format(i) for i in range(50) if rng.random() < 0.8]
+        points = [Point(*rng.uniform(0, 0.001, 2)) for _ in ids]
+        gdfs.append(gpd.GeoDataFrame({"geometry": points}, index=ids))
+    return gdfs
+
+
+def test_saved_positions(tmp_path, hourly_gdfs):
+    """Test positions are saved with dense codes per hour."""
+    save_positions(hourly_gdfs, str(tmp_path))
+    positions = HourlyPositions(str(tmp_path))
+    assert len(positions) == len(hourly_gdfs)
+    for (codes, bounds), gdf in zip(positions, hourly_gdfs):
+        assert positions.ids()[codes].tolist() == gdf.index.tolist()
+        assert np.allclose(bounds[:, 0], gdf.geometry.x)
+
+
+def test_positions_dir_keyed_by_archives(tmp_path):
+    """Test the positions dir changes with the content of the archives."""
+    archives = [tmp_path / "a.tar.gz", tmp_path / "b.tar.gz"]
+    for archive in archives:
+        archive.write_bytes(archive.name.encode())
+    files = [str(archive) for archive in archives]
+    root = str(tmp_path / "positions")
+    path = positions_dir(root, files)
+    assert path.startswith(root)
+    assert positions_dir(root, files[::-1]) == path
+    archives[1].write_bytes(b"other")
+    assert positions_dir(root, files) != path
+    assert positions_dir(root, files[:1]) != path
+
+
+def test_run_simulation_matches_model(tmp_path, hourly_gdfs):
+    """Test a memory-mapped run reports as stepping the GeoDataFrames."""
+    save_positions(hourly_gdfs, str(tmp_path))
+    params = {"infection_prob": 0.2, "init_infected": 3}
+    results = run_simulation(str(tmp_path), params, seed=1)
+
+    model = GeoCovidModel(seed=1, vectorized=True, **params)
+    for gdf in hourly_gdfs:
+        model.step(gdf)
+    expected = model.datacollector.get_model_vars_dataframe()
+    pd.testing.assert_frame_equal(results[expected.columns], expected)
+
+
+def test_run_batch(tmp_path, hourly_gdfs):
+    """Test every config runs with every seed."""
+    save_positions(hourly_gdfs, str(tmp_path))
+    grid = {"infection_prob": [0.1, 0.2], "death_prob": [0.01]}
+    results = run_batch(str(tmp_path), grid, seeds=[0, 1], processes=2)
+
+    assert len(results) == 2 * 2 * len(hourly_gdfs)
+    runs = results.groupby(["infection_prob", "death_prob", "seed"]).size()
+    assert runs.tolist() == [len(hourly_gdfs)] * 4
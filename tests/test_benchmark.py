@@ -0,0 +1,30 @@
+"""Benchmark suite tests."""
+
+import pandas as pd
+import pytest
+
+from geocovid.benchmark import compare, run_benchmark, run_suite, scenarios
+
+
+@pytest.mark.parametrize("engine", ["agents", "vectorized"])
+def test_run_benchmark(engine):
+    """Test a small scenario reports throughput, phases and memory."""
+    result = run_benchmark(engine, agents=300, hours=3)
+    assert result["agent_steps"] > 0
+    assert result["agent_steps_per_s"] > 0
+    assert result["interact_s"] > 0
+    assert result["peak_rss_mb"] > 0
+    assert ("person_interact_s" in result) == (engine == "agents")
+
+
+def test_run_suite_compare():
+    """Test results of two commits are compared by scenario."""
+    suite = scenarios(["vectorized"], [200], 2, 10, 0.01, 0.7, 0)
+    results = run_suite(suite, isolate=False)
+    assert results["commit"].nunique() == 1
+    previous = results.assign(commit="previous", agent_steps_per_s=1.0)
+    history = pd.concat([previous, results], ignore_index=True)
+    comparison = compare(history, results["commit"].iloc[0])
+    assert len(comparison) == 1
+    assert comparison["previous_commit"].iloc[0] == "previous"
+    assert comparison["speedup"].iloc[0] == results["agent_steps_per_s"].iloc[0]
@@ -0,0 +1,39 @@
+"""Trajectory cache tests."""
+
+import geopandas as gpd
+from shapely.geometry import Point, box
+
+from geocovid.cache import TrajectoryCache, file_digest
+
+
+def test_cache_roundtrip(tmp_path):
+    """Test cached GeoDataFrames are loaded with their index."""
+    archive = tmp_path / "day.tar.gz"
+    archive.write_bytes(b"data")
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+    gdf = gpd.GeoDataFrame(
+        {"h": [0, 1], "id": ["a", "a"], "geometry": [box(0, 0, 1, 1), Point(2, 2)]},
+        geometry="geometry",
+    ).set_index(["h", "id"])
+
+    key = cache.key(str(archive), outlier_area=0.0001)
+    assert cache.load(key) is None
+    cache.store(key, gdf)
+
+    cached = cache.load(key)
+    assert cached.index.equals(gdf.index)
+    assert cached.geometry.geom_equals(gdf.geometry).all()
+
+
+def test_cache_key(tmp_path):
+    """Test keys change with the file content and the settings."""
+    archive = tmp_path / "day.tar.gz"
+    archive.write_bytes(b"data")
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+    key = cache.key(str(archive), outlier_area=0.0001)
+
+    assert cache.key(str(archive), outlier_area=0.0001) == key
+    assert cache.key(str(archive), outlier_area=0.001) != key
+    assert cache.digest_key(file_digest(str(archive)), outlier_area=0.0001) == key
+    archive.write_bytes(b"other data")
+    assert cache.key(str(archive), outlier_area=0.0001) != key
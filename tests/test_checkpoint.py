@@ -0,0 +1,60 @@
+"""Checkpoint tests."""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geocovid.checkpoint import load_checkpoint, save_checkpoint
+from geocovid.model import GeoCovidModel
+
+
+def random_steps(steps, agents=40, seed=0):
+    """Positions of some steps, with agents missing at random."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(steps):
+        ids = np.flatnonzero(rng.random(agents) < 0.6)
+        points = [Point(*rng.uniform(0, 0.0005, 2)) for _ in ids]
+        frames.append(
+            gpd.GeoDataFrame(
+                {"geometry": points}, index=["id{}".format(i) for i in ids]
+            )
+        )
+    return frames
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_resumed_run_matches(tmp_path, vectorized):
+    """Test a model loaded from a checkpoint steps as the saved one."""
+    frames = random_steps(30)
+    model = GeoCovidModel(
+        infection_prob=0.2,
+        death_prob=0.05,
+        min_death_period=0,
+        init_infected=3,
+        seed=3,
+        vectorized=vectorized,
+        dormant_after=2,
+        debug=True,
+    )
+    for frame in frames[:12]:
+        model.step(frame)
+    path = str(tmp_path / "checkpoint.npz")
+    save_checkpoint(model, path, files=["day_1.tar.gz"])
+    for frame in frames[12:]:
+        model.step(frame)
+
+    resumed, state = load_checkpoint(path)
+    for frame in frames[12:]:
+        resumed.step(frame)
+    assert state == {"files": ["day_1.tar.gz"]}
+    pd.testing.assert_frame_equal(
+        resumed.datacollector.get_model_vars_dataframe(),
+        model.datacollector.get_model_vars_dataframe(),
+    )
+    pd.testing.assert_frame_equal(
+        resumed.datacollector.get_agent_vars_dataframe(),
+        model.datacollector.get_agent_vars_dataframe(),
+    )
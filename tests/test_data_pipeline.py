@@ -1,10 +1,106 @@
 """Data pipeline tests."""
 
+import pandas as pd
 from pyspark.sql import SparkSession
 import pytest
 
+from geocovid.data_pipeline import (
+    build_positions_spark,
+    carried_bounds_spark,
+    contact_pairs_spark,
+    transform_data_spark,
+)
+from geocovid.local_pipeline import (
+    contact_pairs_local,
+    daily_envelopes_local,
+    last_positions_local,
+    read_position_days,
+    remove_outliers_local,
+    transform_data_local,
+    write_positions_local,
+)
+from geocovid.synthetic import synthetic_envelopes
+
 
 @pytest.fixture(scope="session")
 def spark():
     """Create Spark Session fixture."""
     return SparkSession.builder.master("local").appName("tests").getOrCreate()
+
+
+def test_transform_data_spark(spark):
+    """Test Spark gives the same positions as the single node pipeline."""
+    points = pd.DataFrame(
+        {
+            "id": ["a", "a", "b", "b", "a"],
+            "timestamp": [1585746000, 1585746060, 1585746000, 1585746060, 1585749600],
+            "latitude": [-34.9, -34.9005, -34.9, -34.8, -34.7],
+            "longitude": [-56.1, -56.1002, -56.1, -56.2, -56.3],
+        }
+    )
+    gdf = transform_data_spark(spark.createDataFrame(points), spark)
+    expected = transform_data_local(points)
+
+    assert gdf.index.names == ["h", "id"]
+    gdf = gdf.sort_index()
+    assert gdf.index.tolist() == expected.index.tolist()
+    assert gdf.geom_equals_exact(expected.geometry, 1e-6).all()
+
+
+def test_contact_pairs_spark(spark):
+    """Test the Spark join finds the same contacts as the single node pipeline."""
+    agg_dfs = list(synthetic_envelopes(300, hours=3, area=1000, seed=1))
+    carried = last_positions_local(
+        remove_outliers_local(agg_dfs[0]).set_index(["h", "id"])
+    )
+    agg_df = pd.concat(agg_dfs[1:], ignore_index=True)
+    gdf = remove_outliers_local(agg_df).set_index(["h", "id"])
+    bounds_df = carried_bounds_spark(
+        spark.createDataFrame(gdf.geometry.bounds.reset_index()),
+        spark.createDataFrame(carried.reset_index()),
+        spark,
+    )
+    pairs = contact_pairs_spark(bounds_df, spark, 20, cell_size=100).toPandas()
+    expected = contact_pairs_local(gdf, 20, carried)
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(
+        pairs.sort_values(["h", "src", "dst"]).reset_index(drop=True),
+        expected,
+        check_dtype=False,
+    )
+
+
+def test_build_positions_spark(tmp_path, spark):
+    """Test one Spark job gives the positions of the single node pipeline."""
+    points = pd.DataFrame(
+        {
+            "id": ["a", "a", "b", "b", "a", "a"],
+            "timestamp": [
+                1585746000,
+                1585746060,
+                1585746000,
+                1585746060,
+                1585749600,
+                1585832400,
+            ],
+            "latitude": [-34.9, -34.9005, -34.9, -34.8, -34.7, -34.6],
+            "longitude": [-56.1, -56.1002, -56.1, -56.2, -56.3, -56.4],
+            "geohash_12": ["x"] * 6,
+        }
+    )
+    for day in range(2):
+        (tmp_path / str(day)).mkdir()
+        points.to_parquet(tmp_path / str(day) / "part-0.parquet", index=False)
+    build_positions_spark(
+        [str(tmp_path / "0"), str(tmp_path / "1")], spark, str(tmp_path / "spark")
+    )
+    write_positions_local([daily_envelopes_local(points)], str(tmp_path / "local"))
+
+    days = list(read_position_days(str(tmp_path / "spark")))
+    expected = list(read_position_days(str(tmp_path / "local")))
+    assert [day for day, _ in days] == [day for day, _ in expected]
+    for (_, hours), (_, expected_hours) in zip(days, expected):
+        for hour_gdf, expected_gdf in zip(hours, expected_hours):
+            assert hour_gdf.index.tolist() == expected_gdf.index.tolist()
+            assert hour_gdf.geom_equals_exact(expected_gdf.geometry, 1e-6).all()
@@ -0,0 +1,53 @@
+"""Data collection tests."""
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import Point
+
+from geocovid import model as model_module
+from geocovid.constants import STEPS_PER_DAY
+from geocovid.model import GeoCovidModel
+from geocovid.projection import project_points, unproject_points
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_agent_vars_sampled_once_per_day(vectorized):
+    """Test agent variables are only kept once per day, in typed columns."""
+    x, y = project_points([-34.9, -34.8], [-56.2, -56.1])
+    gdf = gpd.GeoDataFrame(
+        {"geometry": [Point(x[0], y[0]), Point(x[1], y[1])]},
+        index=["a", "b"],
+        geometry="geometry",
+    )
+    model = GeoCovidModel(init_infected=0, vectorized=vectorized)
+    for _ in range(2 * STEPS_PER_DAY):
+        model.step(gdf)
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    agent_vars = model.datacollector.get_agent_vars_dataframe()
+    assert len(model_vars) == 2 * STEPS_PER_DAY
+    assert agent_vars.index.levels[0].tolist() == [STEPS_PER_DAY, 2 * STEPS_PER_DAY]
+    assert agent_vars.index.levels[1].tolist() == ["a", "b"]
+    assert agent_vars["status"].dtype == np.int8
+    np.testing.assert_allclose(agent_vars.loc[STEPS_PER_DAY, "lat"], [-34.9, -34.8])
+    np.testing.assert_allclose(agent_vars.loc[STEPS_PER_DAY, "lon"], [-56.2, -56.1])
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_agent_coordinates_unprojected_once(vectorized, monkeypatch):
+    """Test the lat and lon columns share one unprojection per collection."""
+    calls = []
+
+    def counted_unproject(x, y):
+        calls.append(len(x))
+        return unproject_points(x, y)
+
+    monkeypatch.setattr(model_module, "unproject_points", counted_unproject)
+    x, y = project_points([-34.9], [-56.2])
+    gdf = gpd.GeoDataFrame({"geometry": [Point(x[0], y[0])]}, index=["a"])
+    model = GeoCovidModel(init_infected=0, vectorized=vectorized)
+    for _ in range(2 * STEPS_PER_DAY):
+        model.step(gdf)
+
+    assert calls == [1, 1]
@@ -0,0 +1,212 @@
+"""Vectorized engine tests."""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geocovid.agent import Status
+from geocovid.engine import DenseIds, align_positions
+from geocovid.model import GeoCovidModel
+
+
+@pytest.fixture
+def gdf():
+    """Positions of two hours, indexed by hour and id."""
+    data = pd.DataFrame(
+        {
+            "h": [0, 0, 0, 1, 1],
+            "id": ["a", "b", "c", "a", "d"],
+            "geometry": [
+                Point(0, 0),
+                Point(0, 0),
+                Point(100, 100),
+                Point(100, 100),
+                Point(500, 500),
+            ],
+        }
+    )
+    return gpd.GeoDataFrame(data, geometry="geometry").set_index(["h", "id"])
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_model_reporters(gdf, vectorized):
+    """Test both engines report the same compartments."""
+    model = GeoCovidModel(
+        infection_prob=1,
+        init_infected=["a"],
+        death_prob=0,
+        vectorized=vectorized,
+        debug=True,
+    )
+    for hour in gdf.index.levels[0]:
+        model.step(gdf.loc[hour, :])
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    assert model_vars["S"].tolist() == [1, 2]
+    assert model_vars["I"].tolist() == [2, 2]
+    assert model_vars["IS"].tolist() == [1, 0]
+    assert model_vars["A"].tolist() == [3, 4]
+    assert model_vars["NA"].tolist() == [3, 1]
+
+
+def test_engine_state(gdf):
+    """Test engine arrays follow the agents."""
+    model = GeoCovidModel(infection_prob=1, init_infected=["a"], vectorized=True)
+    for hour in gdf.index.levels[0]:
+        model.step(gdf.loc[hour, :])
+
+    engine = model.engine
+    assert engine.index.ids().tolist() == ["a", "b", "c", "d"]
+    assert engine.status[engine.index["b"]] == Status.INFECTED
+    assert engine.infected_at[engine.index["b"]] == 0
+    assert model.agent_centroids()[:, 0].tolist() == [100, 0, 100, 500]
+
+
+def test_engine_check(gdf):
+    """Test infected agents die once the death period is over."""
+    model = GeoCovidModel(
+        init_infected=["a"], death_prob=1, min_death_period=0, vectorized=True
+    )
+    model.step(gdf.loc[0, :])
+    assert model.engine.count(Status.DEAD) == 1
+    assert model.deaths == 1
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_seeded_runs_are_reproducible(gdf, vectorized):
+    """Test two runs with the same seed report the same metrics."""
+    results = []
+    for _ in range(2):
+        model = GeoCovidModel(
+            infection_prob=0.5,
+            death_prob=0.5,
+            min_death_period=0,
+            init_infected=2,
+            seed=7,
+            vectorized=vectorized,
+        )
+        for hour in gdf.index.levels[0]:
+            model.step(gdf.loc[hour, :])
+        results.append(model.datacollector.get_model_vars_dataframe())
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_init_infected_missing_ids(gdf, vectorized):
+    """Test initial infected ids missing from the first hour infect no one."""
+    model = GeoCovidModel(init_infected=["missing"], vectorized=vectorized)
+    for hour in gdf.index.levels[0]:
+        model.step(gdf.loc[hour, :])
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    assert model_vars["I"].tolist() == [0, 0]
+    assert model_vars["S"].tolist() == [3, 4]
+
+
+def test_dense_ids():
+    """Test ids keep their codes as new ones are added."""
+    ids = DenseIds()
+    assert ids.add(np.array(["b", "a"], dtype=object)).tolist() == [0, 1]
+    codes = ids.add(np.array(["c", "a", "d"], dtype=object))
+    assert codes.tolist() == [2, 1, 3]
+    assert codes.dtype == np.int32
+    assert ids.codes(np.array(["d", "x"], dtype=object)).tolist() == [3, -1]
+    assert ids.ids().tolist() == ["b", "a", "c", "d"]
+
+
+def test_dense_ids_remove():
+    """Test removed ids give their codes to the last ones."""
+    ids = DenseIds()
+    ids.add(np.array(list("abcdef"), dtype=object))
+    moved_from, moved_to = ids.remove(np.array([1, 4], dtype=np.int32))
+    assert moved_from.tolist() == [5]
+    assert moved_to.tolist() == [1]
+    assert ids.ids().tolist() == ["a", "f", "c", "d"]
+    codes = ids.codes(np.array(["f", "b", "e", "d"], dtype=object))
+    assert codes.tolist() == [1, -1, -1, 3]
+    assert "e" not in ids
+    assert ids.add(np.array(["e", "a"], dtype=object)).tolist() == [4, 0]
+
+
+def test_dense_ids_many_steps():
+    """Test the codes stay consistent across many adds and removals."""
+    rng = np.random.default_rng(0)
+    ids = DenseIds()
+    for _ in range(200):
+        keys = rng.choice(500, size=50, replace=False).astype(str).astype(object)
+        ids.add(keys)
+        if len(ids) > 100:
+            ids.remove(rng.choice(len(ids), size=10, replace=False))
+        expected = {key: code for code, key in enumerate(ids.ids().tolist())}
+        assert len(expected) == len(ids)
+        queried = np.array([str(key) for key in range(500)], dtype=object)
+        codes = ids.codes(queried)
+        assert codes.tolist() == [expected.get(key, -1) for key in queried]
+
+
+def test_align_positions():
+    """Test positions are aligned to the codes with a present mask."""
+    codes = np.array([2, 0, -1], dtype=np.int32)
+    bounds = np.array([[2, 2, 2, 2], [np.nan] * 4, [9, 9, 9, 9]], dtype=float)
+    present, aligned = align_positions(codes, bounds, 3)
+    assert present.tolist() == [False, False, True]
+    assert aligned[2].tolist() == [2, 2, 2, 2]
+    assert np.isnan(aligned[:2]).all()
+
+
+def step_frame(ids, points):
+    """Positions of one step, indexed by id."""
+    return gpd.GeoDataFrame({"id": ids, "geometry": points}).set_index("id")
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_dormant_agents(vectorized):
+    """Test agents not seen recently go dormant and come back when seen."""
+    model = GeoCovidModel(
+        init_infected=0, dormant_after=1, vectorized=vectorized, debug=True
+    )
+    model.step(step_frame(["a", "b", "c"], [Point(0, 0), Point(1, 1), Point(2, 2)]))
+    assert model.agent_ids().tolist() == ["a", "b", "c"]
+    model.step(step_frame(["a"], [Point(0, 0)]))
+    assert model.agent_ids().tolist() == ["a"]
+    model.step(step_frame(["a", "b"], [Point(0, 0), Point(3, 3)]))
+    assert sorted(model.agent_ids().tolist()) == ["a", "b"]
+    assert model.count_status(Status.SUSCEPTIBLE) == 3
+    centroids = dict(zip(model.agent_ids(), model.agent_centroids().tolist()))
+    assert centroids["b"] == [3, 3]
+    if not vectorized:
+        assert set(model.dormant) == {"c"}
+        assert {agent.unique_id for agent in model.grid.agents} == {"a", "b"}
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_recovered_agents_are_not_contacts(vectorized):
+    """Test recovered agents are not infected again."""
+    model = GeoCovidModel(
+        infection_prob=1, init_infected=["a"], death_prob=0, vectorized=vectorized
+    )
+    model.step(step_frame(["a", "b"], [Point(0, 0), Point(9, 9)]))
+    if vectorized:
+        model.engine.set_status(np.array([model.engine.index["b"]]), Status.RECOVERED)
+    else:
+        model.schedule._agents["b"].status = Status.RECOVERED
+    model.step(step_frame(["a", "b"], [Point(0, 0), Point(0, 0)]))
+    assert model.count_status(Status.RECOVERED) == 1
+    assert model.count_status(Status.INFECTED) == 1
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_step_over_contacts(vectorized):
+    """Test given contacts are used instead of querying the positions."""
+    model = GeoCovidModel(
+        infection_prob=1, init_infected=["a"], death_prob=0, vectorized=vectorized
+    )
+    frame = step_frame(["a", "b", "c"], [Point(0, 0), Point(9, 9), Point(0, 0)])
+    model.step(frame, (np.array(["a", "x"]), np.array(["b", "a"])))
+    assert model.count_status(Status.INFECTED) == 2
+    assert sorted(model.agent_ids()[model.agent_statuses() == Status.INFECTED]) == [
+        "a",
+        "b",
+    ]
@@ -0,0 +1,171 @@
+"""Single node data pipeline tests."""
+
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, Polygon
+
+from geocovid.local_pipeline import (
+    contact_pairs_local,
+    daily_envelopes_local,
+    extract_data_local,
+    last_positions_local,
+    read_contacts,
+    read_position_days,
+    transform_data_local,
+    write_contacts_local,
+    write_positions_local,
+)
+from geocovid.projection import project_points
+from geocovid.spatial import bbox_distance
+from geocovid.synthetic import synthetic_day
+
+
+@pytest.fixture
+def points():
+    """Raw points of two ids over two hours."""
+    start = int(datetime(2020, 4, 1, 10).timestamp())
+    return pd.DataFrame(
+        {
+            "id": ["a", "a", "a", "b", "b", "a"],
+            "timestamp": [
+                start,
+                start + 60,
+                start + 120,
+                start,
+                start + 60,
+                start + 3600,
+            ],
+            "latitude": [-34.9, -34.9005, -34.9002, -34.9, -34.8, -34.7],
+            "longitude": [-56.1, -56.1002, -56.1001, -56.1, -56.2, -56.3],
+            "geohash_12": ["x"] * 6,
+        }
+    )
+
+
+def test_transform_data_local(points):
+    """Test envelopes in meters by hour and id, with the centroid of big ones.
+
+    A single point is a degenerate envelope, as ST_Envelope_Aggr gives.
+    """
+    gdf = transform_data_local(points, outlier_area=1e6)
+
+    assert gdf.index.names == ["h", "id"]
+    assert gdf.index.tolist() == [(10, "a"), (10, "b"), (11, "a")]
+    x, y = project_points(points["latitude"], points["longitude"])
+    minx, miny, maxx, maxy = x[:3].min(), y[:3].min(), x[:3].max(), y[:3].max()
+    envelope = Polygon(
+        [(minx, miny), (minx, maxy), (maxx, maxy), (maxx, miny), (minx, miny)]
+    )
+    assert gdf.geometry.iloc[0].equals_exact(envelope, 1e-6)
+    centroid = Point((x[3] + x[4]) / 2, (y[3] + y[4]) / 2)
+    assert gdf.geometry.iloc[1].equals_exact(centroid, 1e-6)
+    assert gdf.geometry.iloc[2].equals_exact(Polygon([(x[5], y[5])] * 5), 1e-6)
+
+
+def test_extract_data_local(tmp_path, points):
+    """Test parquet files under a directory are read, skipping corrupt ones."""
+    (tmp_path / "day").mkdir()
+    points.iloc[:3].to_parquet(tmp_path / "day" / "part-0.parquet")
+    points.iloc[3:].to_parquet(tmp_path / "day" / "part-1.parquet")
+    (tmp_path / "day" / "part-2.parquet").write_bytes(b"corrupt")
+    (tmp_path / "_SUCCESS").write_bytes(b"")
+
+    df = extract_data_local(str(tmp_path))
+    assert df.columns.tolist() == ["id", "timestamp", "latitude", "longitude"]
+    pd.testing.assert_frame_equal(df, points.drop(columns="geohash_12"))
+
+
+def test_contact_pairs_local(tmp_path):
+    """Test contacts are every close pair of each hour, before its move."""
+    gdf = synthetic_day(200, hours=3, area=1000, seed=2)
+    pairs = contact_pairs_local(gdf, 20)
+
+    expected, last = [], {}
+    for hour, hour_gdf in gdf.groupby(level=0):
+        hour_bounds = hour_gdf.geometry.bounds.droplevel(0)
+        for key, bounds in hour_bounds.iterrows():
+            last.setdefault(key, bounds.to_numpy())
+        ids = np.array(sorted(last), dtype=object)
+        bounds = np.array([last[key] for key in ids])
+        src, dst = np.triu_indices(len(ids), k=1)
+        near = bbox_distance(bounds[src], bounds[dst]) <= 20
+        expected += zip([hour] * near.sum(), ids[src[near]], ids[dst[near]])
+        last.update(zip(hour_bounds.index, hour_bounds.to_numpy()))
+    assert len(pairs) > 0
+    assert sorted(pairs.itertuples(index=False, name=None)) == sorted(expected)
+
+    write_contacts_local(pairs, str(tmp_path / "contacts"))
+    pd.testing.assert_frame_equal(
+        read_contacts(str(tmp_path / "contacts"))
+        .sort_values(["h", "src", "dst"])
+        .reset_index(drop=True),
+        pairs,
+    )
+
+
+def test_contact_pairs_carried():
+    """Test agents are paired at their last position, carried across days."""
+    day_1 = gpd.GeoDataFrame(
+        {"h": [0, 0], "id": ["a", "d"], "geometry": [Point(0, 0), Point(5, 0)]}
+    ).set_index(["h", "id"])
+    day_2 = gpd.GeoDataFrame(
+        {
+            "h": [0, 0, 1, 1, 1, 2],
+            "id": ["a", "b", "a", "b", "c", "b"],
+            "geometry": [
+                Point(0, 0),
+                Point(1000, 0),
+                Point(0, 0),
+                Point(0, 0),
+                Point(0, 5),
+                Point(0, 0),
+            ],
+        }
+    ).set_index(["h", "id"])
+
+    carried = last_positions_local(day_1)
+    pairs = contact_pairs_local(day_2, 10, carried)
+    assert list(pairs.itertuples(index=False, name=None)) == [
+        (0, "a", "d"),
+        (1, "a", "c"),
+        (1, "a", "d"),
+        (1, "c", "d"),
+        (2, "a", "b"),
+        (2, "a", "c"),
+        (2, "a", "d"),
+        (2, "b", "c"),
+        (2, "b", "d"),
+        (2, "c", "d"),
+    ]
+    carried = last_positions_local(day_2, carried)
+    assert carried.loc["b"].tolist() == [0, 0, 0, 0]
+    assert sorted(carried.index) == ["a", "b", "c", "d"]
+
+
+def test_positions_roundtrip(tmp_path, points):
+    """Test envelopes of several archives are merged and read back by hour."""
+    next_day = points.assign(timestamp=points["timestamp"] + 86400)
+    archives = [
+        pd.concat([points.iloc[:2], points, next_day.iloc[3:]], ignore_index=True),
+        pd.concat([points.iloc[2:], next_day], ignore_index=True),
+    ]
+    write_positions_local(
+        [daily_envelopes_local(df) for df in archives], str(tmp_path / "positions")
+    )
+
+    days = [
+        (day, list(hours))
+        for day, hours in read_position_days(str(tmp_path / "positions"), 1e6)
+    ]
+    assert [day for day, _ in days] == ["date=2020-04-01", "date=2020-04-02"]
+    expected = transform_data_local(points, outlier_area=1e6)
+    for _, hours in days:
+        assert len(hours) == 2
+        for hour_gdf, (_, hour_expected) in zip(hours, expected.groupby(level=0)):
+            hour_expected = hour_expected.droplevel(0)
+            assert hour_gdf.index.tolist() == hour_expected.index.tolist()
+            assert hour_gdf.geom_equals_exact(hour_expected.geometry, 1e-12).all()
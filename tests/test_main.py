@@ -0,0 +1,144 @@
+"""Main driver tests."""
+
+import io
+import tarfile
+
+from click.testing import CliRunner
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geocovid import main
+from geocovid.main import iter_hours, prefetch, split_contacts, split_hours
+from geocovid.model import GeoCovidModel
+
+
+def test_split_hours():
+    """Test a day is split into the positions of each hour, indexed by id."""
+    gdf = gpd.GeoDataFrame(
+        {"h": [1, 0, 0], "id": ["a", "a", "b"], "geometry": [Point(0, 0)] * 3}
+    ).set_index(["h", "id"])
+
+    hourly_gdfs = split_hours(gdf)
+    assert [hour_gdf.index.tolist() for hour_gdf in hourly_gdfs] == [["a", "b"], ["a"]]
+    assert split_hours(None) == []
+
+
+def test_split_contacts():
+    """Test contacts are split by the hours of the positions, empty if none."""
+    gdf = gpd.GeoDataFrame(
+        {"h": [3, 1, 1], "id": ["a", "a", "b"], "geometry": [Point(0, 0)] * 3}
+    ).set_index(["h", "id"])
+    pairs = pd.DataFrame({"h": [1, 5], "src": ["a", "a"], "dst": ["b", "c"]})
+
+    hourly_contacts = split_contacts(pairs, gdf)
+    assert [(src.tolist(), dst.tolist()) for src, dst in hourly_contacts] == [
+        (["a"], ["b"]),
+        ([], []),
+    ]
+
+
+def test_prefetch_bounded():
+    """Test items keep their order and are produced at most maxsize ahead."""
+    produced = []
+
+    def items():
+        for item in range(5):
+            produced.append(item)
+            yield item
+
+    results = []
+    for item in prefetch(items(), maxsize=1):
+        # one item waiting in the queue, one being produced
+        assert len(produced) <= item + 3
+        results.append(item)
+    assert results == list(range(5))
+
+
+def test_prefetch_error():
+    """Test errors of the producer are raised in the consumer."""
+
+    def items():
+        yield 0
+        raise ValueError("broken day")
+
+    with pytest.raises(ValueError):
+        list(prefetch(items()))
+
+
+@pytest.fixture
+def archives(tmp_path, monkeypatch):
+    """Two daily archives of raw points of agents coming and going."""
+    monkeypatch.setattr(main, "CACHE_DIR", str(tmp_path / "cache"))
+    rng = np.random.default_rng(0)
+    homes = rng.normal(0, 2e-4, (60, 2)) + [-34.9, -56.1]
+    files = []
+    for day in range(2):
+        rows = []
+        for hour in range(3):
+            start = 1585746000 + (day * 24 + hour) * 3600
+            for agent in np.flatnonzero(rng.random(len(homes)) < 0.6):
+                lat, lon = homes[agent] + rng.normal(0, 5e-5, 2)
+                rows.append(("id{}".format(agent), start + hour * 60, lat, lon))
+        df = pd.DataFrame(rows, columns=["id", "timestamp", "latitude", "longitude"])
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        files.append(str(tmp_path / "day_{}.tar.gz".format(day)))
+        with tarfile.open(files[-1], "w:gz") as tfile:
+            info = tarfile.TarInfo("part-0.parquet")
+            info.size = buffer.getbuffer().nbytes
+            buffer.seek(0)
+            tfile.addfile(info, buffer)
+    return files
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_contacts_run_matches_query_run(archives, vectorized):
+    """Test stepping over the extracted contacts gives the query results."""
+    params = {
+        "infection_prob": 0.5,
+        "death_prob": 0.1,
+        "min_death_period": 0,
+        "init_infected": 5,
+        "seed": 1,
+        "vectorized": vectorized,
+    }
+    runs = []
+    for contacts in [False, True]:
+        model = GeoCovidModel(**params)
+        for _, hourly_gdfs, hourly_contacts in iter_hours(
+            archives, "local", contacts=contacts
+        ):
+            for hour_gdf, hour_contacts in zip(hourly_gdfs, hourly_contacts):
+                model.step(hour_gdf, hour_contacts)
+        runs.append(model.datacollector.get_model_vars_dataframe())
+
+    assert runs[0]["I"].iloc[-1] > 5
+    pd.testing.assert_frame_equal(runs[1], runs[0])
+
+
+def test_resumed_contacts_carry_positions(archives):
+    """Test the archives done still carry their positions to the contacts."""
+    days = list(iter_hours(archives, "local", contacts=True))
+    resumed = list(iter_hours(archives, "local", contacts=True, done=["day_0.tar.gz"]))
+
+    assert [day[0] for day in resumed] == [archives[1]]
+    for (src, dst), (resumed_src, resumed_dst) in zip(days[1][2], resumed[0][2]):
+        assert src.tolist() == resumed_src.tolist()
+        assert dst.tolist() == resumed_dst.tolist()
+
+
+def test_resume_rejects_other_mode(archives, tmp_path, monkeypatch):
+    """Test a checkpoint is only resumed in the mode it was saved by."""
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "OUTPUT_DIR", str(tmp_path / "output"))
+    runner = CliRunner()
+    args = ["--pipeline", "local", "--checkpoint_days", "1"]
+    assert runner.invoke(main.main, args).exit_code == 0
+
+    result = runner.invoke(main.main, args + ["--resume", "--contacts"])
+    assert result.exit_code != 0
+    assert "saved in hours mode" in result.output
+    assert runner.invoke(main.main, args + ["--resume"]).exit_code == 0
@@ -1,22 +1,107 @@
 """Model tests."""
 
+import geopandas as gpd
 import pytest
+from shapely.geometry import Point
 
+from geocovid.agent import PersonAgent, Status
+from geocovid.engine import frame_bounds
 from geocovid.model import GeoCovidModel
+from geocovid.scheduler import DataScheduler
 
 
-def test_model_set_up():
+@pytest.fixture
+def gdf():
+    """Positions of one step, indexed by id."""
+    return gpd.GeoDataFrame(
+        {"geometry": [Point(0, 0), Point(1, 1)]}, index=["a", "b"], geometry="geometry"
+    )
+
+
+def test_model_set_up(gdf):
     """Test model setup."""
-    model = GeoCovidModel()
+    model = GeoCovidModel(init_infected=0)
     assert model.running is True
-    assert model.schedule is None
-    assert model.current_id == 0
-    assert model.current_id + 1 == model.next_id()
-    assert model.current_id == 1
-    model.step()
+    assert isinstance(model.schedule, DataScheduler)
+    assert model.steps == 0
+    assert model.count_agents() == 0
+    model.step(gdf)
+    assert model.steps == 1
+    assert model.schedule.steps == 1
+    assert model.count_agents() == 2
 
 
-def test_model_create_new_agents():
+def test_model_create_new_agents(gdf):
     """Test agents creation."""
     model = GeoCovidModel()
-    model._create_new_agents(gdf)
+    model._create_new_agents(*frame_bounds(gdf))
+    assert model.new_agents == 2
+    assert model.agent_ids().tolist() == ["a", "b"]
+    model._create_new_agents(*frame_bounds(gdf.iloc[1:]))
+    assert model.new_agents == 0
+    assert model.count_status(Status.SUSCEPTIBLE) == 2
+
+
+def test_model_interact():
+    """Test bulk contacts infect every agent near an infected one."""
+    model = GeoCovidModel(infection_prob=1)
+    agents = [
+        PersonAgent("a", model, Point(0, 0)),
+        PersonAgent("b", model, Point(0, 5)),
+        PersonAgent("c", model, Point(100, 100)),
+    ]
+    for agent in agents:
+        model.schedule.add(agent)
+    model.grid.add_agents(agents)
+    agents[0].status = Status.INFECTED
+
+    model.interact()
+
+    assert [agent.status for agent in agents] == [
+        Status.INFECTED,
+        Status.INFECTED,
+        Status.SUSCEPTIBLE,
+    ]
+    assert model.infections_step == 1
+
+
+def test_model_status_counts():
+    """Test status counters follow transitions and are checked in debug."""
+    model = GeoCovidModel(debug=True)
+    agent = PersonAgent("a", model, Point(0, 0))
+    assert model.count_status(Status.SUSCEPTIBLE) == 1
+    agent.status = Status.INFECTED
+    agent.status = Status.DEAD
+    assert model.count_status(Status.SUSCEPTIBLE) == 0
+    assert model.count_status(Status.DEAD) == 1
+    assert model.count_agents() == 1
+
+    with pytest.raises(RuntimeError):
+        model.check_counts()  # agent was never added to the schedule
+
+
+def test_model_infected_agents():
+    """Test infected agents are tracked in infection order."""
+    model = GeoCovidModel()
+    agents = [PersonAgent(i, model, Point(i, i)) for i in range(3)]
+    agents[2].status = Status.INFECTED
+    agents[0].status = Status.INFECTED
+    assert list(model.infected.values()) == [agents[2], agents[0]]
+    agents[2].status = Status.RECOVERED
+    assert list(model.infected.values()) == [agents[0]]
+
+
+def test_agent_positions():
+    """Test agents keep their positions in the model array."""
+    model = GeoCovidModel()
+    agents = [PersonAgent(i, model, Point(i, i)) for i in range(3)]
+    model.grid.add_agents(agents)
+    agents[1].move(Point(5, 6))
+    agents[2].move(None)
+
+    assert model.positions.values().tolist() == [
+        [0, 0, 0, 0],
+        [5, 6, 5, 6],
+        [2, 2, 2, 2],
+    ]
+    assert agents[1].shape.equals(Point(5, 6))
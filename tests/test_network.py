@@ -0,0 +1,82 @@
+"""Contact network tests."""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from geocovid.batch import HourlyPositions, run_simulation, save_positions
+from geocovid.network import ContactNetwork, run_replay, save_contacts
+from geocovid.spatial import bbox_distance
+
+
+@pytest.fixture
+def positions_path(tmp_path):
+    """Random positions of agents coming and going over two days."""
+    rng = np.random.default_rng(0)
+    gdfs = []
+    for _ in range(48):
+        ids = ["id{}".format(i) for i in range(80) if rng.random() < 0.7]
+        points = [Point(*rng.uniform(0, 0.002, 2)) for _ in ids]
+        gdfs.append(gpd.GeoDataFrame({"geometry": points}, index=ids))
+    path = str(tmp_path / "positions")
+    save_positions(gdfs, path)
+    return path
+
+
+def test_saved_contacts(tmp_path, positions_path):
+    """Test the contacts of the first hour are every close pair."""
+    path = str(tmp_path / "contacts")
+    save_contacts(HourlyPositions(positions_path), 0.0002, path)
+    network = ContactNetwork(path)
+    codes, bounds = next(iter(HourlyPositions(positions_path)))
+    present, src, dst = next(iter(network))
+
+    assert len(network) == 48
+    assert present == len(codes)
+    src_idx, dst_idx = np.triu_indices(len(codes), k=1)
+    near = bbox_distance(bounds[src_idx], bounds[dst_idx]) <= 0.0002
+    assert src.tolist() == codes[src_idx[near]].tolist()
+    assert dst.tolist() == codes[dst_idx[near]].tolist()
+
+
+def test_replay_matches_simulation(tmp_path, positions_path):
+    """Test a replay gives the same results as simulating the positions."""
+    path = str(tmp_path / "contacts")
+    save_contacts(HourlyPositions(positions_path), 0.0002, path)
+    params = {
+        "infection_prob": 0.3,
+        "death_prob": 0.02,
+        "treatment_period": 1,
+        "min_death_period": 0,
+        "init_infected": 5,
+        "exposure_distance": 0.0002,
+    }
+    replay = run_replay(path, params, seed=3)
+    simulation = run_simulation(positions_path, params, seed=3)
+
+    assert replay["R"].iloc[-1] > 0
+    pd.testing.assert_frame_equal(replay, simulation)
+
+
+def test_replay_infected_ids(tmp_path, positions_path):
+    """Test a replay and a simulation infect the listed ids alike."""
+    path = str(tmp_path / "contacts")
+    positions = HourlyPositions(positions_path)
+    save_contacts(positions, 0.0002, path, positions.ids())
+    params = {"infection_prob": 0.0, "init_infected": ["id3", "id8", "missing"]}
+    replay = run_replay(path, params, seed=0)
+    simulation = run_simulation(positions_path, params, seed=0)
+
+    assert replay["I"].iloc[0] == 2
+    assert replay["init_infected"].iloc[0] == '["id3", "id8", "missing"]'
+    pd.testing.assert_frame_equal(replay, simulation)
+
+
+def test_replay_exposure_distance(tmp_path, positions_path):
+    """Test a replay rejects a different exposure distance."""
+    path = str(tmp_path / "contacts")
+    save_contacts(HourlyPositions(positions_path), 0.0002, path)
+    with pytest.raises(ValueError):
+        run_replay(path, {"exposure_distance": 0.001}, seed=0)
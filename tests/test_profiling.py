@@ -0,0 +1,50 @@
+"""Profiling tests."""
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from geocovid.model import STEP_PHASES, GeoCovidModel
+from geocovid.profiling import PhaseTimer
+
+
+def test_phase_timer():
+    """Test phases are timed in total and per step."""
+    timer = PhaseTimer()
+    for _ in range(3):
+        with timer.phase("check"):
+            pass
+    timer.next_step()
+    with timer.phase("move"):
+        pass
+
+    summary = timer.summary()
+    assert summary.loc["check", "calls"] == 3
+    assert summary.loc["move", "calls"] == 1
+    assert (summary["total_s"] >= 0).all()
+    assert set(timer.last) == {"move"}
+
+
+def test_disabled_timer():
+    """Test a disabled timer records nothing."""
+    timer = PhaseTimer(enabled=False)
+    with timer.phase("check"):
+        pass
+    assert timer.summary().empty
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_model_phase_reporters(vectorized):
+    """Test a profiled model reports the time of each step phase."""
+    gdf = gpd.GeoDataFrame(
+        {"geometry": [Point(1, 2), Point(1, 2)]}, index=["a", "b"], geometry="geometry"
+    )
+    model = GeoCovidModel(init_infected=1, vectorized=vectorized, profile=True)
+    for _ in range(3):
+        model.step(gdf)
+
+    model_vars = model.datacollector.get_model_vars_dataframe()
+    for phase in ["create", "check", "interact", "move"]:
+        assert (model_vars["t_{}".format(phase)] > 0).all()
+    assert {"t_{}".format(phase) for phase in STEP_PHASES} <= set(model_vars)
+    assert model.timer.summary().loc["collect", "calls"] == 3
@@ -0,0 +1,38 @@
+"""Projection tests."""
+
+import numpy as np
+import pandas as pd
+
+from geocovid.constants import MAP_COORDS
+from geocovid.projection import project_data_local, project_points, unproject_points
+
+
+def test_project_points_in_meters():
+    """Test projected points are in meters and project back to degrees."""
+    latitude = np.array([MAP_COORDS[0], MAP_COORDS[0], MAP_COORDS[0] + 0.01])
+    longitude = np.array([MAP_COORDS[1], MAP_COORDS[1] + 0.01, MAP_COORDS[1]])
+    x, y = project_points(latitude, longitude)
+
+    assert 900 < np.hypot(x[1] - x[0], y[1] - y[0]) < 930
+    assert 1105 < np.hypot(x[2] - x[0], y[2] - y[0]) < 1115
+    back_latitude, back_longitude = unproject_points(x, y)
+    np.testing.assert_allclose(back_latitude, latitude)
+    np.testing.assert_allclose(back_longitude, longitude)
+
+
+def test_project_data_local_drops_invalid_points():
+    """Test points without a valid id, timestamp or coordinates are dropped."""
+    df = pd.DataFrame(
+        {
+            "id": ["a", None, "c", "d"],
+            "timestamp": [1585746000, 1585746000, "x", 1585746000],
+            "latitude": [-34.9, -34.9, -34.9, None],
+            "longitude": [-56.1, -56.1, -56.1, -56.1],
+        }
+    )
+    points = project_data_local(df)
+
+    assert points.columns.tolist() == ["id", "timestamp", "x", "y"]
+    assert points["id"].tolist() == ["a"]
+    x, y = project_points([-34.9], [-56.1])
+    assert points[["x", "y"]].to_numpy().tolist() == [[x[0], y[0]]]
@@ -0,0 +1,41 @@
+"""Result writer tests."""
+
+import pandas as pd
+
+from geocovid.results import ParquetResultWriter, read_results
+
+
+def test_writer_appends_parts(tmp_path):
+    """Test appended rows are written in parts and read back in order."""
+    writer = ParquetResultWriter(str(tmp_path), max_buffer_rows=3)
+    day_1 = pd.DataFrame({"S": [1, 2]}, index=pd.Index([0, 1], name="Step"))
+    day_2 = pd.DataFrame({"S": [3, 4]}, index=pd.Index([2, 3], name="Step"))
+    writer.append("model", day_1)
+    assert not (tmp_path / "model").exists()
+    writer.append("model", day_2)  # buffer is full
+    assert len(list((tmp_path / "model").iterdir())) == 1
+    writer.append("model", day_1.iloc[:0])
+    writer.flush()  # nothing buffered
+    assert writer.parts == 1
+
+    df = read_results(str(tmp_path), "model", index=["Step"])
+    pd.testing.assert_frame_equal(df, pd.concat([day_1, day_2]))
+
+
+def test_writer_rollback(tmp_path):
+    """Test parts written after a checkpoint are removed and written again."""
+    writer = ParquetResultWriter(str(tmp_path))
+    day_1 = pd.DataFrame({"S": [1]}, index=pd.Index([0], name="Step"))
+    day_2 = pd.DataFrame({"S": [2]}, index=pd.Index([1], name="Step"))
+    writer.append("model", day_1)
+    writer.flush()
+    writer.append("model", day_2)
+    writer.flush()
+
+    resumed = ParquetResultWriter(str(tmp_path))
+    resumed.rollback(1)
+    resumed.append("model", day_2)
+    resumed.flush()
+    assert resumed.parts == 2
+    df = read_results(str(tmp_path), "model", index=["Step"])
+    pd.testing.assert_frame_equal(df, pd.concat([day_1, day_2]))
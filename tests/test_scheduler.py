@@ -1,16 +1,41 @@
 """Scheduler tests."""
 
-import pytest
+import geopandas as gpd
+from shapely.geometry import Point
 
+from geocovid.agent import PersonAgent
+from geocovid.engine import frame_bounds
+from geocovid.model import GeoCovidModel
 from geocovid.scheduler import DataScheduler
 
 
-def test_model_set_up():
-    """Test model setup."""
-    scheduler = DataScheduler()
-    assert model.running is True
-    assert model.schedule is None
-    assert model.current_id == 0
-    assert model.current_id + 1 == model.next_id()
-    assert model.current_id == 1
-    model.step()
+def test_scheduler_set_up():
+    """Test scheduler setup."""
+    model = GeoCovidModel()
+    scheduler = DataScheduler(model)
+    assert scheduler.model is model
+    assert scheduler.steps == 0
+    assert scheduler.time == 0
+    assert scheduler.get_agent_count() == 0
+
+
+def test_scheduler_add_agents():
+    """Test agents are added at once, by id."""
+    model = GeoCovidModel()
+    scheduler = DataScheduler(model)
+    agents = [PersonAgent(i, model, Point(i, i)) for i in range(3)]
+    scheduler.add_agents(agents)
+    assert scheduler.get_agent_count() == 3
+    assert [key for key, _ in scheduler.agent_buffer()] == [0, 1, 2]
+
+
+def test_scheduler_step():
+    """Test a step moves the agents present and advances the clock."""
+    model = GeoCovidModel(init_infected=0)
+    gdf = gpd.GeoDataFrame({"geometry": [Point(0, 0)]}, index=["a"])
+    model.step(gdf)
+    moved = gpd.GeoDataFrame({"geometry": [Point(3, 4)]}, index=["a"])
+    model.schedule.step(*frame_bounds(moved))
+    assert model.schedule.steps == 2
+    assert model.schedule.time == 2
+    assert model.schedule._agents["a"].bounds.tolist() == [3, 4, 3, 4]
@@ -0,0 +1,132 @@
+"""Spatial utilities tests."""
+
+import numpy as np
+from shapely.geometry import Point, box
+
+from geocovid.spatial import (
+    BoundsArray,
+    GridIndex,
+    bbox_distance,
+    bounds_shape,
+    cell_key,
+    cell_keys,
+    query_pairs,
+)
+
+
+def random_boxes(rng, size, extent):
+    """Create random bounding boxes."""
+    mins = rng.uniform(0, 0.01, (size, 2))
+    sizes = rng.uniform(0, extent, (size, 2))
+    return np.hstack([mins, mins + sizes])
+
+
+def test_bbox_distance():
+    """Test distance between boxes."""
+    a = np.array([[0.0, 0.0, 1.0, 1.0], [0.0, 0.0, 1.0, 1.0]])
+    b = np.array([[4.0, 5.0, 6.0, 6.0], [0.5, 0.5, 2.0, 2.0]])
+    assert np.allclose(bbox_distance(a, b), [5.0, 0.0])
+
+
+def test_bounds_array():
+    """Test rows keep their boxes while the array grows."""
+    positions = BoundsArray(capacity=2)
+    rows = [positions.append((i, i, i + 1, i + 1)) for i in range(5)]
+    assert rows == list(range(5))
+    assert positions.extend(np.zeros((2, 4))) == range(5, 7)
+    assert len(positions) == 7
+    assert positions.values()[3].tolist() == [3, 3, 4, 4]
+
+
+def test_bounds_shape():
+    """Test shapes built from boxes."""
+    assert bounds_shape((1, 2, 1, 2)).equals(Point(1, 2))
+    assert bounds_shape((0, 0, 1, 2)).equals(box(0, 0, 1, 2))
+
+
+def test_cell_keys():
+    """Test points share a key only when they share a grid cell."""
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-500, 500, (1000, 2))
+    keys = cell_keys(points, 100.0)
+    cells = np.floor(points / 100.0).astype(np.int64)
+    assert len(np.unique(keys)) == len(np.unique(cells, axis=0))
+    assert keys.tolist() == [cell_key(int(x), int(y)) for x, y in cells]
+
+
+def test_query_pairs_matches_brute_force():
+    """Test batched pairs against all pairwise distances."""
+    rng = np.random.default_rng(0)
+    sources = random_boxes(rng, 200, 0.0003)
+    targets = random_boxes(rng, 500, 0.0003)
+    targets[:5, 2:] += 0.01  # boxes too big for the grid
+    distance = 0.0001
+
+    src, tgt = query_pairs(sources, targets, distance)
+
+    all_distances = bbox_distance(sources[:, None, :], targets[None, :, :])
+    expected = set(zip(*np.nonzero(all_distances <= distance)))
+    assert set(zip(src, tgt)) == expected
+    assert len(src) == len(expected)
+
+
+def test_query_pairs_skips_missing_positions():
+    """Test boxes without position never match."""
+    sources = np.array([[0.0, 0.0, 0.0, 0.0], [np.nan] * 4])
+    targets = np.array([[np.nan] * 4, [0.0, 0.0, 0.0, 0.0]])
+    src, tgt = query_pairs(sources, targets, 0.1)
+    assert src.tolist() == [0]
+    assert tgt.tolist() == [1]
+
+
+def test_grid_index_incremental_updates():
+    """Test the grid index follows moves and removals."""
+    index = GridIndex(cell_size=0.001)
+    index.insert("a", (0.0, 0.0, 0.0, 0.0))
+    index.insert("b", (0.0005, 0.0, 0.0005, 0.0))
+    index.insert("big", (0.1, 0.1, 0.2, 0.2))
+    assert sorted(index.query((0.0, 0.0, 0.0, 0.0), 0.001)) == ["a", "b"]
+
+    index.update("b", (0.5, 0.5, 0.5, 0.5))
+    assert index.query((0.0, 0.0, 0.0, 0.0), 0.001) == ["a"]
+    assert index.query((0.2, 0.2, 0.2, 0.2), 0.0) == ["big"]
+
+    index.remove("a")
+    assert index.query((0.0, 0.0, 0.0, 0.0), 0.001) == []
+    assert len(index) == 2
+
+
+def test_grid_index_matches_query_pairs():
+    """Test indexed pairs against the batched query."""
+    rng = np.random.default_rng(1)
+    sources = random_boxes(rng, 100, 0.0005)
+    targets = random_boxes(rng, 300, 0.0005)
+    index = GridIndex(cell_size=0.0002)
+    for position, bounds in enumerate(targets):
+        index.insert(position, bounds)
+
+    src, slots = index.query_pairs(sources, 0.0001)
+
+    expected = set(zip(*query_pairs(sources, targets, 0.0001)))
+    assert set(zip(src, [index.items[slot] for slot in slots])) == expected
+
+
+def test_grid_index_insert_many():
+    """Test a batch insert indexes as inserting one by one."""
+    rng = np.random.default_rng(2)
+    boxes = random_boxes(rng, 300, 0.0005)
+    boxes[:3, 2:] += 0.05  # boxes too big for the grid
+    boxes[3] = np.nan
+    single, batch = GridIndex(cell_size=0.0002), GridIndex(cell_size=0.0002)
+    single.insert("first", boxes[4])
+    batch.insert("first", boxes[4])
+    for position, bounds in enumerate(boxes):
+        single.insert(position, bounds)
+    batch.insert_many(list(range(len(boxes))), boxes)
+
+    assert batch._cells == single._cells
+    assert batch._ranges == single._ranges
+    assert batch._oversized == single._oversized
+    batch.update(5, boxes[6])
+    single.update(5, boxes[6])
+    assert sorted(batch.query(boxes[6], 0.0)) == sorted(single.query(boxes[6], 0.0))
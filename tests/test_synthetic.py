@@ -0,0 +1,32 @@
+"""Synthetic trajectory tests."""
+
+import numpy as np
+import pandas as pd
+
+from geocovid.synthetic import synthetic_day, synthetic_envelopes, synthetic_hours
+
+
+def test_synthetic_day_shape():
+    """Test a synthetic day is shaped as the pipeline output."""
+    gdf = synthetic_day(500, hours=3, outliers=0.1)
+    assert gdf.index.names == ["h", "id"]
+    assert gdf.index.get_level_values("h").unique().tolist() == [0, 1, 2]
+    assert gdf.index.is_unique
+    assert set(gdf.geom_type) == {"Polygon", "Point"}
+
+
+def test_synthetic_presence_and_churn():
+    """Test devices are seen with the presence rate and replaced with churn."""
+    hours = list(synthetic_envelopes(2000, hours=2, presence=0.5, churn=0.1))
+    assert all(900 < len(hour) < 1100 for hour in hours)
+    ids = [set(hour["id"]) for hour in hours]
+    new_ids = {key for key in ids[0] if int(key[1:]) >= 2000}
+    assert 50 < len(new_ids) < 150
+
+
+def test_synthetic_seed():
+    """Test the same seed gives the same trajectories."""
+    first, second = (next(synthetic_hours(100, seed=3)) for _ in range(2))
+    pd.testing.assert_frame_equal(first.bounds, second.bounds)
+    other = next(synthetic_hours(100, seed=4))
+    assert not np.array_equal(first.index, other.index)
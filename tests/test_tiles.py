@@ -0,0 +1,84 @@
+"""Tiled model tests."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geocovid.agent import Status
+from geocovid.model import GeoCovidModel
+from geocovid.synthetic import synthetic_hours
+from geocovid.tiles import TiledModel, Tiling
+
+
+def test_border_owners():
+    """Test only positions near the tiles of other workers get halo copies."""
+    tiling = Tiling(tile_size=1.0, workers=64)
+    bounds = np.array(
+        [
+            [0.4, 0.4, 0.6, 0.6],
+            [0.95, 0.5, 0.96, 0.5],
+            [0.95, 0.95, 0.95, 0.95],
+        ]
+    )
+    worker = tiling.owners(bounds[:1])[0]
+
+    rows, owners = tiling.border_owners(bounds, 0.1, worker)
+
+    assert set(rows.tolist()) == {1, 2}
+    assert np.count_nonzero(rows == 2) > np.count_nonzero(rows == 1)
+    assert (owners != worker).all()
+
+
+@pytest.mark.parametrize("dormant_after", [None, 3])
+def test_tiled_model_matches_single_process(dormant_after):
+    """Test a tiled run infects the same agents as a single process one."""
+    hours = list(
+        synthetic_hours(300, hours=40, clusters=5, area=1000, presence=0.6, seed=1)
+    )
+    params = {
+        "infection_prob": 1.0,
+        "death_prob": 0.0,
+        "treatment_period": 1,
+        "min_death_period": 0,
+        "init_infected": hours[0].index[:3].tolist(),
+        "exposure_distance": 20.0,
+        "dormant_after": dormant_after,
+    }
+    model = GeoCovidModel(vectorized=True, **params)
+    with TiledModel(workers=3, tile_size=200, debug=True, **params) as tiled:
+        for hour_gdf in hours:
+            model.step(hour_gdf)
+            tiled.step(hour_gdf)
+        agent_vars = tiled.datacollector.get_agent_vars_dataframe()
+
+    assert tiled.handoffs > 0
+    assert model.count_status(Status.RECOVERED) > 0
+    assert model.count_status(Status.SUSCEPTIBLE) > 0
+    pd.testing.assert_frame_equal(
+        tiled.datacollector.get_model_vars_dataframe(),
+        model.datacollector.get_model_vars_dataframe(),
+    )
+    pd.testing.assert_frame_equal(
+        agent_vars.sort_index(),
+        model.datacollector.get_agent_vars_dataframe().sort_index(),
+    )
+
+
+def test_agent_columns_gathered_once(monkeypatch):
+    """Test the agent reporters of a collection share one gather."""
+    hours = synthetic_hours(100, hours=24, clusters=2, area=500, seed=0)
+    with TiledModel(workers=2, tile_size=200, init_infected=1) as tiled:
+        calls = []
+        call = tiled._call
+
+        def counted_call(method, kwargs):
+            calls.append(method)
+            return call(method, kwargs)
+
+        monkeypatch.setattr(tiled, "_call", counted_call)
+        for hour_gdf in hours:
+            tiled.step(hour_gdf)
+        agent_vars = tiled.datacollector.get_agent_vars_dataframe()
+
+    assert calls.count("active_state") == 1
+    assert len(agent_vars) == tiled.count_agents()